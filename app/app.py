@@ -1,5 +1,9 @@
 import streamlit as st
-import os
+import streamlit.components.v1 as components
+import json
+import queue
+import threading
+import uuid
 
 # Set page config must be the first Streamlit command called
 st.set_page_config(
@@ -22,11 +26,68 @@ hide_streamlit_style = """
 st.markdown(hide_streamlit_style, unsafe_allow_html=True)
 
 # Import other modules after set_page_config
-from .helpers.pdf_utils import extract_text_from_pdf, chunk_text
-from .helpers.summary_utils import summarize_chunk
-from .helpers.miro_utils import create_miro_mindmap
+from .helpers.pdf_utils import extract_pages_from_pdf, chunk_text_for_retrieval, chunk_text_for_summary
+from .helpers.normalize_utils import normalize_pages
+from .helpers.summary_utils import summarize_chunk, summarize_chunk_stream
+from .helpers.miro_sync import publish_summary_stream, sync_miro_mindmap
+from .helpers.export_utils import export_mindmap
 from .helpers.workbook_utils import generate_workbook
+from .helpers.document_utils import get_document_store
+from .helpers.artifact_utils import ArtifactCache, cache_key
 from .helpers.chat_utils import get_chat_bot
+from .helpers.events_utils import (EVENT_MESSAGE, EVENT_PROGRESS, EVENT_STATUS_END, EVENT_STATUS_START,
+                                   set_event_handler)
+from .helpers.ledger_utils import day_start, document_hash, get_ledger, set_document
+from .helpers.metrics_utils import start_metrics_server
+from .helpers.memory_utils import MEMORY_TRACE, process_memory, session_memory_report, top_allocations
+from .helpers.profiling_utils import HISTORY_KEY, PROFILE_MODE, begin_rerun_profile, end_rerun_profile
+from .helpers.tracing_utils import collector, otlp_document, set_session, span, waterfall_html
+
+# Serve Prometheus metrics on METRICS_PORT (once per process; a no-op on later reruns)
+start_metrics_server()
+
+class StreamlitEvents:
+    """
+    Shows the events helpers emit (events_utils) as Streamlit elements.
+    
+    Streamlit elements can only be created on the script thread, so events
+    from worker threads are queued and shown with the next event on the
+    script thread, or by flush() at the end of the run (rerun() and
+    stop_run() flush before ending it early).
+    """
+    def __init__(self):
+        self.thread_id = threading.get_ident()
+        self.pending = queue.SimpleQueue()
+        self.progress_bars = {}  # Task name -> st.progress element
+        self.spinners = []  # Open st.spinner contexts, innermost last
+        self.errors = 0  # Error messages so far; a result built with errors is not shared
+    
+    def __call__(self, event):
+        if event.kind == EVENT_MESSAGE and event.level == "error":
+            self.errors += 1
+        if threading.get_ident() != self.thread_id:
+            self.pending.put(event)
+            return
+        self.flush()
+        self.show(event)
+    
+    def flush(self):
+        while not self.pending.empty():
+            self.show(self.pending.get())
+    
+    def show(self, event):
+        if event.kind == EVENT_MESSAGE:
+            getattr(st, event.level)(event.text)
+        elif event.kind == EVENT_PROGRESS:
+            if event.task not in self.progress_bars:
+                self.progress_bars[event.task] = st.progress(0)
+            self.progress_bars[event.task].progress(event.fraction, text=event.text)
+        elif event.kind == EVENT_STATUS_START:
+            spinner = st.spinner(event.text)
+            spinner.__enter__()
+            self.spinners.append(spinner)
+        elif event.kind == EVENT_STATUS_END and self.spinners:
+            self.spinners.pop().__exit__(None, None, None)
 
 # Initialize session state to store generated summaries
 if 'final_summary' not in st.session_state:
@@ -37,6 +98,8 @@ if 'pdf_processed' not in st.session_state:
     st.session_state.pdf_processed = False
 if 'miro_mindmap_url' not in st.session_state:
     st.session_state.miro_mindmap_url = None
+if 'miro_board_id' not in st.session_state:
+    st.session_state.miro_board_id = None
 if 'workbook_exercises' not in st.session_state:
     st.session_state.workbook_exercises = None
 if 'chat_initialized' not in st.session_state:
@@ -53,6 +116,50 @@ if 'workbook_selected' not in st.session_state:
     st.session_state.workbook_selected = False
 if 'assistant_selected' not in st.session_state:
     st.session_state.assistant_selected = False
+# Groups this session's traces in the debug panel
+if 'trace_session_id' not in st.session_state:
+    st.session_state.trace_session_id = uuid.uuid4().hex
+set_session(st.session_state.trace_session_id)
+# Profile this rerun when PROFILE_RERUNS is set ("cprofile" or "sample")
+begin_rerun_profile(st.session_state)
+# Helpers report messages, progress and long steps as events; this run shows them
+events = StreamlitEvents()
+set_event_handler(events)
+
+def stop_run():
+    """st.stop(), after showing queued worker events and closing this run's profile"""
+    events.flush()
+    end_rerun_profile(st.session_state, ended_by="stop")
+    st.stop()
+
+def rerun():
+    """st.experimental_rerun(), after showing queued worker events and closing this run's profile"""
+    events.flush()
+    end_rerun_profile(st.session_state, ended_by="rerun")
+    st.experimental_rerun()
+
+def summarize_final(text_to_summarize, miro_token=None):
+    """
+    Final summary pass. With a Miro token the summary streams into the page and
+    its mind map is drawn on a new board while it is being generated.
+    """
+    if not miro_token:
+        return summarize_chunk(text_to_summarize, is_final=True, api_key=st.session_state.openai_api_key)
+    
+    placeholder = st.empty()
+    final_summary, result = publish_summary_stream(
+        summarize_chunk_stream(text_to_summarize, is_final=True, api_key=st.session_state.openai_api_key),
+        miro_token,
+        on_text=placeholder.markdown
+    )
+    placeholder.empty()
+    if result["success"]:
+        st.session_state.miro_mindmap_url = result["board_url"]
+        st.session_state.miro_board_id = result["board_id"]
+    else:
+        # The summary is still kept; the mind map can be published again from the Mind Map section
+        st.error(f"Failed to create mind map: {result.get('error', 'Unknown error')}")
+    return final_summary
 
 st.title("📘 Non-fiction Book Summarizer")
 st.markdown("Upload a non-fiction book PDF and get summaries, mind maps, and workbooks!")
@@ -65,8 +172,8 @@ with st.sidebar:
     api_key = st.text_input("Enter your OpenAI API key", type="password",
                           help="Required for generating summaries, workbooks, and chat functionality")
     if api_key:
-        os.environ["OPENAI_API_KEY"] = api_key
-        st.session_state.openai_api_key = api_key  # Store in session state too
+        # Per session only: os.environ is shared by every session of the server
+        st.session_state.openai_api_key = api_key
         st.success("API key set successfully!")
     else:
         st.warning("Please enter your OpenAI API key to use the summarization feature.")
@@ -94,14 +201,14 @@ with st.sidebar:
     
     # Mind map option
     mindmap = st.checkbox("🗺️ Mind Map", 
-                         help="Generates a visual mind map in Miro showing the book's main ideas and how they connect",
+                         help="Generates a visual mind map of the book's main ideas and how they connect, with downloads and optional publishing to Miro",
                          on_change=lambda: setattr(st.session_state, 'mindmap_selected', not st.session_state.mindmap_selected))
     
     # Show Miro token input only if mind map is selected
     if mindmap:
-        st.subheader("Miro Integration")
+        st.subheader("Miro Integration (optional)")
         miro_token = st.text_input("Enter your Miro Access Token", type="password", 
-                               help="Required to create mind maps in Miro")
+                               help="Only needed to also publish the mind map to a Miro board")
         if miro_token:
             st.success("Miro token set!")
             
@@ -133,6 +240,30 @@ with st.sidebar:
     assistant = st.checkbox("💬 Chat with Book", 
                            help="Lets you ask questions about the book's content in an interactive chat",
                            on_change=lambda: setattr(st.session_state, 'assistant_selected', not st.session_state.assistant_selected))
+    
+    # Timing waterfalls of the pipeline runs, for diagnosing slow steps
+    debug_panel = st.checkbox("🔍 Show debug panel",
+                              help="Shows where the time went in recent summary, workbook, chat and mind map runs")
+    
+    # Tokens, latency and estimated spend of every OpenAI call, from the local usage ledger
+    ledger = get_ledger()
+    if ledger is not None:
+        with st.expander("📊 Usage and Cost"):
+            today = ledger.summary(since=day_start())
+            st.metric("Estimated spend today", f"${today['cost_usd']:.4f}")
+            st.caption(f"{today['calls']} calls · {today['total_tokens']:,} tokens · "
+                       f"p50 {today['p50_ms']:,.0f} ms · p95 {today['p95_ms']:,.0f} ms")
+            usage_group = st.selectbox("Last 7 days by", ["stage", "document", "day", "model"])
+            usage_rows = ledger.totals(usage_group, since=day_start(6))
+            if usage_rows:
+                st.dataframe([{
+                    usage_group: (row[usage_group] or "-")[:12] if usage_group == "document" else row[usage_group],
+                    "calls": row["calls"],
+                    "tokens": row["total_tokens"],
+                    "cost ($)": round(row["cost_usd"], 4),
+                    "p50 (ms)": round(row["p50_ms"]),
+                    "p95 (ms)": round(row["p95_ms"]),
+                } for row in usage_rows], hide_index=True)
 
     # Feature explanations
     with st.expander("About These Features"):
@@ -159,95 +290,106 @@ if st.session_state.pdf_processed:
     if st.button("Generate New Summary"):
         st.session_state.final_summary = None
         st.session_state.pdf_processed = False
+        # Regenerate rather than reuse the summary shared or cached for this book
+        if st.session_state.get("document_lease") is not None:
+            get_document_store().discard(st.session_state.document_lease.key, "summary")
+            ArtifactCache().invalidate(st.session_state.document_lease.key, "summary")
         st.session_state.miro_mindmap_url = None
+        st.session_state.miro_board_id = None
         st.session_state.workbook_exercises = None
         st.session_state.chat_initialized = False
         st.session_state.chat_messages = []
-        st.experimental_rerun()
+        rerun()
 
 # File uploader
 uploaded_file = st.file_uploader("Upload your PDF", type=["pdf"], key="pdf_uploader")
+# Attribute this session's API calls to the uploaded book in the usage ledger
+if uploaded_file:
+    book_hash = document_hash(uploaded_file.getvalue())
+    set_document(book_hash)
 
 # Reset text_extracted state when a new file is uploaded (without debug info)
 if uploaded_file:
     st.session_state.text_extracted = False
 
 if uploaded_file and api_key:
+    # Share this book's text, summary and chat index with every other session of the same tenant
+    # (API key) that uploads the same PDF, and reuse the artifacts earlier runs left on disk
+    book_key = cache_key(st.session_state.openai_api_key, book_hash)
+    document_store = get_document_store()
+    artifact_cache = ArtifactCache()
+    document_lease = st.session_state.get("document_lease")
+    if document_lease is None or document_lease.key != book_key:
+        if document_lease is not None:
+            document_lease.release()
+        st.session_state.document_lease = document_store.acquire(book_key)
+    
+    def extract_book_text():
+        # Clean the extracted pages before chunking: every token removed here is not paid for in any chunk
+        book = artifact_cache.load(book_key, "text")
+        if book is None:
+            text, normalization = normalize_pages(extract_pages_from_pdf(uploaded_file))
+            book = {"text": text, "normalization": normalization}
+            if text.strip():
+                artifact_cache.save(book_key, "text", book)
+        return book
+    
     if not st.session_state.text_extracted:
         st.success("PDF uploaded successfully!")
         
         try:
             # Extract text from PDF
             with st.spinner("Extracting text from PDF..."):
-                text = extract_text_from_pdf(uploaded_file)
+                book = document_store.get_or_create(book_key, "text", extract_book_text)
+                text = book["text"]
                 if not text.strip():
                     st.error("No text could be extracted from this PDF. It may be scanned or protected.")
-                    st.stop()
+                    stop_run()
                 st.info(f"Extracted {len(text)} characters from PDF.")
+                normalization = book["normalization"]
+                chars_saved = normalization["chars_before"] - normalization["chars_after"]
+                if chars_saved > 0:
+                    st.caption(f"Cleanup removed {chars_saved:,} of {normalization['chars_before']:,} characters "
+                               f"({chars_saved / normalization['chars_before']:.1%}): "
+                               f"{normalization['boilerplate_lines']:,} header, footer and page number lines, "
+                               f"{normalization['hyphenations']:,} hyphenated line breaks, "
+                               f"{normalization['ligatures']:,} ligatures, and extra line breaks and spaces.")
                 st.session_state.text = text
                 st.session_state.text_extracted = True
         
         except Exception as e:
             st.error(f"An error occurred while extracting PDF text: {str(e)}")
             st.info("Please check your PDF file and try again.")
-            st.stop()
+            stop_run()
     else:
         text = st.session_state.text
     
+    # Another session or an earlier run may already have summarized this book
+    if summary and not st.session_state.final_summary:
+        shared_summary = document_store.get_or_create(book_key, "summary",
+                                                      lambda: artifact_cache.load(book_key, "summary"))
+        if shared_summary:
+            st.session_state.final_summary = shared_summary
+            st.session_state.pdf_processed = True
+    
     # Process according to selected options
     if summary and not st.session_state.final_summary:
         try:
-            with st.spinner("Preparing text for processing..."):
-                # Implement direct chunking instead of using the function
-                # Define larger chunk size for big books
-                LARGE_CHUNK_SIZE = 4000  # tokens
-                OVERLAP_SIZE = 150  # tokens
-                
-                try:
-                    import tiktoken
-                    tokenizer = tiktoken.encoding_for_model("gpt-4o-mini")
-                    tokens = tokenizer.encode(st.session_state.text)
-                    
-                    # Create chunks with large size (no debug messages)
-                    chunks = []
-                    start = 0
-                    
-                    while start < len(tokens):
-                        end = min(start + LARGE_CHUNK_SIZE, len(tokens))
-                        chunk_tokens = tokens[start:end]
-                        chunk_text = tokenizer.decode(chunk_tokens)
-                        chunks.append(chunk_text)
-                        
-                        # Move start position for next chunk, with overlap
-                        start += LARGE_CHUNK_SIZE - OVERLAP_SIZE
-                    
-                    # Limit to max 100 chunks if needed (no debug messages)
-                    MAX_CHUNKS = 50  # Lower for even better efficiency
-                    if len(chunks) > MAX_CHUNKS:
-                        combined_chunks = []
-                        combine_factor = len(chunks) // MAX_CHUNKS + 1
-                        
-                        for i in range(0, len(chunks), combine_factor):
-                            end_idx = min(i+combine_factor, len(chunks))
-                            combined_text = " ".join(chunks[i:end_idx])
-                            combined_chunks.append(combined_text)
-                        
-                        chunks = combined_chunks
-                    
-                except Exception as e:
-                    # Fallback to original function without debug messages
-                    chunks = chunk_text(st.session_state.text, max_tokens=2000, overlap=100)
+            errors_before = events.errors
+            with st.spinner("Preparing text for processing..."), span("summary.chunking"):
+                chunks = chunk_text_for_summary(st.session_state.text)
 
             # Process the chunks to create a unified summary
             if len(chunks) > 1:  # If we have multiple chunks
-                with st.spinner("Generating summary..."):
+                with st.spinner("Generating summary..."), span("summary", chunks=len(chunks)):
                     # Show progress bar during generation
                     progress_bar = st.progress(0)
                     
                     # First pass: Get individual chunk summaries
                     chunk_summaries = []
                     for i, chunk in enumerate(chunks):
-                        summary_text = summarize_chunk(chunk, is_final=False)
+                        summary_text = summarize_chunk(chunk, is_final=False,
+                                                       api_key=st.session_state.openai_api_key)
                         chunk_summaries.append(summary_text)
                         # Update progress bar
                         progress = (i + 1) / (len(chunks) + 1)  # +1 for final pass
@@ -256,17 +398,20 @@ if uploaded_file and api_key:
                     # Second pass: Generate a unified summary from the individual summaries
                     combined_summaries = "\n\n".join(chunk_summaries)
                     # Generate the final summary
-                    final_summary = summarize_chunk(combined_summaries, is_final=True)
+                    final_summary = summarize_final(combined_summaries, miro_token)
                     # Complete the progress bar
                     progress_bar.progress(1.0)
             else:
                 # Direct summarization for smaller texts
-                with st.spinner("Generating summary..."):
-                    final_summary = summarize_chunk(text, is_final=True)
+                with st.spinner("Generating summary..."), span("summary", chunks=1):
+                    final_summary = summarize_final(text, miro_token)
             
-            # Store the final summary in session state
+            # Store the final summary in session state, and share it unless an API call failed
             st.session_state.final_summary = final_summary
             st.session_state.pdf_processed = True
+            if final_summary and events.errors == errors_before:
+                document_store.put(book_key, "summary", final_summary)
+                artifact_cache.save(book_key, "summary", final_summary)
         
         except Exception as e:
             st.error(f"An error occurred during summarization: {str(e)}")
@@ -289,13 +434,50 @@ if uploaded_file and api_key:
     if mindmap:
         st.subheader("🗺️ Mind Map")
         
-        # Check if we already have a mind map URL
+        # Local mind map, rendered from the summary without any network calls
+        if st.session_state.final_summary:
+            exports = export_mindmap(st.session_state.final_summary)
+            if exports:
+                components.html(exports["html"], height=600)
+                
+                download_formats = [
+                    ("SVG", "svg", "mind_map.svg", "image/svg+xml"),
+                    ("HTML", "html", "mind_map.html", "text/html"),
+                    ("OPML", "opml", "mind_map.opml", "text/x-opml"),
+                    ("FreeMind", "mm", "mind_map.mm", "application/x-freemind"),
+                ]
+                for column, (label, key, file_name, mime) in zip(st.columns(len(download_formats)), download_formats):
+                    with column:
+                        st.download_button(
+                            label=f"Download {label}",
+                            data=exports[key],
+                            file_name=file_name,
+                            mime=mime,
+                            key=f"download_mindmap_{key}"
+                        )
+            else:
+                st.info("The summary has no headings to build a mind map from.")
+        
+        # Publishing to Miro is optional; check if we already have a mind map URL
         if st.session_state.miro_mindmap_url:
             st.success(f"Mind map created! [View your mind map in Miro]({st.session_state.miro_mindmap_url})")
             st.markdown(f"<iframe src='{st.session_state.miro_mindmap_url}' width='100%' height='500px'></iframe>", unsafe_allow_html=True)
             
-            # Add button to regenerate mind map with a new board
             if miro_token and st.session_state.final_summary:
+                # Sync the existing board: only changed nodes are created, updated or deleted
+                if st.session_state.miro_board_id and st.button("Update Mind Map Board"):
+                    with st.spinner("Updating mind map in Miro..."):
+                        result = sync_miro_mindmap(st.session_state.final_summary, miro_token,
+                                                   board_id=st.session_state.miro_board_id)
+                        if result["success"]:
+                            changes = result["changes"]
+                            st.success(f"Board updated: {changes['created']} created, {changes['updated']} updated, "
+                                       f"{changes['deleted']} deleted, {changes['unchanged']} unchanged")
+                        else:
+                            st.error(f"Failed to update mind map: {result.get('error', 'Unknown error')}. "
+                                     "Run the update again to resume where it stopped.")
+                
+                # Add button to regenerate mind map with a new board
                 if st.button("Create New Mind Map Board"):
                     with st.spinner("Creating new mind map in Miro..."):
                         try:
@@ -303,13 +485,14 @@ if uploaded_file and api_key:
                             st.session_state.miro_mindmap_url = None
                             
                             # Create a new mind map
-                            result = create_miro_mindmap(st.session_state.final_summary, miro_token)
+                            result = sync_miro_mindmap(st.session_state.final_summary, miro_token)
                             
                             if result["success"]:
                                 st.session_state.miro_mindmap_url = result["board_url"]
+                                st.session_state.miro_board_id = result["board_id"]
                                 st.success(f"New mind map created! [View your mind map in Miro]({result['board_url']})")
                                 st.markdown(f"<iframe src='{result['board_url']}' width='100%' height='500px'></iframe>", unsafe_allow_html=True)
-                                st.experimental_rerun()  # Refresh the UI
+                                rerun()  # Refresh the UI
                             else:
                                 st.error(f"Failed to create new mind map: {result.get('error', 'Unknown error')}")
                         except Exception as e:
@@ -317,13 +500,14 @@ if uploaded_file and api_key:
         
         # Check for Miro token
         elif miro_token and st.session_state.final_summary:
-            if st.button("Generate Mind Map in Miro"):
+            if st.button("Publish Mind Map to Miro"):
                 with st.spinner("Creating mind map in Miro..."):
                     try:
-                        result = create_miro_mindmap(st.session_state.final_summary, miro_token)
+                        result = sync_miro_mindmap(st.session_state.final_summary, miro_token)
                         
                         if result["success"]:
                             st.session_state.miro_mindmap_url = result["board_url"]
+                            st.session_state.miro_board_id = result["board_id"]
                             st.success(f"Mind map created! [View your mind map in Miro]({result['board_url']})")
                             st.markdown(f"<iframe src='{result['board_url']}' width='100%' height='500px'></iframe>", unsafe_allow_html=True)
                         else:
@@ -332,7 +516,7 @@ if uploaded_file and api_key:
                         st.error(f"Error creating mind map: {str(e)}")
         
         elif not miro_token:
-            st.warning("Please enter your Miro Access Token in the sidebar to create a mind map automatically.")
+            st.info("To also publish this mind map to a Miro board, enter your Miro Access Token in the sidebar.")
             
             # Provide information on getting a Miro token
             with st.expander("How to get a Miro Access Token"):
@@ -359,6 +543,11 @@ if uploaded_file and api_key:
         if 'generating_workbook' not in st.session_state:
             st.session_state.generating_workbook = False
         
+        # A workbook already made from this summary is shown without another API call
+        if not st.session_state.workbook_exercises and st.session_state.final_summary:
+            st.session_state.workbook_exercises = artifact_cache.load(book_key, "workbook",
+                                                                      st.session_state.final_summary)
+        
         # Check if we already have a workbook
         if st.session_state.workbook_exercises:
             st.markdown(st.session_state.workbook_exercises)
@@ -376,22 +565,26 @@ if uploaded_file and api_key:
             if st.button("Regenerate Workbook") and not st.session_state.generating_workbook:
                 # Set generating flag to prevent duplicate spinners
                 st.session_state.generating_workbook = True
-                st.experimental_rerun()
+                rerun()
                 
         # If we're in the middle of generating, do the actual work
         elif st.session_state.generating_workbook:
-            with st.spinner("Creating workbook exercises..."):
-                workbook_text = generate_workbook(st.session_state.final_summary)
-                st.session_state.workbook_exercises = workbook_text
-                st.session_state.generating_workbook = False  # Reset the flag
-                st.experimental_rerun()
+            # generate_workbook shows its own status while it runs
+            errors_before = events.errors
+            workbook_text = generate_workbook(st.session_state.final_summary,
+                                              api_key=st.session_state.openai_api_key)
+            if events.errors == errors_before:
+                artifact_cache.save(book_key, "workbook", workbook_text, st.session_state.final_summary)
+            st.session_state.workbook_exercises = workbook_text
+            st.session_state.generating_workbook = False  # Reset the flag
+            rerun()
         
         # Generate workbook if we have a summary but no workbook yet
         elif st.session_state.final_summary:
             if st.button("Generate Workbook") and not st.session_state.generating_workbook:
                 # Set generating flag to prevent duplicate spinners
                 st.session_state.generating_workbook = True
-                st.experimental_rerun()
+                rerun()
         
         else:
             st.info("Generate a summary first before creating a workbook.")
@@ -402,56 +595,35 @@ if uploaded_file and api_key:
         # Initialize chat bot if we have PDF text but not initialized yet
         if st.session_state.text_extracted and not st.session_state.chat_initialized:
             if st.button("Initialize Chat Assistant"):
-                with st.spinner("Preparing chat assistant..."):
+                with st.spinner("Preparing chat assistant..."), span("chat.setup"):
                     # Get the chat bot instance
-                    chat_bot = get_chat_bot()
+                    chat_bot = get_chat_bot(st.session_state)
                     
                     # Check if we got a valid chat bot
                     if not chat_bot:
                         st.error("Failed to initialize chat assistant. Please check your API key.")
-                        st.stop()
-                    
-                    # Define larger chunk size for big books (without debug messages)
-                    LARGE_CHUNK_SIZE = 4000  # tokens
-                    OVERLAP_SIZE = 150  # tokens
-                    
-                    try:
-                        import tiktoken
-                        tokenizer = tiktoken.encoding_for_model("gpt-4o-mini")
-                        tokens = tokenizer.encode(st.session_state.text)
-                        
-                        # Create chunks with large size
-                        chunks = []
-                        start = 0
-                        
-                        while start < len(tokens):
-                            end = min(start + LARGE_CHUNK_SIZE, len(tokens))
-                            chunk_tokens = tokens[start:end]
-                            chunk_text = tokenizer.decode(chunk_tokens)
-                            chunks.append(chunk_text)
-                            
-                            # Move start position for next chunk, with overlap
-                            start += LARGE_CHUNK_SIZE - OVERLAP_SIZE
-                        
-                        # Limit to max 50 chunks if needed
-                        MAX_CHUNKS = 50  # Lower for efficiency
-                        if len(chunks) > MAX_CHUNKS:
-                            combined_chunks = []
-                            combine_factor = len(chunks) // MAX_CHUNKS + 1
-                            
-                            for i in range(0, len(chunks), combine_factor):
-                                end_idx = min(i+combine_factor, len(chunks))
-                                combined_text = " ".join(chunks[i:end_idx])
-                                combined_chunks.append(combined_text)
-                            
-                            chunks = combined_chunks
+                        stop_run()
                     
-                    except Exception as e:
-                        # Fallback to standard chunking
-                        chunks = chunk_text(st.session_state.text, max_tokens=1000)
+                    # Index the whole book in small overlapping windows so retrieval
+                    # can reach every passage and returns focused excerpts
+                    # (embeddings saved by an earlier run are reused without API calls)
+                    def build_chat_index():
+                        errors_before = events.errors
+                        cached_index = artifact_cache.load_chat_index(book_key)
+                        if cached_index is not None:
+                            chunks, embeddings = cached_index
+                        else:
+                            chunks, embeddings = chunk_text_for_retrieval(st.session_state.text), None
+                        chat_bot.initialize_from_chunks(chunks, embeddings)
+                        if chat_bot.is_initialized and events.errors == errors_before:
+                            if cached_index is None:
+                                artifact_cache.save_chat_index(book_key, chat_bot.chunks, chat_bot.vector_store)
+                            return chat_bot.export_index()
                     
-                    # Initialize the chat bot with chunks
-                    chat_bot.initialize_from_chunks(chunks)
+                    # Sessions with the same book share one index (and wait for one build)
+                    shared_index = document_store.get_or_create(book_key, "chat_index", build_chat_index)
+                    if shared_index is not None and shared_index["vector_store"] is not chat_bot.vector_store:
+                        chat_bot.attach_index(shared_index)
                     
                     # Check if initialization was successful
                     if chat_bot.is_initialized:
@@ -465,7 +637,9 @@ if uploaded_file and api_key:
                                 "content": "Hello! I'm BookGPT. Ask me any questions about the book you've uploaded."
                             })
                         
-                        st.experimental_rerun()
+                        rerun()
+                    elif not st.session_state.text.strip():
+                        st.warning("No text content found in document.")
                     else:
                         st.error("Chat assistant initialization failed. Please check your API key and try again.")
         
@@ -485,6 +659,14 @@ if uploaded_file and api_key:
                     # Add slight padding between messages
                     st.markdown("<div style='margin-bottom: 10px;'></div>", unsafe_allow_html=True)
             
+            # Report how often answers come from the shared per-book cache
+            cache_bot = get_chat_bot(st.session_state)
+            if cache_bot and cache_bot.answer_cache is not None:
+                cache_stats = cache_bot.answer_cache.stats()
+                if cache_stats["hits"] + cache_stats["misses"]:
+                    st.caption(f"Answer cache: {cache_stats['hit_ratio']:.0%} of questions answered from cache "
+                               f"({cache_stats['entries']} cached answers for this book)")
+            
             # Simplified chat input form with auto-submission
             # Initialize chat input if not exists
             if 'chat_input' not in st.session_state:
@@ -515,7 +697,7 @@ if uploaded_file and api_key:
                 user_message = st.session_state.chat_messages[-1]["content"]
                 
                 # Get the chat bot and generate response
-                chat_bot = get_chat_bot()
+                chat_bot = get_chat_bot(st.session_state)
                 
                 # Prepare chat history for context (exclude the latest user message)
                 chat_history = st.session_state.chat_messages[:-1] if len(st.session_state.chat_messages) > 1 else None
@@ -531,7 +713,7 @@ if uploaded_file and api_key:
                 st.session_state.process_message = False
                 
                 # Refresh the UI
-                st.experimental_rerun()
+                rerun()
         
         # If no book has been uploaded yet
         elif not st.session_state.text_extracted:
@@ -541,3 +723,60 @@ elif uploaded_file and not api_key:
     st.warning("Please enter your OpenAI API key in the sidebar to process the PDF.")
 else:
     st.info("Please upload a PDF to get started.")
+
+# Debug panel: per-stage timings of this session's recent runs
+if debug_panel:
+    with st.expander("🔍 Pipeline traces", expanded=True):
+        traces = collector.traces(st.session_state.trace_session_id)
+        if not traces:
+            st.info("No traces yet. Generate a summary, workbook, mind map or chat answer first.")
+        else:
+            labels = [f"{spans[0].name} · {spans[0].duration_ms:,.0f} ms · {len(spans)} spans" for spans in traces]
+            selected_trace = st.selectbox("Trace", range(len(traces)), format_func=lambda i: labels[i])
+            trace_spans = traces[selected_trace]
+            components.html(waterfall_html(trace_spans), height=min(40 + 20 * len(trace_spans), 600), scrolling=True)
+            st.caption("Hover a row for its attributes (tokens, bytes, retries). Orange bars are API calls.")
+            st.download_button(
+                label="Download trace (OTLP JSON)",
+                data=json.dumps(otlp_document(trace_spans), indent=2),
+                file_name=f"trace-{trace_spans[0].trace_id}.json",
+                mime="application/json"
+            )
+
+    # What this session keeps alive between reruns, largest first
+    with st.expander("🧠 Session memory"):
+        memory_rows = session_memory_report(st.session_state)
+        process = process_memory()
+        shared = get_document_store().stats()
+        columns = st.columns(3)
+        columns[0].metric("Session state", f"{sum(row['bytes'] for row in memory_rows) / 1024 / 1024:,.1f} MB")
+        if process["rss_bytes"]:
+            columns[1].metric("Process RSS (all sessions)", f"{process['rss_bytes'] / 1024 / 1024:,.0f} MB")
+        columns[2].metric("Shared books", f"{shared['memory_bytes'] / 1024 / 1024:,.1f} MB",
+                          help=f"{shared['documents']} books, {shared['leases']} open sessions, "
+                               f"{shared['spilled_bytes'] / 1024 / 1024:,.1f} MB spilled to disk")
+        st.dataframe([{"key": row["key"], "type": row["type"], "MB": round(row["bytes"] / 1024 / 1024, 2)}
+                      for row in memory_rows], hide_index=True)
+        if MEMORY_TRACE:
+            st.caption("Largest live allocations (tracemalloc)")
+            st.dataframe([{"location": location, "MB": round(size / 1024 / 1024, 2), "blocks": blocks}
+                          for location, size, blocks in top_allocations()], hide_index=True)
+
+# Slowest functions of this session's recent reruns (PROFILE_RERUNS mode)
+if PROFILE_MODE and st.session_state.get(HISTORY_KEY):
+    with st.expander("⏱️ Rerun Profiles"):
+        profiles = st.session_state[HISTORY_KEY][::-1]
+        st.dataframe([{
+            "run": run["run"],
+            "seconds": run["seconds"],
+            "trigger": run["trigger"],
+            "ended early": run["ended_early"],
+        } for run in profiles], hide_index=True)
+        selected_run = st.selectbox("Run", range(len(profiles)),
+                                    format_func=lambda i: f"Run {profiles[i]['run']} ({profiles[i]['seconds']:.2f}s)")
+        st.dataframe(profiles[selected_run]["top_functions"], hide_index=True)
+        if profiles[selected_run]["file"]:
+            st.caption(f"Full profile: `{profiles[selected_run]['file']}`")
+
+events.flush()
+end_rerun_profile(st.session_state)
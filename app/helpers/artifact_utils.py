@@ -0,0 +1,161 @@
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from .cache_utils import tenant_key
+from .chat_utils import EMBEDDING_DIMENSIONS, EMBEDDING_MODEL
+from .normalize_utils import (BOILERPLATE_EDGE_LINES, BOILERPLATE_MAX_CHARS, BOILERPLATE_MAX_GAP,
+                              BOILERPLATE_MIN_PAGES, NORMALIZE_TEXT)
+from .pdf_utils import (RETRIEVAL_CHUNK_TOKENS, RETRIEVAL_OVERLAP_TOKENS, SUMMARY_CHUNK_TOKENS, SUMMARY_MAX_CHUNKS,
+                        SUMMARY_OVERLAP_TOKENS)
+from .summary_utils import CHUNK_PROMPT, FINAL_PROMPT, SUMMARY_MODEL, SYSTEM_PROMPT
+from .workbook_utils import WORKBOOK_MODEL, WORKBOOK_PROMPT, WORKBOOK_SYSTEM_PROMPT
+
+# Finished artifacts of processed books, per tenant and book; "0" turns the cache off
+ARTIFACT_CACHE_DIR = os.getenv("ARTIFACT_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "book-summary-app",
+                                                              "artifacts"))
+# Bump to invalidate every cached artifact after a pipeline change the stage settings below do not capture
+PIPELINE_VERSION = 2
+# Temporary files younger than this may still be written by another process; older ones are left by a crash
+STALE_TEMP_SECONDS = 600
+
+# Stage -> (stages whose output it is built from, settings that change its output).
+# Prompts and models are part of the settings, so editing them invalidates the stage and everything after it.
+STAGES = {
+    "text": ((), (NORMALIZE_TEXT, BOILERPLATE_EDGE_LINES, BOILERPLATE_MAX_CHARS, BOILERPLATE_MIN_PAGES,
+                  BOILERPLATE_MAX_GAP)),
+    "summary": (("text",), (SUMMARY_MODEL, SYSTEM_PROMPT, CHUNK_PROMPT, FINAL_PROMPT, SUMMARY_CHUNK_TOKENS,
+                            SUMMARY_OVERLAP_TOKENS, SUMMARY_MAX_CHUNKS)),
+    "workbook": (("summary",), (WORKBOOK_MODEL, WORKBOOK_SYSTEM_PROMPT, WORKBOOK_PROMPT)),
+    "chat_index": (("text",), (EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, RETRIEVAL_CHUNK_TOKENS,
+                               RETRIEVAL_OVERLAP_TOKENS)),
+}
+
+
+def _stage_settings(stage):
+    inputs, settings = STAGES[stage]
+    return [stage, list(settings), [_stage_settings(name) for name in inputs]]
+
+
+def stage_fingerprint(stage, inputs=""):
+    """Version of a stage's output: the pipeline version, its settings and those of the stages it builds on"""
+    digest = hashlib.sha256(json.dumps([PIPELINE_VERSION, _stage_settings(stage)]).encode("utf-8"))
+    digest.update(inputs.encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def cache_key(api_key, book_hash):
+    """Key of a book within the API key's tenant, for the artifact cache and the shared document store"""
+    return f"{tenant_key(api_key)}/{book_hash}"
+
+
+class ArtifactCache:
+    """
+    Final artifacts of processed books on disk: normalized text and its
+    token-savings report, summary, workbook and chat index embeddings.
+
+    Files live under <directory>/<tenant>/<book hash>/ and are named after
+    the stage and its fingerprint, so an artifact made with other prompts,
+    models or chunk settings is never returned; saving a stage removes its
+    outdated files. Writes are atomic. With directory None nothing is cached.
+    """
+    def __init__(self, directory=ARTIFACT_CACHE_DIR):
+        self.directory = None if directory == "0" else directory
+
+    def _path(self, key, stage, inputs, extension):
+        return os.path.join(self.directory, key, f"{stage}-{stage_fingerprint(stage, inputs)}.{extension}")
+
+    def load(self, key, stage, inputs=""):
+        """The cached artifact, or None. inputs: anything else it was made from, e.g. the summary of a workbook"""
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(key, stage, inputs, "json"), encoding="utf-8") as handle:
+                return json.load(handle)["value"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save(self, key, stage, value, inputs=""):
+        if self.directory is None:
+            return
+        path = self._path(key, stage, inputs, "json")
+        try:
+            self._remove_stale(key, stage, path)
+            self._write(path, "w", lambda handle: json.dump({"stage": stage, "created": time.time(),
+                                                            "value": value}, handle))
+        except OSError:
+            pass  # A full or read-only disk only loses the cache entry
+
+    def load_chat_index(self, key):
+        """(retrieval chunks, memory-mapped embeddings with one row per chunk) for BookChatBot, or None"""
+        chunks = self.load(key, "chat_index")
+        if chunks is None:
+            return None
+        try:
+            matrix = np.load(self._path(key, "chat_index", "", "npy"), mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        if len(matrix) != len(chunks):
+            return None
+        return chunks, matrix
+
+    def save_chat_index(self, key, chunks, vector_store):
+        """Store the chunks and the vector store's embeddings; skipped unless every chunk was indexed"""
+        if self.directory is None:
+            return
+        if not chunks or list(vector_store.texts) != list(chunks):
+            return
+        path = self._path(key, "chat_index", "", "npy")
+        try:
+            self._remove_stale(key, "chat_index", path)
+            # Quantized stores read the rows from their on-disk full-precision file
+            self._write(path, "wb", lambda handle: np.save(handle, vector_store.embeddings))
+        except OSError:
+            return
+        # The chunk list is written last: it marks the index complete
+        self.save(key, "chat_index", list(chunks))
+
+    def invalidate(self, key, stage=None):
+        """Delete a book's cached artifacts: one stage, or all of them"""
+        if self.directory is None:
+            return
+        pattern = f"{stage}-*" if stage else "*"
+        for path in glob.glob(os.path.join(self.directory, key, pattern)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _write(path, mode, write):
+        # A temporary file of its own per writer, renamed into place: atomic, so a crash never leaves half
+        # an artifact, and processes saving the same artifact at once never write into each other's file
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        descriptor, temp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp",
+                                                 dir=os.path.dirname(path))
+        try:
+            with os.fdopen(descriptor, mode, **({} if "b" in mode else {"encoding": "utf-8"})) as handle:
+                write(handle)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def _remove_stale(self, key, stage, keep_path):
+        keep = os.path.splitext(keep_path)[0]
+        now = time.time()
+        for path in glob.glob(os.path.join(self.directory, key, f"{stage}-*")):
+            try:
+                if path.endswith(".tmp"):
+                    # Another process may be writing it
+                    if now - os.path.getmtime(path) > STALE_TEMP_SECONDS:
+                        os.remove(path)
+                elif os.path.splitext(path)[0] != keep:
+                    os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,147 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import numpy as np
+
+# Cosine similarity above which two questions count as the same question
+ANSWER_CACHE_THRESHOLD = 0.92
+ANSWER_CACHE_TTL_SECONDS = 24 * 60 * 60
+ANSWER_CACHE_MAX_ENTRIES = 256
+# Documents with an answer cache; the least recently used document's cache is dropped
+ANSWER_CACHE_MAX_DOCUMENTS = 64
+# Who shares cached results: "api_key" keeps each key's summaries, indexes and answers to itself,
+# "shared" lets every key of this deployment reuse them
+CACHE_TENANCY = os.getenv("CACHE_TENANCY", "api_key")
+
+# Questions that lean on earlier turns ("what about that?", "explain it more") need the history
+FOLLOW_UP_PATTERN = re.compile(
+    r"\b(it|its|this|that|these|those|they|them|he|she|him|her|above|previous|earlier|"
+    r"again|more|elaborate|else|also|another)\b", re.IGNORECASE)
+
+
+def normalize_question(question: str) -> str:
+    return " ".join(re.findall(r"\w+", question.lower()))
+
+
+def tenant_key(api_key: Optional[str]) -> str:
+    """The namespace an API key's cached results live in (a digest, never the key itself)"""
+    if CACHE_TENANCY == "shared":
+        return "shared"
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+
+def is_standalone_question(question: str) -> bool:
+    """True if the question can be answered without the previous conversation"""
+    return not FOLLOW_UP_PATTERN.search(question)
+
+
+def _unit_vector(embedding) -> Optional[np.ndarray]:
+    if embedding is None:
+        return None
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else None
+
+
+class SemanticAnswerCache:
+    """
+    Answers to previous questions about one document, matched by embedding similarity.
+
+    Exact (normalized) repeats are found without an embedding; otherwise the
+    closest cached question above the threshold wins. Questions stored
+    without an embedding (keyword lookups, failed embedding requests) only
+    match verbatim repeats. Entries expire after a
+    TTL and the least recently used entry is evicted when the cache is full.
+    """
+    def __init__(self, threshold=ANSWER_CACHE_THRESHOLD, ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+                 max_entries=ANSWER_CACHE_MAX_ENTRIES):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # normalized question -> (unit embedding or None, answer, created at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _expire(self, now: float) -> None:
+        expired = [key for key, (_, _, created) in self._entries.items() if now - created > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+
+    def lookup_exact(self, question: str) -> Optional[str]:
+        """Cached answer for a verbatim repeat of a question; does not count a miss"""
+        key = normalize_question(question)
+        with self._lock:
+            self._expire(time.time())
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][1]
+
+    def lookup(self, question: str, embedding) -> Optional[str]:
+        """Cached answer for the most similar previous question, or None (always, without an embedding)"""
+        query = _unit_vector(embedding)
+        with self._lock:
+            self._expire(time.time())
+            keys = [key for key, entry in self._entries.items() if entry[0] is not None]
+            if query is None or not keys:
+                self.misses += 1
+                return None
+            matrix = np.vstack([self._entries[key][0] for key in keys])
+            similarities = matrix @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(keys[best])
+            self.hits += 1
+            return self._entries[keys[best]][1]
+
+    def store(self, question: str, embedding, answer: str) -> None:
+        """Cache an answer; embedding None (or a zero vector) keeps it for verbatim repeats only"""
+        with self._lock:
+            self._entries[normalize_question(question)] = (_unit_vector(embedding), answer, time.time())
+            self._entries.move_to_end(normalize_question(question))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# Process-wide caches so every session reading the same book shares answers
+_answer_caches = OrderedDict()  # document key -> SemanticAnswerCache, least recently used first
+_answer_caches_lock = threading.Lock()
+
+
+def answer_cache_stats() -> Dict[str, int]:
+    """Hits and misses summed over every document's answer cache"""
+    with _answer_caches_lock:
+        caches = list(_answer_caches.values())
+    return {"hit": sum(cache.hits for cache in caches), "miss": sum(cache.misses for cache in caches)}
+
+
+def get_answer_cache(document_key: str) -> SemanticAnswerCache:
+    """Shared answer cache for a document (identified by a content hash)"""
+    with _answer_caches_lock:
+        if document_key not in _answer_caches:
+            _answer_caches[document_key] = SemanticAnswerCache()
+        _answer_caches.move_to_end(document_key)
+        while len(_answer_caches) > ANSWER_CACHE_MAX_DOCUMENTS:
+            _answer_caches.popitem(last=False)
+        return _answer_caches[document_key]
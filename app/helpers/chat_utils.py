@@ -1,176 +1,393 @@
 import os
+import hashlib
+import time
 import numpy as np
+from collections import OrderedDict
 from openai import OpenAI
-import streamlit as st
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
+
+from .cache_utils import get_answer_cache, is_standalone_question, tenant_key
+from .context_utils import CONTEXT_SEPARATOR, CONTEXT_TOKEN_BUDGET, pack_context
+from .events_utils import report, report_progress
+from .history_utils import ChatHistoryManager
+from .ledger_utils import record_usage
+from .search_utils import BM25Index, reciprocal_rank_fusion
+from .tracing_utils import SPAN_KIND_CLIENT, current_span, span, traced
+from .vector_utils import (QUANTIZATION_MODES, RESCORE_FACTOR, FullPrecisionFile, hamming_distances,
+                           int8_scores, quantize_binary, quantize_int8)
+
+# Embedding model used for the chat index and queries
+EMBEDDING_MODEL = "text-embedding-3-small"
+# text-embedding-3 models can return shortened vectors; 1536 is the full size
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "1536"))
+# Inputs per embeddings request (the API accepts up to 2048 per call)
+EMBEDDING_BATCH_SIZE = 256
+# Query embeddings kept per bot; book chunks live only in the vector store
+QUERY_EMBEDDING_CACHE_SIZE = 256
+# Candidates each retriever contributes before rank fusion
+FUSION_CANDIDATES = 20
+# Chat index storage: "none" (float32 in memory), "int8" or "binary" codes with on-disk rescoring
+EMBEDDING_QUANTIZATION = os.getenv("EMBEDDING_QUANTIZATION", "none")
+
+def embedding_cache_key(text: str) -> str:
+    """Cache key for an embedding: a digest of the full text, not a prefix"""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def document_key(chunks: List[str], dimensions: int = EMBEDDING_DIMENSIONS) -> str:
+    """Identity of an indexed document, shared by every session that indexes the same chunks"""
+    digest = hashlib.sha1(f"{EMBEDDING_MODEL}:{dimensions}".encode("utf-8"))
+    for chunk in chunks:
+        digest.update(embedding_cache_key(chunk).encode("ascii"))
+    return digest.hexdigest()
 
 # In-memory storage for embeddings
 class SimpleVectorStore:
-    def __init__(self):
-        self.embeddings = []
-        self.texts = []
+    """
+    Stores unit-normalized embeddings for cosine search.
+    
+    With quantization="none" the float32 matrix is kept in memory. With "int8"
+    or "binary" only compact codes stay in memory; search ranks candidates by
+    int8 dot product or Hamming distance, then rescores them against the
+    full-precision vectors kept in a memory-mapped file on disk.
+    """
+    def __init__(self, quantization="none", rescore_factor=RESCORE_FACTOR, storage_dir=None, dimensions=None):
+        if quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"quantization must be one of {QUANTIZATION_MODES}")
+        self.dimensions = dimensions  # Expected vector width; None accepts the first width added
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor
+        self.storage_dir = storage_dir
+        self.clear()
+        
+    def _flush(self):
+        """Move rows added since the last search into the matrix or the quantized codes"""
+        if not self._pending:
+            return
+        rows = np.vstack(self._pending)
+        self._pending = []
+        if self.quantization == "none":
+            self._matrix = rows if self._matrix is None else np.vstack([self._matrix, rows])
+            return
+        
+        if self._full is None:
+            self._full = FullPrecisionFile(rows.shape[1], self.storage_dir)
+        self._full.append(rows)
+        if self.quantization == "int8":
+            codes, scales = quantize_int8(rows)
+            self._scales = scales if self._scales is None else np.concatenate([self._scales, scales])
+        else:
+            codes = quantize_binary(rows)
+        self._codes = codes if self._codes is None else np.vstack([self._codes, codes])
+        
+    @property
+    def embeddings(self):
+        """All stored embeddings at full precision as an (n, dim) float32 matrix"""
+        self._flush()
+        if self.quantization == "none":
+            return self._matrix
+        return None if self._full is None else self._full.matrix
         
     def add(self, embedding, text):
-        self.embeddings.append(embedding)
-        self.texts.append(text)
+        self.add_batch([embedding], [text])
         
-    def search(self, query_embedding, top_k=3):
-        if not self.embeddings:
-            return []
+    def add_batch(self, embeddings, texts):
+        rows = np.asarray(embeddings, dtype=np.float32).reshape(len(texts), -1)
+        if self.dimensions is None:
+            self.dimensions = rows.shape[1]
+        elif rows.shape[1] != self.dimensions:
+            raise ValueError(f"Expected {self.dimensions}-dimensional embeddings, got {rows.shape[1]}")
+        # Normalize once at insert time so search is a single matrix-vector product
+        norms = np.linalg.norm(rows, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self._pending.append(rows / norms)
+        self.texts.extend(texts)
+        
+    def clear(self):
+        self.texts = []
+        self._pending = []  # Rows added since the matrix was last built
+        self._matrix = None
+        self._codes = None
+        self._scales = None
+        if getattr(self, "_full", None) is not None:
+            self._full.close()
+        self._full = None
         
-        # Convert list to numpy array for efficient computation
-        embeddings_array = np.array(self.embeddings)
-        query_array = np.array(query_embedding)
+    def __len__(self):
+        return len(self.texts)
         
-        # Compute cosine similarity
-        dot_products = np.dot(embeddings_array, query_array)
-        norms = np.linalg.norm(embeddings_array, axis=1) * np.linalg.norm(query_array)
-        similarities = dot_products / norms
+    def freeze(self):
+        """Build the matrix or codes and make them read-only, so sessions can share this store"""
+        self._flush()
+        for array in (self._matrix, self._codes, self._scales):
+            if array is not None:
+                array.flags.writeable = False
+        self.texts = tuple(self.texts)
         
-        # Get indices of top k results
-        top_indices = np.argsort(similarities)[-top_k:][::-1]
+    @property
+    def nbytes(self):
+        """Memory used by the stored vectors (the on-disk full-precision copy is not counted)"""
+        self._flush()
+        if self.quantization == "none":
+            return 0 if self._matrix is None else self._matrix.nbytes
+        total = 0 if self._codes is None else self._codes.nbytes
+        return total + (0 if self._scales is None else self._scales.nbytes)
         
+    def search(self, query_embedding, top_k=3):
         # Return top k text chunks and their similarity scores
-        results = [(self.texts[i], float(similarities[i])) for i in top_indices]
-        return results
+        return [(self.texts[i], score) for i, score in self.search_indices(query_embedding, top_k)]
+        
+    def search_indices(self, query_embedding, top_k=3, rescore=True):
+        """Return (row index, cosine similarity) pairs for the top k rows"""
+        if not self.texts:
+            return []
+        
+        query_array = np.asarray(query_embedding, dtype=np.float32)
+        query_norm = np.linalg.norm(query_array)
+        if query_norm == 0:
+            return []
+        query_array = query_array / query_norm
+        self._flush()
+        
+        if self.quantization == "none":
+            # Cosine similarity against the pre-normalized matrix
+            return _top_k(self._matrix @ query_array, top_k)
+        
+        # Shortlist with the compact codes, then rescore exactly from disk
+        if self.quantization == "int8":
+            approximate = int8_scores(self._codes, self._scales, query_array)
+        else:
+            approximate = -hamming_distances(self._codes, quantize_binary(query_array[None, :])[0])
+        if not rescore:
+            return _top_k(approximate.astype(np.float32), top_k)
+        candidates = [i for i, _ in _top_k(approximate, top_k * self.rescore_factor)]
+        candidates = np.sort(np.asarray(candidates))  # Sequential reads from the memory map
+        exact = self._full.matrix[candidates] @ query_array
+        return [(int(candidates[i]), score) for i, score in _top_k(exact, top_k)]
+
+def _top_k(scores, top_k):
+    """(index, score) pairs for the k highest scores without sorting everything"""
+    top_k = min(top_k, len(scores))
+    top_indices = np.argpartition(-scores, top_k - 1)[:top_k]
+    top_indices = top_indices[np.argsort(-scores[top_indices])]
+    return [(int(i), float(scores[i])) for i in top_indices]
 
 class BookChatBot:
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, embedding_dimensions=EMBEDDING_DIMENSIONS, quantization=EMBEDDING_QUANTIZATION):
         if not api_key:
-            api_key = st.session_state.get('openai_api_key') or os.getenv("OPENAI_API_KEY")
+            api_key = os.getenv("OPENAI_API_KEY")
             if not api_key:
-                st.error("OpenAI API key not found. Please enter your API key in the sidebar.")
+                report("error", "OpenAI API key not found. Please enter your API key in the sidebar.")
                 self.is_initialized = False
                 return
                 
         self.api_key = api_key
         self.client = OpenAI(api_key=self.api_key)
-        self.vector_store = SimpleVectorStore()
+        self.embedding_dimensions = embedding_dimensions
+        self.quantization = quantization
+        self.vector_store = SimpleVectorStore(quantization=quantization, dimensions=embedding_dimensions)
+        self.lexical_index = BM25Index()
+        self.history = ChatHistoryManager(self.client)
+        self.answer_cache = None  # Shared per-document cache, set once chunks are indexed
         self.chunks = []
         self.is_initialized = False
-        self.embedding_cache = {}  # Cache to store embeddings and avoid recomputation
+        self.embedding_cache = OrderedDict()  # Query digest -> float32 embedding, least recently used first
         
-    def initialize_from_chunks(self, chunks: List[str], max_chunks=200) -> None:
-        """Process and store book chunks for retrieval with optimization for large books"""
+    @traced("initialize_from_chunks")
+    def initialize_from_chunks(self, chunks: List[str], embeddings: Optional[np.ndarray] = None) -> None:
+        """
+        Embed and store every book chunk for retrieval, batching the API calls.
+        embeddings (one row per chunk, e.g. a saved index) skips the API calls.
+        """
         # Verify we have a valid API key before proceeding
         if not self.api_key:
-            st.error("OpenAI API key is required to initialize the chat assistant.")
+            report("error", "OpenAI API key is required to initialize the chat assistant.")
             return
+        # An empty document has nothing to index; the caller tells the user
+        if not chunks:
+            self.is_initialized = False
+            return
+        
+        report("info", f"Initializing chat engine with book content ({len(chunks)} chunks)...")
+        report_progress("chat.index", 0.0)
+        
+        # Start from new, empty indexes: re-initializing never duplicates chunks
+        # and never changes an index this bot shares with other sessions
+        self.vector_store = SimpleVectorStore(quantization=self.quantization,
+                                              dimensions=self.embedding_dimensions)
+        self.lexical_index = BM25Index()
+        self.chunks = list(chunks)
         
-        st.info(f"Initializing chat engine with book content ({len(chunks)} chunks)...")
-        
-        # Optimize for very large books by selecting representative chunks
-        if len(chunks) > max_chunks:
-            st.warning(f"Book is very large. Optimizing by selecting {max_chunks} representative chunks.")
-            # Select chunks evenly distributed throughout the book
-            step = len(chunks) // max_chunks
-            optimized_chunks = [chunks[i] for i in range(0, len(chunks), step)]
-            # If we still have too many, truncate
-            optimized_chunks = optimized_chunks[:max_chunks]
-            chunks = optimized_chunks
+        # The lexical index is local and cheap, so it always covers every chunk
+        self.lexical_index.build(self.chunks)
+        self.history.reset()
+        self.answer_cache = get_answer_cache(self._answer_cache_key())
+        
+        if embeddings is None:
+            vectors = self._embed_chunks(list(dict.fromkeys(self.chunks)))
+            # Index every chunk that has an embedding, in book order
+            indexed = [chunk for chunk in self.chunks if chunk in vectors]
+            embeddings = [vectors[chunk] for chunk in indexed]
+        elif len(embeddings) != len(self.chunks):
+            raise ValueError("Expected one embedding per chunk")
+        else:
+            current_span().set(chunks=len(self.chunks), embeddings_missing=0)
+            indexed = self.chunks
+        # The vector store keeps the only copy of the chunk vectors
+        if indexed:
+            self.vector_store.add_batch(embeddings, indexed)
+        report_progress("chat.index", 1.0)
             
-        progress_bar = st.progress(0)
+        self.is_initialized = True
+        report("success", f"Chat engine ready! Indexed {len(indexed)} of {len(self.chunks)} chunks.")
         
-        self.chunks = chunks
-        batch_size = min(20, len(chunks))  # Process in batches of 20 or fewer
+    def _embed_chunks(self, missing: List[str]) -> Dict[str, np.ndarray]:
+        """Embeddings of the given distinct chunks; chunks in a failed batch are left out"""
+        vectors = {}
+        current_span().set(chunks=len(self.chunks), embeddings_missing=len(missing))
         
-        # Process chunks in batches to improve efficiency
-        for i in range(0, len(chunks), batch_size):
-            batch = chunks[i:i+batch_size]
-            batch_texts = [chunk for chunk in batch]
+        for i in range(0, len(missing), EMBEDDING_BATCH_SIZE):
+            batch = missing[i:i+EMBEDDING_BATCH_SIZE]
             
             try:
-                # Create embeddings for the batch (more efficient than one at a time)
-                response = self.client.embeddings.create(
-                    model="text-embedding-3-small",
-                    input=batch_texts
-                )
-                
-                # Store each embedding in the vector store
-                for j, embedding_data in enumerate(response.data):
-                    chunk_idx = i + j
-                    if chunk_idx < len(chunks):
-                        embedding = embedding_data.embedding
-                        self.vector_store.add(embedding, chunks[chunk_idx])
-                        # Cache the embedding to avoid recomputation
-                        self.embedding_cache[chunks[chunk_idx][:100]] = embedding  # Use first 100 chars as key
+                # Create embeddings for the whole batch in one request
+                with span("openai.embeddings", kind=SPAN_KIND_CLIENT, inputs=len(batch)) as request_span:
+                    started = time.perf_counter()
+                    response = self.client.embeddings.create(
+                        model=EMBEDDING_MODEL,
+                        input=batch,
+                        dimensions=self.embedding_dimensions
+                    )
+                    record_usage("chat.index", EMBEDDING_MODEL, response.usage, started)
+                    if response.usage:
+                        request_span.set(prompt_tokens=response.usage.prompt_tokens)
+                for chunk, embedding_data in zip(batch, response.data):
+                    vectors[chunk] = np.asarray(embedding_data.embedding, dtype=np.float32)
                 
             except Exception as e:
-                st.error(f"Error creating embeddings for batch {i//batch_size + 1}: {str(e)}")
+                report("error", f"Error creating embeddings for batch {i//EMBEDDING_BATCH_SIZE + 1}: {str(e)}")
                 # Continue with the next batch despite errors
             
             # Update progress
-            progress = min(1.0, (i + batch_size) / len(chunks))
-            progress_bar.progress(progress)
-            
+            report_progress("chat.index", (i + len(batch)) / len(missing))
+        return vectors
+        
+    def export_index(self):
+        """The built index, frozen read-only, for other sessions' bots to attach_index() instead of re-embedding"""
+        self.vector_store.freeze()
+        self.chunks = tuple(self.chunks)
+        return {
+            "dimensions": self.embedding_dimensions,
+            "chunks": self.chunks,
+            "vector_store": self.vector_store,
+            "lexical_index": self.lexical_index,
+        }
+        
+    def attach_index(self, index) -> None:
+        """Answer from an index another session built for the same book (see export_index)"""
+        if index["dimensions"] != self.embedding_dimensions:
+            raise ValueError("The shared index was built with other embedding dimensions")
+        self.chunks = index["chunks"]
+        self.vector_store = index["vector_store"]
+        self.lexical_index = index["lexical_index"]
+        self.history.reset()
+        self.answer_cache = get_answer_cache(self._answer_cache_key())
         self.is_initialized = True
-        st.success(f"Chat engine ready! Processed {len(chunks)} chunks.")
+        report("success", f"Chat engine ready! Reusing this book's index ({len(self.vector_store)} chunks).")
+        
+    def _answer_cache_key(self) -> str:
+        # Answers are shared between sessions of the same tenant only
+        return f"{tenant_key(self.api_key)}/{document_key(self.chunks, self.embedding_dimensions)}"
         
-    def create_embedding(self, text: str) -> List[float]:
-        """Create an embedding vector for the given text with caching"""
-        # Check cache first using first 100 chars as key (for query text)
-        cache_key = text[:100] if len(text) > 100 else text
+    def create_embedding(self, text: str) -> Optional[np.ndarray]:
+        """Create an embedding vector for the given text with caching; None if the request failed"""
+        # Check cache first
+        cache_key = embedding_cache_key(text)
         if cache_key in self.embedding_cache:
+            self.embedding_cache.move_to_end(cache_key)
             return self.embedding_cache[cache_key]
             
         try:
-            response = self.client.embeddings.create(
-                model="text-embedding-3-small",
-                input=text
-            )
-            embedding = response.data[0].embedding
-            # Cache the result
+            with span("openai.embeddings", kind=SPAN_KIND_CLIENT, inputs=1) as request_span:
+                started = time.perf_counter()
+                response = self.client.embeddings.create(
+                    model=EMBEDDING_MODEL,
+                    input=text,
+                    dimensions=self.embedding_dimensions
+                )
+                record_usage("chat.query", EMBEDDING_MODEL, response.usage, started)
+                if response.usage:
+                    request_span.set(prompt_tokens=response.usage.prompt_tokens)
+            embedding = np.asarray(response.data[0].embedding, dtype=np.float32)
+            # Cache the result, evicting the least recently used query
             self.embedding_cache[cache_key] = embedding
+            while len(self.embedding_cache) > QUERY_EMBEDDING_CACHE_SIZE:
+                self.embedding_cache.popitem(last=False)
             return embedding
         except Exception as e:
-            st.error(f"Error creating embedding: {str(e)}")
-            # Return empty vector as fallback
-            return [0.0] * 1536  # Default embedding size
-        
-    def retrieve_context(self, query: str, top_k: int = 3) -> str:
-        """Retrieve relevant context for a query with optimized context length"""
-        # Create query embedding
-        query_embedding = self.create_embedding(query)
-        
-        # Search for relevant chunks
-        results = self.vector_store.search(query_embedding, top_k=top_k)
-        
-        # Calculate total context length
-        total_length = sum(len(text) for text, score in results)
-        
-        # If context is too large, reduce it by keeping higher-scoring chunks
-        max_context_chars = 8000  # Reasonable limit for context
-        if total_length > max_context_chars:
-            # Sort by score and keep only the highest-scoring chunks
-            results.sort(key=lambda x: x[1], reverse=True)
-            
-            # Keep adding chunks until we hit the limit
-            pruned_results = []
-            current_length = 0
-            for text, score in results:
-                if current_length + len(text) <= max_context_chars:
-                    pruned_results.append((text, score))
-                    current_length += len(text)
-                else:
-                    # If adding this chunk would exceed the limit, truncate it
-                    remaining_space = max_context_chars - current_length
-                    if remaining_space > 500:  # Only add if we can include a meaningful amount
-                        pruned_results.append((text[:remaining_space], score))
-                    break
-                    
-            results = pruned_results
-        
-        # Combine top chunks as context
-        context = "\n\n---\n\n".join([text for text, score in results])
+            report("error", f"Error creating embedding: {str(e)}")
+            # No fallback vector: a zero embedding would match nothing and must never be cached
+            return None
+
+    def _search_query(self, query: str):
+        """
+        (BM25 hits, keyword lookup?, query embedding). Lexical search is local;
+        obvious keyword lookups stop there without an embedding call. The
+        embedding is None for them and when the request failed.
+        """
+        lexical_hits = self.lexical_index.search(query, top_k=FUSION_CANDIDATES)
+        keyword_lookup = self.lexical_index.is_keyword_lookup(query, lexical_hits)
+        return lexical_hits, keyword_lookup, None if keyword_lookup else self.create_embedding(query)
+        
+    @traced("retrieve_context")
+    def retrieve_context(self, query: str, token_budget: int = CONTEXT_TOKEN_BUDGET, search=None) -> str:
+        """
+        Retrieve the most relevant book spans that fit the prompt token budget.
+        search: the query's _search_query result if the caller already has it
+        """
+        lexical_hits, keyword_lookup, query_embedding = search or self._search_query(query)
+        current_span().set(keyword_lookup=keyword_lookup)
+        if query_embedding is None:
+            candidates = [(self.chunks[i], score) for i, score in lexical_hits]
+        else:
+            # Fuse dense and BM25 rankings so exact names and numbers still surface
+            dense_hits = self.vector_store.search(query_embedding, top_k=FUSION_CANDIDATES)
+            candidates = reciprocal_rank_fusion([
+                [text for text, score in dense_hits],
+                [self.chunks[i] for i, score in lexical_hits],
+            ])
+        
+        # Pack whole spans by relevance per token, skipping near-duplicate windows
+        results = pack_context(candidates, token_budget=token_budget)
+        current_span().set(candidates=len(candidates), spans=len(results))
+        
+        # Combine selected chunks as context
+        context = CONTEXT_SEPARATOR.join([text for text, score in results])
         return context
     
+    @traced("answer_question")
     def answer_question(self, query: str, chat_history: List[Dict] = None) -> str:
         """Answer a question based on the book content"""
         if not self.is_initialized:
             return "Please upload a book first so I can answer questions about it."
         
+        # Standalone questions may reuse an answer another reader already got for this book
+        cacheable = self.answer_cache is not None and (not chat_history or is_standalone_question(query))
+        cached_answer = self.answer_cache.lookup_exact(query) if cacheable else None
+        if cached_answer is not None:
+            current_span().set(cache_hit=True)
+            return cached_answer
+
+        # Keyword lookups need no embedding, for the cache or for retrieval; other questions embed once
+        search = self._search_query(query)
+        query_embedding = search[2]
+        if cacheable:
+            cached_answer = self.answer_cache.lookup(query, query_embedding)
+            if cached_answer is not None:
+                current_span().set(cache_hit=True)
+                return cached_answer
+        
         # Get relevant context
-        context = self.retrieve_context(query)
+        context = self.retrieve_context(query, search=search)
         
         # Prepare messages with chat history if provided
         messages = [
@@ -189,31 +406,46 @@ class BookChatBot:
              {query}"""}
         ]
         
-        # Add chat history if provided
-        if chat_history:
-            # Insert history before the latest user question
-            messages = messages[:1] + chat_history + messages[1:]
+        # Add bounded chat history: recent turns verbatim, older ones as a running summary
+        history_messages = self.history.prompt_messages(chat_history)
+        # Insert history before the latest user question
+        messages = messages[:1] + history_messages + messages[1:]
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=messages,
-                temperature=0.5
-            )
+            with span("openai.chat", kind=SPAN_KIND_CLIENT, model="gpt-4o-mini") as request_span:
+                started = time.perf_counter()
+                response = self.client.chat.completions.create(
+                    model="gpt-4o-mini",
+                    messages=messages,
+                    temperature=0.5
+                )
+                record_usage("chat.answer", "gpt-4o-mini", response.usage, started)
+                if response.usage:
+                    request_span.set(prompt_tokens=response.usage.prompt_tokens,
+                                     completion_tokens=response.usage.completion_tokens)
             answer = response.choices[0].message.content
+            if cacheable and not history_messages:
+                # An answer shaped by this reader's conversation is never shared;
+                # without an embedding the answer still serves verbatim repeats
+                self.answer_cache.store(query, query_embedding, answer)
+            # Compress older turns in the background before the next question arrives
+            self.history.schedule_compaction(list(chat_history or []) + [
+                {"role": "user", "content": query},
+                {"role": "assistant", "content": answer},
+            ])
             return answer
         except Exception as e:
-            st.error(f"Error generating answer: {str(e)}")
+            report("error", f"Error generating answer: {str(e)}")
             return "I encountered an error when trying to answer your question. Please try again."
 
-# Helper function to create or get the chat bot from session state
-def get_chat_bot():
-    if 'book_chat_bot' not in st.session_state:
+# Helper function to create or get the chat bot from session state (st.session_state)
+def get_chat_bot(state):
+    if 'book_chat_bot' not in state:
         # Get API key from session state or environment
-        api_key = st.session_state.get('openai_api_key') or os.getenv("OPENAI_API_KEY")
+        api_key = state.get('openai_api_key') or os.getenv("OPENAI_API_KEY")
         if not api_key:
-            st.error("OpenAI API key not found. Please enter your API key in the sidebar.")
+            report("error", "OpenAI API key not found. Please enter your API key in the sidebar.")
             return None
-        st.session_state.book_chat_bot = BookChatBot(api_key)
+        state['book_chat_bot'] = BookChatBot(api_key)
     
-    return st.session_state.book_chat_bot 
\ No newline at end of file
+    return state['book_chat_bot'] 
\ No newline at end of file
@@ -0,0 +1,92 @@
+from functools import lru_cache
+from typing import List, Sequence, Tuple
+
+import tiktoken
+
+# Token budget for book excerpts in a chat prompt
+CONTEXT_TOKEN_BUDGET = 2000
+# Relevance vs. novelty trade-off for maximal marginal relevance (1.0 = relevance only)
+MMR_LAMBDA = 0.7
+# Spans sharing at least this fraction of their tokens with a chosen span are never added
+NEAR_DUPLICATE_THRESHOLD = 0.6
+CONTEXT_SEPARATOR = "\n\n---\n\n"
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer(model="gpt-4o-mini"):
+    """Shared tiktoken encoder; loading the BPE ranks is the expensive part"""
+    return tiktoken.encoding_for_model(model)
+
+
+def count_tokens(text: str, model="gpt-4o-mini") -> int:
+    """Exact prompt token count of a text for the given model"""
+    return len(get_tokenizer(model).encode(text))
+
+
+def _jaccard(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def pack_context(candidates: Sequence[Tuple[str, float]], token_budget: int = CONTEXT_TOKEN_BUDGET,
+                 mmr_lambda: float = MMR_LAMBDA, separator: str = CONTEXT_SEPARATOR,
+                 model="gpt-4o-mini") -> List[Tuple[str, float]]:
+    """
+    Choose whole spans that fit a token budget, best value per token first.
+
+    Each step picks the candidate with the highest MMR score per token: its
+    relevance (scores rescaled to 0..1) minus a penalty for overlap with spans
+    already chosen. Spans are never truncated; ones that no longer fit, and
+    near-duplicates of a chosen span, are skipped.
+
+    Args:
+        candidates: (text, relevance score) pairs from retrieval, any score scale
+        token_budget: Maximum tokens for the joined context, separators included
+        mmr_lambda: Weight of relevance against redundancy
+        separator: String placed between spans
+
+    Returns:
+        The selected (text, score) pairs in selection order
+    """
+    tokenizer = get_tokenizer(model)
+    # Drop exact duplicates, keeping the best score
+    best_scores = {}
+    for text, score in candidates:
+        if text and (text not in best_scores or score > best_scores[text]):
+            best_scores[text] = score
+    if not best_scores:
+        return []
+
+    texts = list(best_scores)
+    scores = [best_scores[text] for text in texts]
+    low, high = min(scores), max(scores)
+    relevance = [1.0 if high == low else (score - low) / (high - low) for score in scores]
+    token_ids = [tokenizer.encode(text) for text in texts]
+    token_sets = [frozenset(ids) for ids in token_ids]
+    separator_tokens = len(tokenizer.encode(separator))
+
+    selected = []
+    remaining = set(range(len(texts)))
+    used = 0
+    while remaining:
+        best, best_value = None, None
+        for i in remaining:
+            cost = len(token_ids[i]) + (separator_tokens if selected else 0)
+            if used + cost > token_budget:
+                continue
+            redundancy = max((_jaccard(token_sets[i], token_sets[j]) for j in selected), default=0.0)
+            if redundancy >= NEAR_DUPLICATE_THRESHOLD:
+                continue
+            mmr = mmr_lambda * relevance[i] - (1 - mmr_lambda) * redundancy
+            value = mmr / max(cost, 1)
+            # Every span that fits is taken eventually; MMR only decides the order
+            if best_value is None or value > best_value:
+                best, best_value = i, value
+        if best is None:
+            break
+        used += len(token_ids[best]) + (separator_tokens if selected else 0)
+        selected.append(best)
+        remaining.discard(best)
+
+    return [(texts[i], best_scores[texts[i]]) for i in selected]
@@ -0,0 +1,229 @@
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+import weakref
+
+from .memory_utils import deep_sizeof
+
+# Memory the shared artifacts may use before those of books no session has open are spilled to disk
+DOCUMENT_STORE_MEMORY_MB = float(os.getenv("DOCUMENT_STORE_MEMORY_MB", "512"))
+# A book no session has open is dropped (memory and disk) after this long unused
+DOCUMENT_STORE_IDLE_SECONDS = float(os.getenv("DOCUMENT_STORE_IDLE_SECONDS", "3600"))
+# Where spilled artifacts go; a private temporary directory, removed at exit, by default
+DOCUMENT_STORE_DIR = os.getenv("DOCUMENT_STORE_DIR")
+
+
+class _Artifact:
+    """One shared value: in memory (value) or spilled to disk (path)"""
+    __slots__ = ("value", "size", "path", "last_used", "spillable")
+
+    def __init__(self, value):
+        self.value = value
+        self.size = deep_sizeof(value)
+        self.path = None
+        self.last_used = time.monotonic()
+        self.spillable = True
+
+
+class _Document:
+    __slots__ = ("artifacts", "leases", "last_used", "locks")
+
+    def __init__(self):
+        self.artifacts = {}  # Name ("text", "summary", "chat_index") -> _Artifact
+        self.leases = 0
+        self.last_used = time.monotonic()
+        self.locks = {}  # Name -> lock held while get_or_create builds it
+
+
+class DocumentLease:
+    """
+    A session's hold on a book. The book's artifacts stay in memory while any
+    lease on it is open; release() (or garbage collection of the session
+    state holding the lease) gives it up.
+    """
+    def __init__(self, store, key):
+        self.key = key
+        self._finalizer = weakref.finalize(self, store._release, key)
+
+    def release(self):
+        self._finalizer()
+
+    @property
+    def released(self):
+        return not self._finalizer.alive
+
+
+class DocumentStore:
+    """
+    Artifacts of each uploaded book (extracted text, summary, chat index),
+    keyed by the PDF's hash and shared by every session that uploads it.
+
+    Values are shared, not copied: callers must treat them as read-only.
+    Books with an open lease stay in memory. When the store holds more than
+    memory_limit_bytes, artifacts of books nobody has open are pickled to
+    disk, least recently used first, and loaded back on the next get(); a
+    value that cannot be pickled stays in memory. Books nobody has opened
+    for idle_seconds are dropped.
+    """
+    def __init__(self, memory_limit_bytes=DOCUMENT_STORE_MEMORY_MB * 1024 * 1024, directory=DOCUMENT_STORE_DIR,
+                 idle_seconds=DOCUMENT_STORE_IDLE_SECONDS):
+        self.memory_limit_bytes = memory_limit_bytes
+        self.idle_seconds = idle_seconds
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix="book-documents-")
+            self._cleanup = weakref.finalize(self, shutil.rmtree, directory, True)
+        else:
+            os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self._documents = {}
+        self._lock = threading.RLock()  # Reentrant: a lease can be collected while the lock is held
+
+    def acquire(self, key):
+        """Open the book for a session; keep the returned lease (e.g. in session state) while using it"""
+        with self._lock:
+            document = self._documents.setdefault(key, _Document())
+            document.leases += 1
+            document.last_used = time.monotonic()
+            self._enforce_limits()
+        return DocumentLease(self, key)
+
+    def _release(self, key):
+        # Runs from a finalizer, possibly while this thread holds the lock: only count, the next call tidies up
+        with self._lock:
+            document = self._documents.get(key)
+            if document is not None:
+                document.leases -= 1
+                document.last_used = time.monotonic()
+
+    def get(self, key, name):
+        """The shared artifact, or None if no session has stored it yet"""
+        with self._lock:
+            document = self._documents.get(key)
+            artifact = None if document is None else document.artifacts.get(name)
+            if artifact is None:
+                return None
+            if artifact.value is None:
+                artifact.value = self._load(artifact)
+            artifact.last_used = document.last_used = time.monotonic()
+            value = artifact.value
+            self._enforce_limits()
+            return value
+
+    def put(self, key, name, value):
+        """Share value as the book's artifact name, replacing any earlier one; returns value"""
+        with self._lock:
+            document = self._documents.setdefault(key, _Document())
+            previous = document.artifacts.get(name)
+            if previous is not None:
+                self._remove_file(previous)
+            document.artifacts[name] = _Artifact(value)
+            document.last_used = time.monotonic()
+            self._enforce_limits()
+        return value
+
+    def get_or_create(self, key, name, factory):
+        """
+        The shared artifact, built with factory() if missing.
+
+        Sessions asking for the same missing artifact at once wait for a
+        single build. A factory that returns None stores nothing.
+        """
+        value = self.get(key, name)
+        if value is not None:
+            return value
+        with self._lock:
+            document = self._documents.setdefault(key, _Document())
+            build_lock = document.locks.setdefault(name, threading.Lock())
+        with build_lock:
+            value = self.get(key, name)
+            if value is None:
+                value = factory()
+                if value is not None:
+                    self.put(key, name, value)
+            return value
+
+    def discard(self, key, name):
+        """Forget one artifact, e.g. so a regenerated summary replaces it"""
+        with self._lock:
+            document = self._documents.get(key)
+            artifact = None if document is None else document.artifacts.pop(name, None)
+            if artifact is not None:
+                self._remove_file(artifact)
+
+    def stats(self):
+        """Books, open leases and bytes held in memory and on disk"""
+        with self._lock:
+            artifacts = [artifact for document in self._documents.values()
+                         for artifact in document.artifacts.values()]
+            return {
+                "documents": len(self._documents),
+                "leases": sum(document.leases for document in self._documents.values()),
+                "memory_bytes": sum(artifact.size for artifact in artifacts if artifact.value is not None),
+                "spilled_bytes": sum(artifact.size for artifact in artifacts if artifact.value is None),
+            }
+
+    def _enforce_limits(self):
+        """Drop idle books, then spill unleased artifacts until memory fits the limit (lock held)"""
+        now = time.monotonic()
+        for key, document in list(self._documents.items()):
+            if document.leases <= 0 and now - document.last_used > self.idle_seconds:
+                for artifact in document.artifacts.values():
+                    self._remove_file(artifact)
+                del self._documents[key]
+
+        in_memory = sum(artifact.size for document in self._documents.values()
+                        for artifact in document.artifacts.values() if artifact.value is not None)
+        if in_memory <= self.memory_limit_bytes:
+            return
+        candidates = sorted(
+            (artifact for document in self._documents.values() if document.leases <= 0
+             for artifact in document.artifacts.values() if artifact.value is not None and artifact.spillable),
+            key=lambda artifact: artifact.last_used)
+        for artifact in candidates:
+            if in_memory <= self.memory_limit_bytes:
+                break
+            if self._spill(artifact):
+                in_memory -= artifact.size
+
+    def _spill(self, artifact):
+        if artifact.path is None:
+            handle, path = tempfile.mkstemp(prefix="artifact-", suffix=".pickle", dir=self.directory)
+            try:
+                with os.fdopen(handle, "wb") as spill_file:
+                    pickle.dump(artifact.value, spill_file, protocol=pickle.HIGHEST_PROTOCOL)
+            except (pickle.PicklingError, TypeError, AttributeError, OSError):
+                # Not picklable or no disk space: keep it in memory
+                os.remove(path)
+                artifact.spillable = False
+                return False
+            artifact.path = path
+        artifact.value = None
+        return True
+
+    def _load(self, artifact):
+        with open(artifact.path, "rb") as spill_file:
+            return pickle.load(spill_file)
+
+    def _remove_file(self, artifact):
+        if artifact.path is not None:
+            try:
+                os.remove(artifact.path)
+            except OSError:
+                pass
+            artifact.path = None
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_document_store():
+    """The process-wide store shared by every session"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = DocumentStore()
+        return _store
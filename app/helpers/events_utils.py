@@ -0,0 +1,89 @@
+import contextvars
+import logging
+from contextlib import contextmanager
+
+# Event kinds helpers emit instead of calling Streamlit
+EVENT_MESSAGE = "message"
+EVENT_PROGRESS = "progress"
+EVENT_STATUS_START = "status_start"
+EVENT_STATUS_END = "status_end"
+# Message levels; the Streamlit adapter in app.py shows each with st.<level>
+MESSAGE_LEVELS = ("info", "success", "warning", "error")
+
+# Without a handler (scripts, benchmarks, tests) events are logged, so warnings and errors still surface
+logger = logging.getLogger("book_summary")
+_LOG_LEVELS = {"info": logging.INFO, "success": logging.INFO, "warning": logging.WARNING, "error": logging.ERROR}
+
+_handler = contextvars.ContextVar("event_handler", default=None)
+
+
+class Event:
+    """Something a helper reports: a message, a progress update or the start or end of a long step"""
+    __slots__ = ("kind", "text", "level", "task", "fraction")
+
+    def __init__(self, kind, text=None, level=None, task=None, fraction=None):
+        self.kind = kind
+        self.text = text
+        self.level = level  # Messages only
+        self.task = task  # Progress only: which progress bar, e.g. "chat.index"
+        self.fraction = fraction  # Progress only: 0.0 to 1.0
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__
+                           if getattr(self, name) is not None)
+        return f"Event({fields})"
+
+
+def set_event_handler(handler):
+    """
+    Send events emitted from now on in this context to handler(event).
+
+    Call once per Streamlit script run. Worker threads started through
+    TracingThreadPoolExecutor copy the context, so their events reach the
+    same handler; it is called on the emitting thread.
+    """
+    _handler.set(handler)
+
+
+@contextmanager
+def event_handler(handler):
+    """Send events emitted inside the block to handler(event)"""
+    token = _handler.set(handler)
+    try:
+        yield handler
+    finally:
+        _handler.reset(token)
+
+
+def emit(event):
+    handler = _handler.get()
+    if handler is not None:
+        handler(event)
+    elif event.kind == EVENT_MESSAGE:
+        logger.log(_LOG_LEVELS.get(event.level, logging.INFO), event.text)
+    elif event.kind == EVENT_PROGRESS:
+        logger.debug("%s: %.0f%%", event.task, event.fraction * 100)
+    else:
+        logger.debug("%s: %s", event.kind, event.text)
+
+
+def report(level, text):
+    """Show a message to the user: level is "info", "success", "warning" or "error" """
+    if level not in MESSAGE_LEVELS:
+        raise ValueError(f"level must be one of {MESSAGE_LEVELS}")
+    emit(Event(EVENT_MESSAGE, text, level=level))
+
+
+def report_progress(task, fraction, text=None):
+    """Update the progress of task (a name such as "chat.index") to fraction, between 0.0 and 1.0"""
+    emit(Event(EVENT_PROGRESS, text, task=task, fraction=min(1.0, max(0.0, fraction))))
+
+
+@contextmanager
+def status(text):
+    """Mark a long step, shown as a spinner in the app"""
+    emit(Event(EVENT_STATUS_START, text))
+    try:
+        yield
+    finally:
+        emit(Event(EVENT_STATUS_END, text))
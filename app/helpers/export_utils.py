@@ -0,0 +1,204 @@
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
+
+from .miro_utils import SHAPE_COLORS, build_mindmap_nodes, extract_structure_from_summary
+
+# Empty space around the laid-out map in the SVG canvas
+EXPORT_PADDING = 60
+# Font size per tree depth; deeper levels reuse the last entry
+EXPORT_FONT_SIZES = [20, 16, 13, 12]
+# Average glyph width as a share of the font size, used to wrap node text
+CHAR_WIDTH_RATIO = 0.55
+CONNECTOR_COLOR = "#9aa5b1"
+TEXT_COLOR = "#1a1a1a"
+
+
+def wrap_text(text, width, font_size):
+    """Split text into lines that fit a box of the given width"""
+    max_chars = max(int(width / (font_size * CHAR_WIDTH_RATIO)), 4)
+    lines, current = [], ""
+    for word in text.split():
+        while len(word) > max_chars:  # Break words longer than a whole line
+            if current:
+                lines.append(current)
+                current = ""
+            lines.append(word[:max_chars - 1] + "-")
+            word = word[max_chars - 1:]
+        candidate = f"{current} {word}".strip()
+        if len(candidate) <= max_chars:
+            current = candidate
+        else:
+            lines.append(current)
+            current = word
+    if current:
+        lines.append(current)
+    return lines
+
+
+def _node_text(node, depth):
+    font_size = EXPORT_FONT_SIZES[min(depth, len(EXPORT_FONT_SIZES) - 1)]
+    line_height = font_size * 1.25
+    lines = wrap_text(node["text"], node["width"] - 20, font_size)
+    max_lines = max(int((node["height"] - 12) // line_height), 1)
+    if len(lines) > max_lines:
+        lines = lines[:max_lines]
+        lines[-1] = lines[-1][:-1].rstrip() + "…"
+
+    first_y = node["y"] - line_height * (len(lines) - 1) / 2
+    spans = "".join(
+        f'<tspan x="{node["x"]:.1f}" y="{first_y + i * line_height:.1f}">{escape(line)}</tspan>'
+        for i, line in enumerate(lines)
+    )
+    weight = "bold" if depth < 2 else "normal"
+    return (f'<text font-size="{font_size}" font-weight="{weight}" text-anchor="middle" '
+            f'dominant-baseline="central">{spans}</text>')
+
+
+def mindmap_svg(nodes, padding=EXPORT_PADDING):
+    """Render laid-out mind map nodes (from build_mindmap_nodes) as a self-contained SVG"""
+    if not nodes:
+        return '<svg xmlns="http://www.w3.org/2000/svg" width="0" height="0"/>'
+    left = min(node["x"] - node["width"] / 2 for node in nodes) - padding
+    top = min(node["y"] - node["height"] / 2 for node in nodes) - padding
+    width = max(node["x"] + node["width"] / 2 for node in nodes) + padding - left
+    height = max(node["y"] + node["height"] / 2 for node in nodes) + padding - top
+
+    by_key = {node["key"]: node for node in nodes}
+    connectors = []
+    shapes = []
+    for node in nodes:
+        depth = 0 if node["parent"] is None else node["key"].count(".") + 1
+        parent = by_key.get(node["parent"])
+        if parent:
+            connectors.append(f'<line x1="{parent["x"]:.1f}" y1="{parent["y"]:.1f}" '
+                              f'x2="{node["x"]:.1f}" y2="{node["y"]:.1f}"/>')
+        fill = SHAPE_COLORS.get(node["color"], node["color"])
+        shapes.append(
+            f'<g><title>{escape(node["text"])}</title>'
+            f'<rect x="{node["x"] - node["width"] / 2:.1f}" y="{node["y"] - node["height"] / 2:.1f}" '
+            f'width="{node["width"]}" height="{node["height"]}" rx="16" fill="{fill}"/>'
+            f'{_node_text(node, depth)}</g>'
+        )
+
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="{left:.1f} {top:.1f} {width:.1f} {height:.1f}" '
+        f'width="{width:.0f}" height="{height:.0f}" font-family="Helvetica, Arial, sans-serif">\n'
+        f'<g stroke="{CONNECTOR_COLOR}" stroke-width="2">{"".join(connectors)}</g>\n'
+        f'<g fill="{TEXT_COLOR}">{"".join(shapes)}</g>\n'
+        f'</svg>'
+    )
+
+
+HTML_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+  html, body {{ margin: 0; height: 100%; background: #fafafa; overflow: hidden; }}
+  #map {{ width: 100%; height: 100%; cursor: grab; }}
+  #map svg {{ width: 100%; height: 100%; }}
+  #hint {{ position: fixed; bottom: 8px; left: 12px; font: 12px sans-serif; color: #888; }}
+</style>
+</head>
+<body>
+<div id="map">{svg}</div>
+<div id="hint">Scroll to zoom, drag to pan, double-click to reset</div>
+<script>
+(function () {{
+  var svg = document.querySelector("#map svg");
+  var initial = svg.getAttribute("viewBox").split(" ").map(Number);
+  var box = initial.slice();
+  var drag = null;
+  function apply() {{ svg.setAttribute("viewBox", box.join(" ")); }}
+  svg.addEventListener("wheel", function (event) {{
+    event.preventDefault();
+    var rect = svg.getBoundingClientRect();
+    var scale = event.deltaY > 0 ? 1.15 : 1 / 1.15;
+    var px = box[0] + box[2] * (event.clientX - rect.left) / rect.width;
+    var py = box[1] + box[3] * (event.clientY - rect.top) / rect.height;
+    box = [px - (px - box[0]) * scale, py - (py - box[1]) * scale, box[2] * scale, box[3] * scale];
+    apply();
+  }}, {{passive: false}});
+  svg.addEventListener("mousedown", function (event) {{ drag = [event.clientX, event.clientY]; }});
+  window.addEventListener("mouseup", function () {{ drag = null; }});
+  window.addEventListener("mousemove", function (event) {{
+    if (!drag) return;
+    var rect = svg.getBoundingClientRect();
+    var ratio = Math.max(box[2] / rect.width, box[3] / rect.height);
+    box[0] -= (event.clientX - drag[0]) * ratio;
+    box[1] -= (event.clientY - drag[1]) * ratio;
+    drag = [event.clientX, event.clientY];
+    apply();
+  }});
+  svg.addEventListener("dblclick", function () {{ box = initial.slice(); apply(); }});
+}})();
+</script>
+</body>
+</html>
+"""
+
+
+def mindmap_html(nodes, title="Mind Map"):
+    """Standalone HTML page embedding the SVG map with scroll-to-zoom and drag-to-pan"""
+    return HTML_TEMPLATE.format(title=escape(title), svg=mindmap_svg(nodes))
+
+
+def _tostring(root):
+    ET.indent(root)
+    return '<?xml version="1.0" encoding="UTF-8"?>\n' + ET.tostring(root, encoding="unicode") + "\n"
+
+
+def mindmap_opml(tree):
+    """OPML outline of a {"title", "children"} tree, for outliners and most mind map tools"""
+    opml = ET.Element("opml", version="2.0")
+    ET.SubElement(ET.SubElement(opml, "head"), "title").text = tree["title"]
+    body = ET.SubElement(opml, "body")
+
+    def add(parent, node):
+        element = ET.SubElement(parent, "outline", text=node["title"])
+        for child in node.get("children", []):
+            add(element, child)
+
+    add(body, tree)
+    return _tostring(opml)
+
+
+def mindmap_freemind(tree):
+    """FreeMind (.mm) document of a {"title", "children"} tree; Freeplane and XMind import it too"""
+    root = ET.Element("map", version="1.0.1")
+
+    def add(parent, node, depth, position=None):
+        attributes = {"TEXT": node["title"]}
+        if position:
+            attributes["POSITION"] = position
+        element = ET.SubElement(parent, "node", attributes)
+        for index, child in enumerate(node.get("children", [])):
+            # FreeMind places first-level branches on alternating sides of the root
+            side = ("right" if index % 2 == 0 else "left") if depth == 0 else None
+            add(element, child, depth + 1, side)
+
+    add(root, tree, 0)
+    return _tostring(root)
+
+
+def export_mindmap(summary_text):
+    """
+    Build every offline rendering of the summary's mind map.
+
+    Returns a dict with "svg", "html", "opml" and "mm" documents as strings,
+    plus the laid-out "nodes", or None when the summary has no structure.
+    """
+    structure = extract_structure_from_summary(summary_text)
+    if not structure["central_topic"]:
+        return None
+    tree = structure["tree"]
+    tree = dict(tree, title=structure["central_topic"])
+    nodes = build_mindmap_nodes(structure)
+    return {
+        "nodes": nodes,
+        "svg": mindmap_svg(nodes),
+        "html": mindmap_html(nodes, title=tree["title"]),
+        "opml": mindmap_opml(tree),
+        "mm": mindmap_freemind(tree),
+    }
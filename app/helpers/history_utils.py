@@ -0,0 +1,140 @@
+import threading
+import time
+from typing import Dict, List, Optional
+
+from .context_utils import count_tokens
+from .ledger_utils import record_usage
+from .tracing_utils import SPAN_KIND_CLIENT, TracingThreadPoolExecutor, span
+
+# Most recent user/assistant turns always sent verbatim
+HISTORY_KEEP_TURNS = 3
+# Once the verbatim history exceeds this many tokens, older turns are folded into the summary
+HISTORY_TOKEN_BUDGET = 1500
+SUMMARY_MAX_TOKENS = 300
+
+COMPRESS_PROMPT = """
+You maintain a running summary of a conversation between a reader and an assistant about a book.
+
+Current summary:
+{summary}
+
+New messages to fold in:
+{messages}
+
+Write the updated summary in at most {max_words} words. Keep the questions asked, the answers given,
+names, numbers and anything the reader said about themselves or their goals. Do not add new information.
+"""
+
+# Shared worker pool for background compression; compression never runs on the request path
+_executor = TracingThreadPoolExecutor(max_workers=2, thread_name_prefix="history-compress")
+
+
+def _format_messages(messages: List[Dict]) -> str:
+    return "\n".join(f"{message['role']}: {message['content']}" for message in messages)
+
+
+class ChatHistoryManager:
+    """
+    Bounded chat history: the last few turns verbatim plus a rolling summary of older ones.
+
+    Compression runs in a background thread between turns. Until it finishes,
+    prompt_messages drops the oldest unsummarized messages instead of waiting,
+    so the prompt stays within budget either way.
+    """
+    def __init__(self, client, keep_turns=HISTORY_KEEP_TURNS, token_budget=HISTORY_TOKEN_BUDGET,
+                 model="gpt-4o-mini"):
+        self.client = client
+        self.keep_turns = keep_turns
+        self.token_budget = token_budget
+        self.model = model
+        self.summary = ""
+        self.summarized_count = 0  # Leading messages already folded into the summary
+        self._lock = threading.RLock()
+        self._pending = None
+        self._generation = 0  # Bumped on reset so stale background results are discarded
+
+    def reset(self) -> None:
+        with self._lock:
+            self.summary = ""
+            self.summarized_count = 0
+            self._pending = None
+            self._generation += 1
+
+    def _verbatim(self, messages: List[Dict]) -> List[Dict]:
+        # A shorter history than what we summarized means the chat was cleared
+        if len(messages) < self.summarized_count:
+            self.reset()
+        return messages[self.summarized_count:]
+
+    def prompt_messages(self, messages: Optional[List[Dict]]) -> List[Dict]:
+        """Summary plus recent messages for the next request, bounded by the token budget"""
+        if not messages:
+            return []
+        with self._lock:
+            summary = self.summary
+            verbatim = self._verbatim(messages)
+
+        # If compression is still running, drop the oldest turns rather than block
+        counts = [count_tokens(message["content"], self.model) for message in verbatim]
+        total = sum(counts)
+        start = 0
+        while len(verbatim) - start > self.keep_turns * 2 and total > self.token_budget:
+            total -= counts[start]
+            start += 1
+        verbatim = verbatim[start:]
+
+        history = [{"role": message["role"], "content": message["content"]} for message in verbatim]
+        if summary:
+            history.insert(0, {"role": "system", "content": f"Summary of the earlier conversation: {summary}"})
+        return history
+
+    def schedule_compaction(self, messages: List[Dict]) -> None:
+        """Fold older turns into the summary in the background if the budget is exceeded"""
+        with self._lock:
+            if self._pending is not None and not self._pending.done():
+                return
+            verbatim = self._verbatim(messages)
+            fold_count = len(verbatim) - self.keep_turns * 2
+            if fold_count <= 0 or self._count(verbatim) <= self.token_budget:
+                return
+            to_fold = [dict(message) for message in verbatim[:fold_count]]
+            self._pending = _executor.submit(self._compact, self.summary, to_fold, self._generation)
+
+    def wait(self, timeout=None) -> None:
+        """Block until a running compaction finishes (used by scripts and benchmarks)"""
+        pending = self._pending
+        if pending is not None:
+            pending.result(timeout=timeout)
+
+    def _compact(self, summary: str, to_fold: List[Dict], generation: int) -> None:
+        with span("history.compact", messages=len(to_fold)) as compact_span:
+            try:
+                with span("openai.chat", kind=SPAN_KIND_CLIENT, model=self.model) as request_span:
+                    started = time.perf_counter()
+                    response = self.client.chat.completions.create(
+                        model=self.model,
+                        messages=[{"role": "user", "content": COMPRESS_PROMPT.format(
+                            summary=summary or "(none yet)",
+                            messages=_format_messages(to_fold),
+                            max_words=SUMMARY_MAX_TOKENS * 3 // 4,
+                        )}],
+                        temperature=0.3,
+                        max_tokens=SUMMARY_MAX_TOKENS,
+                    )
+                    record_usage("chat.history", self.model, response.usage, started)
+                    if response.usage:
+                        request_span.set(prompt_tokens=response.usage.prompt_tokens,
+                                         completion_tokens=response.usage.completion_tokens)
+                new_summary = response.choices[0].message.content.strip()
+            except Exception as e:
+                # Keep the old summary; the next turn will try again
+                compact_span.record_error(e)
+                return
+        with self._lock:
+            # Ignore the result if the chat was reset while we were summarizing
+            if self._generation == generation:
+                self.summary = new_summary
+                self.summarized_count += len(to_fold)
+
+    def _count(self, messages: List[Dict]) -> int:
+        return sum(count_tokens(message["content"], self.model) for message in messages)
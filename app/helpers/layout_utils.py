@@ -0,0 +1,182 @@
+import numpy as np
+
+# Empty space kept around every node, in board units
+LAYOUT_MARGIN = 40.0
+# Extra radial distance between consecutive rings of the tree
+RING_GAP = 300.0
+MAX_RESOLVE_ITERATIONS = 50
+# Factor every ring is spread by when pushing pairs apart leaves overlaps
+RING_GROWTH = 1.25
+
+
+def flatten_tree(tree):
+    """
+    Flatten a {"title", "children"} tree into depth-first arrays.
+
+    Returns (nodes, parents, depths): the node dicts in depth-first order, the
+    index of each node's parent (-1 for the root) and each node's depth.
+    Siblings are contiguous and keep their order.
+    """
+    nodes, parents, depths = [], [], []
+    stack = [(tree, -1, 0)]
+    while stack:
+        node, parent, depth = stack.pop()
+        index = len(nodes)
+        nodes.append(node)
+        parents.append(parent)
+        depths.append(depth)
+        for child in reversed(node.get("children", [])):
+            stack.append((child, index, depth + 1))
+    return nodes, np.asarray(parents, dtype=np.int64), np.asarray(depths, dtype=np.int64)
+
+
+def leaf_counts(parents, depths):
+    """Number of leaves under every node (a leaf counts itself)"""
+    count = len(parents)
+    has_children = np.zeros(count, dtype=bool)
+    has_children[parents[parents >= 0]] = True
+    leaves = (~has_children).astype(np.int64)
+    for depth in range(int(depths.max()), 0, -1):
+        level = np.flatnonzero(depths == depth)
+        np.add.at(leaves, parents[level], leaves[level])
+    return leaves
+
+
+def angular_wedges(parents, depths, leaves):
+    """
+    Start angle and angular span of every node's wedge.
+
+    The root owns the full circle; each child gets a share of its parent's
+    wedge proportional to its leaf count, in sibling order.
+    """
+    count = len(parents)
+    starts = np.zeros(count)
+    spans = np.zeros(count)
+    spans[0] = 2 * np.pi
+    for depth in range(1, int(depths.max()) + 1):
+        level = np.flatnonzero(depths == depth)  # Depth-first order keeps siblings grouped
+        level_parents = parents[level]
+        level_spans = spans[level_parents] * leaves[level] / leaves[level_parents]
+
+        # Exclusive running sum of spans within each sibling group
+        running = np.cumsum(level_spans)
+        group_first = np.r_[True, level_parents[1:] != level_parents[:-1]]
+        first_index = np.maximum.accumulate(np.where(group_first, np.arange(len(level)), 0))
+        offsets = running - level_spans - (running[first_index] - level_spans[first_index])
+
+        starts[level] = starts[level_parents] + offsets
+        spans[level] = level_spans
+    return starts, spans
+
+
+def ring_radii(depths, spans, widths, heights, margin=LAYOUT_MARGIN, ring_gap=RING_GAP):
+    """
+    Radius of every ring, large enough that no two nodes can overlap.
+
+    Each node is treated as a circle around its box plus margin. Within a ring the chord
+    between neighboring wedge centers must fit that circle; between rings the
+    radial step must fit the larger circles of both rings.
+    """
+    diameters = np.hypot(widths + margin, heights + margin)
+    max_depth = int(depths.max())
+    radii = np.zeros(max_depth + 1)
+    ring_diameter = np.zeros(max_depth + 1)
+    ring_diameter[0] = diameters[depths == 0].max()
+    for depth in range(1, max_depth + 1):
+        level = depths == depth
+        ring_diameter[depth] = diameters[level].max()
+        # chord = 2 r sin(span / 2) >= diameter for the narrowest wedge
+        half_angles = np.minimum(spans[level], np.pi) / 2
+        chord_radius = (diameters[level] / (2 * np.sin(half_angles))).max()
+        step_radius = radii[depth - 1] + (ring_diameter[depth - 1] + ring_diameter[depth]) / 2 + ring_gap
+        radii[depth] = max(chord_radius, step_radius)
+    return radii
+
+
+def find_overlaps(x, y, widths, heights, margin=0.0):
+    """
+    Index pairs (i, j), i < j, of boxes that overlap, with margin added around each box.
+
+    Sweeps boxes sorted by left edge and compares each with the next k-th box
+    in one vectorized step per k, dropping boxes once they are out of x-range,
+    so the cost follows how many boxes share an x-range rather than n squared.
+    """
+    half_w = widths / 2 + margin / 2
+    half_h = heights / 2 + margin / 2
+    order = np.argsort(x - half_w, kind="stable")
+    left = (x - half_w)[order]
+    right = (x + half_w)[order]
+    bottom = (y - half_h)[order]
+    top = (y + half_h)[order]
+
+    pairs = []
+    # Boxes whose x-range still reaches the box k places further along
+    active = np.arange(len(order) - 1)
+    k = 1
+    while len(active):
+        active = active[active + k < len(order)]
+        active = active[left[active + k] < right[active]]
+        hits = active[(bottom[active + k] < top[active]) & (bottom[active] < top[active + k])]
+        if len(hits):
+            pairs.append(np.stack([order[hits], order[hits + k]], axis=1))
+        k += 1
+    if not pairs:
+        return np.zeros((0, 2), dtype=np.int64)
+    return np.sort(np.concatenate(pairs), axis=1)
+
+
+def resolve_overlaps(x, y, widths, heights, depths, margin=LAYOUT_MARGIN, max_iterations=MAX_RESOLVE_ITERATIONS):
+    """
+    Push overlapping nodes apart by moving the deeper one of each pair outward.
+
+    Moves are radial (away from the root at the origin) so branches keep
+    their direction. Returns the adjusted (x, y); overlaps can remain after
+    max_iterations (radial_layout spreads the rings until none do).
+    """
+    x, y = x.astype(float).copy(), y.astype(float).copy()
+    for _ in range(max_iterations):
+        pairs = find_overlaps(x, y, widths, heights, margin)
+        if len(pairs) == 0:
+            break
+        first, second = pairs[:, 0], pairs[:, 1]
+        movers = np.where(depths[second] >= depths[first], second, first)
+        movers = movers[movers != 0]  # The root stays at the origin
+        if len(movers) == 0:
+            break
+        distance = np.hypot(x[movers], y[movers])
+        distance[distance == 0] = 1.0
+        step = (np.hypot(widths[movers], heights[movers]) + margin) / 2
+        # A node in several pairs is pushed once per iteration
+        movers, unique_index = np.unique(movers, return_index=True)
+        step, distance = step[unique_index], distance[unique_index]
+        x[movers] += x[movers] / distance * step
+        y[movers] += y[movers] / distance * step
+    return x, y
+
+
+def radial_layout(parents, depths, widths, heights, margin=LAYOUT_MARGIN, ring_gap=RING_GAP):
+    """
+    Positions for a tree given as depth-first parent and depth arrays.
+
+    The root sits at the origin, each depth on its own ring, and every
+    subtree inside an angular wedge sized by its leaf count. Returns (x, y)
+    arrays of node centers with no overlapping boxes.
+    """
+    widths = np.asarray(widths, dtype=float)
+    heights = np.asarray(heights, dtype=float)
+    if len(parents) == 1:
+        return np.zeros(1), np.zeros(1)
+
+    leaves = leaf_counts(parents, depths)
+    starts, spans = angular_wedges(parents, depths, leaves)
+    radii = ring_radii(depths, spans, widths, heights, margin, ring_gap)
+
+    angles = starts + spans / 2
+    x = radii[depths] * np.cos(angles)
+    y = radii[depths] * np.sin(angles)
+    x[0] = y[0] = 0.0
+    x, y = resolve_overlaps(x, y, widths, heights, depths, margin)
+    # Pushing pairs apart can stall in dense trees; spreading every ring outward always ends it
+    while len(find_overlaps(x, y, widths, heights, margin)):
+        x, y = resolve_overlaps(x * RING_GROWTH, y * RING_GROWTH, widths, heights, depths, margin)
+    return x, y
@@ -0,0 +1,238 @@
+import contextlib
+import contextvars
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+# SQLite file recording every OpenAI call; set USAGE_LEDGER=0 to turn the ledger off
+LEDGER_PATH = os.getenv("USAGE_LEDGER", os.path.join(os.path.expanduser("~"), ".cache", "book-summary-app",
+                                                     "usage.sqlite3"))
+LEDGER_ENABLED = LEDGER_PATH != "0"
+# Seconds aggregates are reused: every rerun of every session shows the usage panel
+AGGREGATE_CACHE_SECONDS = 30
+
+# USD per million (prompt, completion) tokens, for spend estimates
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "text-embedding-3-small": (0.02, 0.0),
+}
+
+# Columns the aggregate queries can group by
+GROUPINGS = {
+    "document": "document",
+    "stage": "stage",
+    "model": "model",
+    "day": "date(created_at, 'unixepoch')",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    stage TEXT NOT NULL,
+    model TEXT NOT NULL,
+    document TEXT,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    total_tokens INTEGER NOT NULL,
+    latency_ms REAL NOT NULL,
+    cost_usd REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS usage_created_at ON usage (created_at);
+CREATE INDEX IF NOT EXISTS usage_document ON usage (document);
+"""
+
+_document = contextvars.ContextVar("ledger_document", default=None)
+
+
+def document_hash(data: bytes) -> str:
+    """Identity of a book in the ledger: a digest of the uploaded file"""
+    return hashlib.sha1(data).hexdigest()
+
+
+def set_document(digest):
+    """Attribute calls made from now on in this context (one Streamlit session) to a book"""
+    _document.set(digest)
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1e6
+
+
+def _percentile(values, fraction):
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+class UsageLedger:
+    """
+    Token usage, latency and estimated cost of every OpenAI call, in SQLite.
+
+    One connection is shared by all threads behind a lock; writes are a single
+    INSERT, so recording costs well under a millisecond next to the API call.
+    Aggregates are read on a connection of their own (WAL lets it run beside
+    the writer, so reports never hold up record()) and reused for
+    cache_seconds; treat the returned rows as read-only.
+    """
+    def __init__(self, path=LEDGER_PATH, cache_seconds=AGGREGATE_CACHE_SECONDS):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(SCHEMA)
+        self.cache_seconds = cache_seconds
+        self._aggregates = {}  # (query, arguments) -> (computed at, result)
+        self._aggregates_lock = threading.Lock()
+
+    def record(self, stage, model, prompt_tokens, completion_tokens, latency_seconds, document=None):
+        row = (time.time(), stage, model, document, prompt_tokens, completion_tokens,
+               prompt_tokens + completion_tokens, latency_seconds * 1000,
+               estimate_cost(model, prompt_tokens, completion_tokens))
+        with self._lock:
+            self._connection.execute(
+                "INSERT INTO usage (created_at, stage, model, document, prompt_tokens, completion_tokens, "
+                "total_tokens, latency_ms, cost_usd) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+
+    def _where(self, since=None, document=None):
+        clauses, params = [], []
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        if document is not None:
+            clauses.append("document = ?")
+            params.append(document)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    @contextlib.contextmanager
+    def _reader(self):
+        if self.path == ":memory:":
+            # Another connection would open another, empty database
+            with self._lock:
+                yield self._connection
+            return
+        connection = sqlite3.connect(self.path)
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def _cached(self, query, arguments, compute):
+        key = (query,) + arguments
+        now = time.monotonic()
+        with self._aggregates_lock:
+            cached = self._aggregates.get(key)
+        if cached is not None and now - cached[0] < self.cache_seconds:
+            return cached[1]
+        result = compute()
+        with self._aggregates_lock:
+            self._aggregates = {key: entry for key, entry in self._aggregates.items()
+                                if now - entry[0] < self.cache_seconds}
+            self._aggregates[key] = (now, result)
+        return result
+
+    def totals(self, group_by="stage", since=None, document=None):
+        """
+        Calls, tokens, cost and p50/p95 latency per document, stage, model or day.
+
+        since is an epoch timestamp; rows come back as dicts, biggest spend first.
+        """
+        if group_by not in GROUPINGS:
+            raise ValueError(f"group_by must be one of {sorted(GROUPINGS)}")
+        return self._cached("totals", (group_by, since, document),
+                            lambda: self._totals(GROUPINGS[group_by], group_by, since, document))
+
+    def _totals(self, column, group_by, since, document):
+        where, params = self._where(since, document)
+        with self._reader() as connection:
+            rows = connection.execute(
+                f"SELECT {column}, COUNT(*), SUM(prompt_tokens), SUM(completion_tokens), SUM(total_tokens), "
+                f"SUM(cost_usd) FROM usage{where} GROUP BY 1 ORDER BY 6 DESC", params).fetchall()
+            latencies = {}
+            for key, latency in connection.execute(
+                    f"SELECT {column}, latency_ms FROM usage{where} ORDER BY 2", params):
+                latencies.setdefault(key, []).append(latency)
+        return [{
+            group_by: key,
+            "calls": calls,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": total_tokens,
+            "cost_usd": cost,
+            "p50_ms": _percentile(latencies.get(key, []), 0.50),
+            "p95_ms": _percentile(latencies.get(key, []), 0.95),
+        } for key, calls, prompt_tokens, completion_tokens, total_tokens, cost in rows]
+
+    def summary(self, since=None, document=None):
+        """Overall calls, tokens, cost and latency percentiles"""
+        return self._cached("summary", (since, document), lambda: self._summary(since, document))
+
+    def _summary(self, since, document):
+        where, params = self._where(since, document)
+        with self._reader() as connection:
+            calls, tokens, cost = connection.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(total_tokens), 0), COALESCE(SUM(cost_usd), 0) FROM usage{where}",
+                params).fetchone()
+            latencies = [row[0] for row in connection.execute(
+                f"SELECT latency_ms FROM usage{where} ORDER BY 1", params)]
+        return {"calls": calls, "total_tokens": tokens, "cost_usd": cost,
+                "p50_ms": _percentile(latencies, 0.50), "p95_ms": _percentile(latencies, 0.95)}
+
+    def clear(self):
+        with self._lock:
+            self._connection.execute("DELETE FROM usage")
+        with self._aggregates_lock:
+            self._aggregates = {}
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def get_ledger():
+    """The process-wide ledger, or None when it is disabled or cannot be opened"""
+    global _ledger, LEDGER_ENABLED
+    if not LEDGER_ENABLED:
+        return None
+    with _ledger_lock:
+        if _ledger is None:
+            try:
+                _ledger = UsageLedger()
+            except (sqlite3.Error, OSError):
+                # A read-only home directory must not break summarizing
+                LEDGER_ENABLED = False
+                return None
+        return _ledger
+
+
+def record_usage(stage, model, usage, started):
+    """
+    Record a response's usage block (None is ignored); started is the time.perf_counter() before the call.
+
+    Never raises: a failed write only loses the ledger row.
+    """
+    if usage is None:
+        return
+    ledger = get_ledger()
+    if ledger is None:
+        return
+    try:
+        ledger.record(stage, model, getattr(usage, "prompt_tokens", 0) or 0,
+                      getattr(usage, "completion_tokens", 0) or 0, time.perf_counter() - started, _document.get())
+    except sqlite3.Error:
+        pass
+
+
+def day_start(days_ago=0):
+    """Epoch timestamp of UTC midnight days_ago days back, for the since= filters"""
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    return today.timestamp() - days_ago * 86400
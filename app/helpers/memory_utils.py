@@ -0,0 +1,163 @@
+import os
+import sys
+import threading
+import tracemalloc
+import types
+from contextlib import contextmanager
+
+from .tracing_utils import SPAN_KIND_CLIENT, add_span_listener, current_span
+
+# Set MEMORY_TRACE=1 to record tracemalloc peak and retained bytes on every pipeline stage span
+MEMORY_TRACE = os.getenv("MEMORY_TRACE", "0") != "0"
+# Stack depth kept per allocation; more frames give better top_allocations() at a higher cost
+MEMORY_TRACE_FRAMES = int(os.getenv("MEMORY_TRACE_FRAMES", "1"))
+
+# Objects from these modules are sized member by member; anything else is sized shallowly
+HELPERS_PACKAGE = __name__.rpartition(".")[0]
+# Never counted: shared code and type objects, not per-session data
+_SKIPPED_TYPES = (types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType, type)
+
+_lock = threading.Lock()
+_open_stages = []  # Records of the stages being measured, outermost first
+
+
+def _start_tracing():
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(MEMORY_TRACE_FRAMES)
+
+
+def _enter(name):
+    with _lock:
+        current, peak = tracemalloc.get_traced_memory()
+        # reset_peak() is process-wide, so fold the peak so far into the enclosing stages first
+        for record in _open_stages:
+            record["_peak"] = max(record["_peak"], peak)
+        tracemalloc.reset_peak()
+        record = {"stage": name, "_start": current, "_peak": current}
+        _open_stages.append(record)
+        return record
+
+
+def _exit(record):
+    with _lock:
+        current, peak = tracemalloc.get_traced_memory()
+        for other in _open_stages:
+            other["_peak"] = max(other["_peak"], peak)
+        # By identity: two records can compare equal
+        del _open_stages[next(index for index, other in enumerate(_open_stages) if other is record)]
+        record["peak_bytes"] = record.pop("_peak") - record["_start"]
+        record["retained_bytes"] = current - record.pop("_start")
+        record["traced_bytes"] = current
+    return record
+
+
+@contextmanager
+def stage_memory(name, results=None):
+    """
+    Measure the extra memory a block allocates at its peak and still holds at the end.
+
+    Starts tracemalloc if needed. Yields a dict that gets "peak_bytes",
+    "retained_bytes" and "traced_bytes" on exit and is appended to results.
+    tracemalloc is process-wide, so concurrent sessions show up in each
+    other's numbers; measure with one session at a time.
+    """
+    _start_tracing()
+    record = _enter(name)
+    try:
+        yield record
+    finally:
+        _exit(record)
+        current_span().set(**{"memory.peak_bytes": record["peak_bytes"],
+                              "memory.retained_bytes": record["retained_bytes"]})
+        if results is not None:
+            results.append(record)
+
+
+def _on_span_start(span):
+    if span.kind != SPAN_KIND_CLIENT:
+        span._memory = _enter(span.name)
+
+
+def _on_span_end(span):
+    record = getattr(span, "_memory", None)
+    if record is not None:
+        _exit(record)
+        span.set(**{"memory.peak_bytes": record["peak_bytes"], "memory.retained_bytes": record["retained_bytes"]})
+
+
+if MEMORY_TRACE:
+    _start_tracing()
+    add_span_listener(_on_span_start, _on_span_end)
+
+
+def top_allocations(limit=10):
+    """Source lines holding the most traced memory, as (location, bytes, blocks)"""
+    if not tracemalloc.is_tracing():
+        return []
+    statistics = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ]).statistics("lineno")
+    return [(f"{os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}", stat.size, stat.count)
+            for stat in statistics[:limit]]
+
+
+def deep_sizeof(obj, seen=None):
+    """
+    Approximate bytes held by obj: containers and this package's objects are followed.
+
+    Other objects (API clients, locks, numpy arrays) count their own
+    sys.getsizeof only; for arrays that includes the data buffer, while
+    memory-mapped and view arrays count just their header. seen is shared
+    between calls to avoid counting shared objects twice.
+    """
+    seen = set() if seen is None else seen
+    total = 0
+    pending = [obj]
+    while pending:
+        item = pending.pop()
+        if id(item) in seen or isinstance(item, _SKIPPED_TYPES):
+            continue
+        seen.add(id(item))
+        try:
+            total += sys.getsizeof(item)
+        except TypeError:
+            continue
+        if isinstance(item, dict):
+            pending.extend(item.keys())
+            pending.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            pending.extend(item)
+        elif type(item).__module__.startswith(HELPERS_PACKAGE):
+            if hasattr(item, "__dict__"):
+                pending.append(vars(item))
+            for slot in getattr(type(item), "__slots__", ()):
+                if hasattr(item, slot):
+                    pending.append(getattr(item, slot))
+    return total
+
+
+def session_memory_report(state):
+    """Bytes held per session state key, largest first, as a list of dicts"""
+    seen = set()
+    rows = [{"key": str(key), "type": type(value).__name__, "bytes": deep_sizeof(value, seen)}
+            for key, value in state.to_dict().items()]
+    return sorted(rows, key=lambda row: row["bytes"], reverse=True)
+
+
+def process_memory():
+    """Resident set size now and at its peak, in bytes (Linux /proc, else getrusage)"""
+    try:
+        with open("/proc/self/status") as handle:
+            fields = dict(line.split(":", 1) for line in handle if ":" in line)
+        return {"rss_bytes": int(fields["VmRSS"].split()[0]) * 1024,
+                "peak_rss_bytes": int(fields["VmHWM"].split()[0]) * 1024}
+    except (OSError, KeyError, ValueError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return {"rss_bytes": None, "peak_rss_bytes": None}
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {"rss_bytes": None, "peak_rss_bytes": peak if sys.platform == "darwin" else peak * 1024}
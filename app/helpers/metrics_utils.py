@@ -0,0 +1,242 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .cache_utils import answer_cache_stats
+from .tracing_utils import SPAN_KIND_CLIENT, STATUS_ERROR, TracingThreadPoolExecutor, add_span_listener
+
+# Port of the /metrics endpoint (Prometheus text format); unset or 0 keeps it off
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0") or 0)
+METRICS_HOST = os.getenv("METRICS_HOST", "0.0.0.0")
+# Histogram buckets in seconds; LLM calls and whole stages run far past the usual 10 s top bucket
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """Base metric; with a callback the values are read fresh at every scrape instead"""
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback  # Returns {label values tuple: value}
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        if self.callback is not None:
+            return [(self.name, key, (), value) for key, value in sorted(self.callback().items())]
+        with self._lock:
+            return [(self.name, key, (), value) for key, value in sorted(self._values.items())]
+
+    def exposition(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for name, key, extra, value in self.samples():
+            lines.append(f"{name}{_labels(self.labelnames, key, extra)} {_number(value)}")
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DURATION_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, counts):
+                    samples.append((f"{self.name}_bucket", key, (("le", _number(bound)),), count))
+                samples.append((f"{self.name}_sum", key, (), total))
+                samples.append((f"{self.name}_count", key, (), counts[-1]))
+        return samples
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def exposition(self):
+        """All metrics in the Prometheus text exposition format"""
+        return "\n".join(metric.exposition() for metric in self._metrics) + "\n"
+
+
+registry = MetricsRegistry()
+
+STAGE_DURATION = registry.register(Histogram(
+    "book_summary_stage_duration_seconds", "Duration of pipeline stages (extraction, chunking, summary, ...)",
+    ["stage", "outcome"]))
+EXTERNAL_CALLS = registry.register(Counter(
+    "book_summary_external_calls_total", "OpenAI and Miro requests by outcome (ok, error, throttled)",
+    ["service", "operation", "outcome"]))
+EXTERNAL_DURATION = registry.register(Histogram(
+    "book_summary_external_call_duration_seconds", "Duration of OpenAI and Miro requests, including retries",
+    ["service", "operation"]))
+EXTERNAL_IN_FLIGHT = registry.register(Gauge(
+    "book_summary_external_calls_in_flight", "OpenAI and Miro requests currently running", ["service"]))
+EXTERNAL_RETRIES = registry.register(Counter(
+    "book_summary_external_call_retries_total", "Client-side retries of external requests", ["service"]))
+EXTERNAL_THROTTLED = registry.register(Counter(
+    "book_summary_external_call_throttled_total", "Responses rejected with 429 Too Many Requests", ["service"]))
+TOKENS = registry.register(Counter(
+    "book_summary_tokens_total", "OpenAI tokens used", ["operation", "type"]))
+registry.register(Gauge(
+    "book_summary_executor_queue_depth", "Tasks waiting for a worker thread", ["pool"],
+    callback=lambda: _queue_depths()))
+registry.register(Counter(
+    "book_summary_answer_cache_lookups_total", "Chat answer cache lookups by result", ["result"],
+    callback=lambda: {(result,): count for result, count in answer_cache_stats().items()}))
+
+
+def _queue_depths():
+    depths = {}
+    for executor in list(TracingThreadPoolExecutor.instances):
+        depths[(executor.name,)] = depths.get((executor.name,), 0) + executor.queued
+    return depths
+
+
+def _service(span):
+    # External call spans are named "<service>.<operation>", e.g. "openai.chat" or "miro.request"
+    return span.name.split(".", 1)[0]
+
+
+def _outcome(span):
+    if span.attributes.get("http.status_code") == 429 or "RateLimitError" in span.status_message:
+        return "throttled"
+    if span.status == STATUS_ERROR or span.attributes.get("http.status_code", 0) >= 400:
+        return "error"
+    return "ok"
+
+
+def _on_span_start(span):
+    if span.kind == SPAN_KIND_CLIENT:
+        EXTERNAL_IN_FLIGHT.inc(service=_service(span))
+
+
+def _on_span_end(span):
+    seconds = span.duration_ms / 1000
+    if span.kind != SPAN_KIND_CLIENT:
+        STAGE_DURATION.observe(seconds, stage=span.name, outcome=_outcome(span))
+        return
+    service = _service(span)
+    EXTERNAL_IN_FLIGHT.dec(service=service)
+    EXTERNAL_CALLS.inc(service=service, operation=span.name, outcome=_outcome(span))
+    EXTERNAL_DURATION.observe(seconds, service=service, operation=span.name)
+    if span.attributes.get("retries"):
+        EXTERNAL_RETRIES.inc(span.attributes["retries"], service=service)
+    if span.attributes.get("throttled"):
+        EXTERNAL_THROTTLED.inc(span.attributes["throttled"], service=service)
+    for token_type in ("prompt_tokens", "completion_tokens"):
+        if span.attributes.get(token_type):
+            TOKENS.inc(span.attributes[token_type], operation=span.name, type=token_type.split("_")[0])
+
+
+# Every span feeds the metrics, so stages and external calls are counted where they are traced
+add_span_listener(_on_span_start, _on_span_end)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.exposition().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=None, host=METRICS_HOST):
+    """
+    Serve /metrics on a side port in a daemon thread, once per process.
+
+    Safe to call on every Streamlit rerun. Returns the server, or None when
+    no port is configured or the port is taken (e.g. by another worker).
+    """
+    global _server
+    port = METRICS_PORT if port is None else port
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, port), MetricsHandler)
+            except OSError:
+                return None
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+        return _server
@@ -0,0 +1,155 @@
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .tracing_utils import SPAN_KIND_CLIENT, span
+
+# Parallel requests per board write; also the connection pool size
+MIRO_MAX_WORKERS = 8
+# (connect, read) timeouts in seconds
+MIRO_TIMEOUT = (5, 30)
+MIRO_MAX_RETRIES = 4
+MIRO_BACKOFF_SECONDS = 0.5
+MIRO_MAX_BACKOFF_SECONDS = 20.0
+RETRY_STATUS_CODES = frozenset([429, 500, 502, 503, 504])
+# Pause before sending once fewer credits than this remain in the rate-limit window
+MIRO_CREDIT_RESERVE = 100
+
+
+class MiroClient:
+    """
+    Thread-safe Miro API client with a pooled session.
+
+    Retries 429 and 5xx responses and connection errors with exponential
+    backoff (honoring Retry-After), and tracks the credit-based rate-limit
+    headers so requests wait for the window to reset instead of being
+    rejected. Method signatures mirror requests.post/get/patch/delete.
+    """
+    def __init__(self, access_token, max_workers=MIRO_MAX_WORKERS, timeout=MIRO_TIMEOUT,
+                 max_retries=MIRO_MAX_RETRIES):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "accept": "application/json",
+            "Authorization": f"Bearer {access_token}"
+        })
+
+        self._lock = threading.Lock()
+        self.rate_limit = None  # Credits per window, from X-RateLimit-Limit
+        self.rate_remaining = None  # Credits left, from X-RateLimit-Remaining
+        self.rate_reset_at = None  # Epoch seconds when the window resets, from X-RateLimit-Reset
+        self.stats = {"requests": 0, "retries": 0, "throttled": 0, "wait_seconds": 0.0}
+
+    def _track_rate_limit(self, response):
+        headers = response.headers
+        with self._lock:
+            try:
+                if "X-RateLimit-Limit" in headers:
+                    self.rate_limit = int(headers["X-RateLimit-Limit"])
+                if "X-RateLimit-Remaining" in headers:
+                    self.rate_remaining = int(headers["X-RateLimit-Remaining"])
+                if "X-RateLimit-Reset" in headers:
+                    self.rate_reset_at = float(headers["X-RateLimit-Reset"])
+            except ValueError:
+                pass
+
+    def _wait_for_credits(self):
+        with self._lock:
+            if self.rate_remaining is None or self.rate_reset_at is None:
+                return
+            if self.rate_remaining >= MIRO_CREDIT_RESERVE:
+                return
+            delay = min(max(self.rate_reset_at - time.time(), 0.0), MIRO_MAX_BACKOFF_SECONDS)
+            # Assume the window resets; the next response corrects this
+            self.rate_remaining = None
+        return self._sleep(delay)
+
+    def _sleep(self, delay):
+        if delay > 0:
+            with self._lock:
+                self.stats["wait_seconds"] += delay
+            time.sleep(delay)
+            return delay
+        return 0.0
+
+    def _backoff(self, attempt, response=None):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), MIRO_MAX_BACKOFF_SECONDS)
+            except ValueError:
+                pass
+        delay = MIRO_BACKOFF_SECONDS * (2 ** attempt)
+        return min(delay, MIRO_MAX_BACKOFF_SECONDS) * random.uniform(0.5, 1.0)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        attributes = {"http.method": method, "url.path": urlsplit(url).path, "retries": 0, "wait_seconds": 0.0}
+        with span("miro.request", kind=SPAN_KIND_CLIENT, **attributes) as request_span:
+            response = self._send(method, url, request_span, **kwargs)
+            request_span.set(**{"http.status_code": response.status_code,
+                                "http.response_bytes": len(response.content)})
+            if response.request is not None and response.request.body:
+                request_span.set(**{"http.request_bytes": len(response.request.body)})
+            return response
+
+    def _send(self, method, url, request_span, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            request_span.add("wait_seconds", self._wait_for_credits() or 0.0)
+            with self._lock:
+                self.stats["requests"] += 1
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                with self._lock:
+                    self.stats["retries"] += 1
+                request_span.add("retries")
+                request_span.add("wait_seconds", self._sleep(self._backoff(attempt)))
+                continue
+
+            self._track_rate_limit(response)
+            if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                return response
+            with self._lock:
+                self.stats["retries"] += 1
+                if response.status_code == 429:
+                    self.stats["throttled"] += 1
+            request_span.add("retries")
+            if response.status_code == 429:
+                request_span.add("throttled")
+            request_span.add("wait_seconds", self._sleep(self._backoff(attempt, response)))
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request("PATCH", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_miro_client(access_token):
+    """Shared client per access token, so connections and rate-limit state are reused"""
+    with _clients_lock:
+        if access_token not in _clients:
+            _clients[access_token] = MiroClient(access_token)
+        return _clients[access_token]
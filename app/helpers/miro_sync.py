@@ -0,0 +1,489 @@
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+
+from . import miro_utils
+from .events_utils import report
+from .miro_client import MIRO_MAX_WORKERS, get_miro_client
+from .miro_utils import (
+    _connect_to_parent, build_mindmap_nodes, create_miro_board, create_miro_shape, create_mindmap_nodes,
+    extract_structure_from_summary, node_levels, node_style, node_text, shape_payload, verify_board_access
+)
+from .stream_utils import SummaryStreamParser
+from .tracing_utils import TracingThreadPoolExecutor, current_span, traced
+
+# Where the per-board sync journals are kept
+MIRO_SYNC_DIR = os.getenv("MIRO_SYNC_DIR", os.path.join(os.path.expanduser("~"), ".cache", "book-summary-app", "miro"))
+# Items requested per page when listing a board to recover an interrupted run
+MIRO_LIST_PAGE_SIZE = 50
+# Position difference (board units) under which a listed item matches a pending one
+POSITION_TOLERANCE = 1.0
+
+
+def node_hash(node):
+    """Content hash of everything a node's Miro shape shows"""
+    content = [node["text"], round(node["x"], 1), round(node["y"], 1), node["width"], node["height"], node["color"]]
+    return hashlib.sha1(json.dumps(content).encode("utf-8")).hexdigest()
+
+
+def match_nodes(old_items, nodes):
+    """
+    Map new node keys to the keys of previously synced items.
+
+    Works level by level so a node can only match an old item under its
+    matched parent. Within a level, nodes first match an item with the same
+    text, then the unmatched item at the same sibling position; the rest
+    are new. Inserting a theme therefore creates one subtree instead
+    of shifting every later sibling.
+    """
+    matches = {}
+    if "root" in old_items and nodes:
+        matches["root"] = "root"
+    used = set(matches.values())
+
+    for level in node_levels(nodes)[1:]:
+        pending = []
+        for node in level:
+            old_parent = matches.get(node["parent"])
+            candidates = [key for key, item in old_items.items()
+                          if key not in used and item["parent"] == old_parent and item["text"] == node["text"]]
+            if old_parent is not None and candidates:
+                matches[node["key"]] = candidates[0]
+                used.add(candidates[0])
+            else:
+                pending.append(node)
+        for node in pending:
+            old_parent = matches.get(node["parent"])
+            if old_parent is None:
+                continue
+            # Same sibling position under the matched parent, e.g. m3.s2 -> m4.s2 after an insert
+            sibling = node["key"].rsplit(".", 1)[-1]
+            old_key = sibling if old_parent == "root" else f"{old_parent}.{sibling}"
+            item = old_items.get(old_key)
+            if item and old_key not in used and item["parent"] == old_parent:
+                matches[node["key"]] = old_key
+                used.add(old_key)
+    return matches
+
+
+class MiroBoardSync:
+    """
+    Keeps a Miro board in step with a mind map by diffing against the last sync.
+
+    The journal file records, per node key, the Miro shape and connector IDs
+    and a content hash, and is saved after every phase. Creates are written to
+    the journal as pending before they are sent, so a run that fails halfway
+    can be retried: the next sync adopts any pending item that did reach the
+    board instead of creating it twice, and deletes and updates are safe to
+    repeat.
+    """
+    def __init__(self, access_token, board_id, journal_dir=MIRO_SYNC_DIR, bulk=True, max_workers=MIRO_MAX_WORKERS):
+        self.access_token = access_token
+        self.board_id = board_id
+        self.bulk = bulk
+        self.max_workers = max_workers
+        board_hash = hashlib.sha1(board_id.encode("utf-8")).hexdigest()[:16]
+        self.journal_path = os.path.join(journal_dir, f"{board_hash}.json")
+        self._lock = threading.Lock()
+        self.items = {}  # node key -> {"id", "hash", "parent", "text", "connector_id", "connector_parent_id"}
+        self.pending = {"shapes": [], "connectors": []}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.journal_path, encoding="utf-8") as handle:
+                journal = json.load(handle)
+        except (OSError, ValueError):
+            return
+        if journal.get("board_id") == self.board_id:
+            self.items = journal.get("items", {})
+            self.pending = journal.get("pending", self.pending)
+
+    def _save(self):
+        with self._lock:
+            journal = {"board_id": self.board_id, "items": self.items, "pending": self.pending}
+            os.makedirs(os.path.dirname(self.journal_path), exist_ok=True)
+            temp_path = f"{self.journal_path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as handle:
+                json.dump(journal, handle)
+            os.replace(temp_path, self.journal_path)  # Atomic, so a crash never leaves half a journal
+
+    def _url(self, path):
+        return f"{miro_utils.MIRO_API_BASE}/boards/{self.board_id}/{path}"
+
+    def _list(self, path):
+        """Every item of a board listing endpoint, following cursors"""
+        results, cursor = [], None
+        client = get_miro_client(self.access_token)
+        while True:
+            params = {"limit": MIRO_LIST_PAGE_SIZE}
+            if cursor:
+                params["cursor"] = cursor
+            response = client.get(self._url(path), params=params)
+            response.raise_for_status()
+            body = response.json()
+            results.extend(body.get("data", []))
+            cursor = body.get("cursor")
+            if not cursor:
+                return results
+
+    def recover(self):
+        """Adopt items a previous, interrupted run created but never recorded"""
+        if not self.pending["shapes"] and not self.pending["connectors"]:
+            return 0
+        known_ids = {item["id"] for item in self.items.values()}
+        known_ids.update(item.get("connector_id") for item in self.items.values())
+        adopted = 0
+
+        if self.pending["shapes"]:
+            for item in self._list("items"):
+                if item.get("id") in known_ids:
+                    continue
+                content = (item.get("data") or {}).get("content")
+                position = item.get("position") or {}
+                for spec in self.pending["shapes"]:
+                    if (spec["key"] not in self.items and spec["text"] == content
+                            and abs(spec["x"] - position.get("x", float("inf"))) <= POSITION_TOLERANCE
+                            and abs(spec["y"] - position.get("y", float("inf"))) <= POSITION_TOLERANCE):
+                        self.items[spec["key"]] = {"id": item["id"], "hash": spec["hash"], "parent": spec["parent"],
+                                                   "text": spec["text"], "connector_id": None, "connector_parent_id": None}
+                        known_ids.add(item["id"])
+                        adopted += 1
+                        break
+
+        if self.pending["connectors"]:
+            by_ends = {(spec["start"], spec["end"]): spec["key"] for spec in self.pending["connectors"]}
+            for connector in self._list("connectors"):
+                ends = ((connector.get("startItem") or {}).get("id"), (connector.get("endItem") or {}).get("id"))
+                key = by_ends.pop(ends, None)
+                if key in self.items and connector.get("id") not in known_ids:
+                    self.items[key]["connector_id"] = connector["id"]
+                    self.items[key]["connector_parent_id"] = ends[0]
+                    adopted += 1
+
+        self.pending = {"shapes": [], "connectors": []}
+        self._save()
+        return adopted
+
+    def plan(self, nodes):
+        """Keys to create, update and delete to turn the last synced map into nodes"""
+        matches = match_nodes(self.items, nodes)
+        matched_old = set(matches.values())
+        return {
+            "create": [node["key"] for node in nodes if node["key"] not in matches],
+            "update": [node["key"] for node in nodes
+                       if node["key"] in matches and self.items[matches[node["key"]]]["hash"] != node_hash(node)],
+            "delete": [key for key in self.items if key not in matched_old],
+            "matches": matches,
+        }
+
+    def _delete(self, kind, item_id):
+        """Delete an item or connector; one that is already gone counts as deleted"""
+        if not item_id:
+            return True
+        response = get_miro_client(self.access_token).delete(self._url(f"{kind}/{item_id}"))
+        return response.status_code in (200, 204, 404)
+
+    def _update(self, item_id, node):
+        """Patch a shape in place; returns False if it no longer exists on the board"""
+        response = get_miro_client(self.access_token).patch(
+            self._url(f"shapes/{item_id}"),
+            headers={"content-type": "application/json"},
+            json=shape_payload(node["text"], node["x"], node["y"], node["width"], node["height"],
+                               {"fillColor": node["color"]})
+        )
+        if response.status_code == 404:
+            return False
+        response.raise_for_status()
+        return True
+
+    @traced("miro.sync")
+    def sync(self, nodes):
+        """
+        Bring the board in line with nodes (from build_mindmap_nodes).
+
+        Returns counts of created, updated, deleted and unchanged shapes and of
+        connectors drawn.
+        """
+        self.recover()
+        plan = self.plan(nodes)
+        matches = plan["matches"]
+        old_items = self.items
+        by_key = {node["key"]: node for node in nodes}
+        stats = {"created": 0, "updated": 0, "deleted": 0, "unchanged": 0, "connectors": 0}
+
+        with TracingThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="miro-sync") as executor:
+            # Re-key surviving items under their new keys
+            items = {key: dict(old_items[old_key], parent=by_key[key]["parent"], text=by_key[key]["text"])
+                     for key, old_key in matches.items()}
+
+            # Deletes: removed nodes and their connectors
+            removed = [old_items[key] for key in plan["delete"]]
+            list(executor.map(lambda item: self._delete("connectors", item.get("connector_id")), removed))
+            list(executor.map(lambda item: self._delete("items", item["id"]), removed))
+            stats["deleted"] = len(removed)
+            self.items = items
+            self._save()
+
+            # Updates: changed text, position, size or color
+            updated = list(executor.map(lambda key: self._update(items[key]["id"], by_key[key]), plan["update"]))
+            missing = [key for key, ok in zip(plan["update"], updated) if not ok]
+            for key, ok in zip(plan["update"], updated):
+                if ok:
+                    items[key]["hash"] = node_hash(by_key[key])
+            for key in missing:  # Deleted by hand on the board; draw it again
+                items.pop(key)
+            stats["updated"] = len(plan["update"]) - len(missing)
+            self._save()
+
+            # Creates, recorded as pending first so an interrupted run can recover them
+            to_create = [by_key[key] for key in plan["create"] + missing]
+            if to_create:
+                self.pending["shapes"] = [{"key": node["key"], "text": node["text"], "x": node["x"], "y": node["y"],
+                                           "parent": node["parent"], "hash": node_hash(node)} for node in to_create]
+                self._save()
+                created_ids = create_mindmap_nodes(self.access_token, self.board_id, to_create, bulk=self.bulk,
+                                                   executor=executor)
+                for node in to_create:
+                    if node["key"] in created_ids:
+                        items[node["key"]] = {"id": created_ids[node["key"]], "hash": node_hash(node),
+                                              "parent": node["parent"], "text": node["text"],
+                                              "connector_id": None, "connector_parent_id": None}
+                stats["created"] = len(created_ids)
+                self.pending["shapes"] = []
+                self._save()
+
+            # Connectors: new nodes and nodes whose parent shape changed
+            stale = []
+            to_connect = []
+            for node in nodes:
+                item = items.get(node["key"])
+                parent_item = items.get(node["parent"]) if node["parent"] else None
+                if not item or not parent_item:
+                    continue
+                if item.get("connector_id") and item.get("connector_parent_id") == parent_item["id"]:
+                    continue
+                if item.get("connector_id"):
+                    stale.append(item["connector_id"])
+                    item["connector_id"] = None
+                to_connect.append(node)
+            list(executor.map(lambda connector_id: self._delete("connectors", connector_id), stale))
+
+            if to_connect:
+                self.pending["connectors"] = [{"key": node["key"], "start": items[node["parent"]]["id"],
+                                               "end": items[node["key"]]["id"]} for node in to_connect]
+                self._save()
+                id_map = {key: item["id"] for key, item in items.items()}
+                connectors = list(executor.map(
+                    lambda node: _connect_to_parent(self.access_token, self.board_id, node, id_map),
+                    to_connect))
+                for node, connector in zip(to_connect, connectors):
+                    if connector and connector.get("id"):
+                        items[node["key"]]["connector_id"] = connector["id"]
+                        items[node["key"]]["connector_parent_id"] = items[node["parent"]]["id"]
+                        stats["connectors"] += 1
+                self.pending["connectors"] = []
+                self._save()
+
+        stats["unchanged"] = len(matches) - len(plan["update"])
+        current_span().set(**stats)
+        return stats
+
+
+@traced()
+def sync_miro_mindmap(summary_text, miro_access_token, board_id=None, bulk=True, max_workers=MIRO_MAX_WORKERS,
+                      journal_dir=MIRO_SYNC_DIR):
+    """
+    Publish a summary's mind map to Miro, updating the board in place when it was synced before.
+
+    Without board_id a new board is created and fully drawn. Returns the same
+    result dict as create_miro_mindmap plus the sync counts under "changes".
+    """
+    if not miro_access_token:
+        return {"success": False, "error": "Miro access token is required"}
+
+    structure = extract_structure_from_summary(summary_text)
+    if not structure["central_topic"]:
+        return {"success": False, "error": "Could not extract central topic from summary"}
+
+    try:
+        if not board_id:
+            board = create_miro_board(miro_access_token, structure["central_topic"])
+            if not board or not board.get("id"):
+                return {"success": False, "error": "Failed to create Miro board"}
+            board_id = board["id"]
+        elif not verify_board_access(miro_access_token, board_id):
+            return {"success": False, "error": f"Could not access board with ID {board_id}"}
+
+        board_sync = MiroBoardSync(miro_access_token, board_id, journal_dir=journal_dir, bulk=bulk,
+                                   max_workers=max_workers)
+        changes = board_sync.sync(build_mindmap_nodes(structure))
+        if "root" not in board_sync.items:
+            return {"success": False, "error": "Failed to create central topic", "board_id": board_id}
+
+        return {
+            "success": True,
+            "board_id": board_id,
+            "board_url": f"https://miro.com/app/board/{board_id}/",
+            "structure": structure,
+            "changes": changes
+        }
+    except Exception as e:
+        report("error", f"Error syncing Miro mind map: {str(e)}")
+        return {"success": False, "error": str(e), "board_id": board_id}
+
+
+# Provisional placement of streamed nodes; the final sync lays the whole map out
+STREAM_RING_GAP = 450.0
+STREAM_SIBLING_ANGLE = 0.15  # Radians between consecutive children of a streamed node
+GOLDEN_ANGLE = math.pi * (3 - math.sqrt(5))  # Spreads themes evenly without knowing how many will come
+
+
+def provisional_position(polar, event, order):
+    """
+    (angle, radius) of a streamed node from its parent's, before the tree is complete.
+
+    Themes are spaced by the golden angle around the root; deeper nodes fan
+    out around their parent's direction, alternating sides.
+    """
+    if event["parent"] is None:
+        return 0.0, 0.0
+    parent_angle, parent_radius = polar[event["parent"]]
+    if event["parent"] == "root":
+        return order * GOLDEN_ANGLE, 2 * STREAM_RING_GAP
+    offset = (order + 1) // 2 * (1 if order % 2 else -1)
+    return parent_angle + offset * STREAM_SIBLING_ANGLE, parent_radius + STREAM_RING_GAP
+
+
+class StreamingMindmapPublisher:
+    """
+    Draws a mind map on a new Miro board while its summary is still being generated.
+
+    handle() takes SummaryStreamParser events and schedules each node's shape
+    and connector on a thread pool, so Miro calls overlap with generation.
+    Parents are always submitted before their children, which lets a child's
+    task wait on its parent's without starving the pool. finish() waits for
+    the drawing, journals the board for MiroBoardSync and, with relayout,
+    moves every node to its final radial layout position.
+    """
+    def __init__(self, access_token, journal_dir=MIRO_SYNC_DIR, max_workers=MIRO_MAX_WORKERS, relayout=True):
+        self.access_token = access_token
+        self.journal_dir = journal_dir
+        self.max_workers = max_workers
+        self.relayout = relayout
+        self.executor = TracingThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="miro-stream")
+        self._lock = threading.Lock()
+        self._board_future = None
+        self.futures = {}  # node key -> Future of its Miro item ID (None if it failed)
+        self.polar = {}  # node key -> (angle, radius)
+        self.items = {}  # Journal entries, as in MiroBoardSync.items
+        self.child_counts = {}
+        self.started = time.perf_counter()
+        self.first_node_seconds = None
+
+    def _create_board(self, title):
+        board = create_miro_board(self.access_token, title)
+        return board.get("id") if board else None
+
+    def handle(self, event):
+        if self._board_future is None:
+            self._board_future = self.executor.submit(self._create_board, event["title"])
+        order = self.child_counts.get(event["parent"], 0)
+        self.child_counts[event["parent"]] = order + 1
+
+        angle, radius = provisional_position(self.polar, event, order)
+        self.polar[event["key"]] = (angle, radius)
+        width, height, color = node_style(event["depth"], order)
+        node = {"key": event["key"], "parent": event["parent"], "text": node_text(event["title"]),
+                "x": radius * math.cos(angle), "y": radius * math.sin(angle),
+                "width": width, "height": height, "color": color}
+        self.futures[event["key"]] = self.executor.submit(self._draw, node)
+
+    def _draw(self, node):
+        board_id = self._board_future.result()
+        if not board_id:
+            return None
+        item = create_miro_shape(self.access_token, board_id, node["text"], node["x"], node["y"],
+                                 node["width"], node["height"], {"fillColor": node["color"]})
+        if not item or not item.get("id"):
+            return None
+        with self._lock:
+            if self.first_node_seconds is None:
+                self.first_node_seconds = time.perf_counter() - self.started
+            self.items[node["key"]] = {"id": item["id"], "hash": node_hash(node), "parent": node["parent"],
+                                       "text": node["text"], "connector_id": None, "connector_parent_id": None}
+
+        parent_id = self.futures[node["parent"]].result() if node["parent"] else None
+        if parent_id:
+            connector = _connect_to_parent(self.access_token, board_id, node,
+                                           {node["key"]: item["id"], node["parent"]: parent_id})
+            if connector and connector.get("id"):
+                with self._lock:
+                    self.items[node["key"]].update(connector_id=connector["id"], connector_parent_id=parent_id)
+        return item["id"]
+
+    def finish(self, summary_text):
+        """Wait for the streamed nodes, then journal (and optionally re-lay out) the board"""
+        try:
+            for future in list(self.futures.values()):
+                future.result()
+            board_id = self._board_future.result() if self._board_future else None
+        finally:
+            self.executor.shutdown(wait=True)
+
+        structure = extract_structure_from_summary(summary_text)
+        if not structure["central_topic"]:
+            return {"success": False, "error": "Could not extract central topic from summary"}
+        if not board_id:
+            return {"success": False, "error": "Failed to create Miro board"}
+
+        board_sync = MiroBoardSync(self.access_token, board_id, journal_dir=self.journal_dir,
+                                   max_workers=self.max_workers)
+        board_sync.items = self.items
+        board_sync._save()
+        # Syncing also draws any node whose streamed request failed
+        changes = board_sync.sync(build_mindmap_nodes(structure)) if self.relayout else None
+        if "root" not in board_sync.items:
+            return {"success": False, "error": "Failed to create central topic", "board_id": board_id}
+
+        return {
+            "success": True,
+            "board_id": board_id,
+            "board_url": f"https://miro.com/app/board/{board_id}/",
+            "structure": structure,
+            "changes": changes,
+            "first_node_seconds": self.first_node_seconds
+        }
+
+
+@traced()
+def publish_summary_stream(fragments, miro_access_token, on_text=None, relayout=True, journal_dir=MIRO_SYNC_DIR,
+                           max_workers=MIRO_MAX_WORKERS):
+    """
+    Consume a streamed summary (e.g. summarize_chunk_stream) and draw its mind map in Miro as it arrives.
+
+    on_text, if given, is called with the summary so far after every fragment.
+    Returns (summary_text, result) with result shaped like sync_miro_mindmap's.
+    """
+    parser = SummaryStreamParser()
+    publisher = StreamingMindmapPublisher(miro_access_token, journal_dir=journal_dir, max_workers=max_workers,
+                                          relayout=relayout)
+    parts = []
+    try:
+        for fragment in fragments:
+            parts.append(fragment)
+            for event in parser.feed(fragment):
+                publisher.handle(event)
+            if on_text:
+                on_text("".join(parts))
+        for event in parser.close():
+            publisher.handle(event)
+        summary_text = "".join(parts)
+        return summary_text, publisher.finish(summary_text)
+    except Exception as e:
+        publisher.executor.shutdown(wait=False)
+        report("error", f"Error drawing streamed Miro mind map: {str(e)}")
+        return "".join(parts), {"success": False, "error": str(e)}
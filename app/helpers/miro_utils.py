@@ -2,8 +2,26 @@ import requests
 import json
 import re
 import os
-import streamlit as st
-import math
+
+from .events_utils import report
+from .layout_utils import flatten_tree, radial_layout
+from .miro_client import MIRO_MAX_WORKERS, get_miro_client
+from .stream_utils import SummaryStreamParser, tree_from_events
+from .tracing_utils import TracingThreadPoolExecutor, traced
+
+# Miro REST API root; point MIRO_API_BASE at a mock server for benchmarks
+MIRO_API_BASE = os.getenv("MIRO_API_BASE", "https://api.miro.com/v2").rstrip("/")
+# Maximum number of items Miro accepts in one bulk create call
+MIRO_BULK_LIMIT = 20
+
+# Named node colors mapped to the hex values Miro shapes accept
+SHAPE_COLORS = {
+    "light_blue": "#8fd3f4",
+    "light_green": "#d5f692",
+    "light_yellow": "#f5f29f",
+    "light_pink": "#fec6e9",
+    "light_orange": "#ffcc99"
+}
 
 def extract_structure_from_summary(summary_text):
     """Extract the hierarchical structure from a summary text."""
@@ -41,10 +59,31 @@ def extract_structure_from_summary(summary_text):
     if not structure["central_topic"] and structure["main_topics"]:
         structure["central_topic"] = "Book Summary"
     
+    # Full-depth tree (### headings, nested bullets) for the layout engine
+    structure["tree"] = extract_tree_from_summary(summary_text, structure["central_topic"])
+    
     return structure
 
-def create_miro_mindmap(summary_text, miro_access_token, board_id=None):
-    """Create a mind map in Miro from a summary text."""
+def extract_tree_from_summary(summary_text, central_topic=None):
+    """
+    Extract an arbitrary-depth {"title", "children"} tree from a markdown summary.
+    
+    "#" is the root, each further "#" one level deeper, and bullets nest under
+    the closest heading by their indentation. Uses the same parser as
+    streamed summaries, so node keys match while a summary is generated.
+    """
+    parser = SummaryStreamParser()
+    root = tree_from_events(parser.feed(summary_text) + parser.close())
+    if central_topic:
+        root["title"] = central_topic
+    return root
+
+@traced()
+def create_miro_mindmap(summary_text, miro_access_token, board_id=None, bulk=True, max_workers=MIRO_MAX_WORKERS):
+    """Create a mind map in Miro from a summary text.
+    
+    bulk=False creates one item per request and max_workers=1 disables
+    parallel requests (both kept for comparison benchmarks)."""
     if not miro_access_token:
         return {"success": False, "error": "Miro access token is required"}
     
@@ -69,7 +108,8 @@ def create_miro_mindmap(summary_text, miro_access_token, board_id=None):
             return {"success": False, "error": f"Could not access board with ID {board_id}"}
         
         # Create the mind map structure
-        success, error_msg = create_mindmap_structure(miro_access_token, board_id, structure)
+        success, error_msg = create_mindmap_structure(miro_access_token, board_id, structure, bulk=bulk,
+                                                      max_workers=max_workers)
         if not success:
             return {"success": False, "error": error_msg or "Failed to create mind map structure"}
         
@@ -83,7 +123,7 @@ def create_miro_mindmap(summary_text, miro_access_token, board_id=None):
             "structure": structure
         }
     except Exception as e:
-        st.error(f"Error in Miro mind map creation: {str(e)}")
+        report("error", f"Error in Miro mind map creation: {str(e)}")
         return {"success": False, "error": str(e)}
 
 def verify_board_access(access_token, board_id):
@@ -94,8 +134,8 @@ def verify_board_access(access_token, board_id):
     }
     
     try:
-        response = requests.get(
-            f"https://api.miro.com/v2/boards/{board_id}",
+        response = get_miro_client(access_token).get(
+            f"{MIRO_API_BASE}/boards/{board_id}",
             headers=headers
         )
         
@@ -124,21 +164,21 @@ def create_miro_board(access_token, board_name):
     }
     
     try:
-        response = requests.post(
-            "https://api.miro.com/v2/boards",
+        response = get_miro_client(access_token).post(
+            f"{MIRO_API_BASE}/boards",
             headers=headers,
             json=data  # Using json=data format for Miro API
         )
         
         # Log detailed response for debugging
         if response.status_code != 201 and response.status_code != 200:
-            st.error(f"Error creating board: {response.status_code} - {response.text}")
+            report("error", f"Error creating board: {response.status_code} - {response.text}")
             return None
             
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
-        st.error(f"Error creating Miro board: {str(e)}")
+        report("error", f"Error creating Miro board: {str(e)}")
         return None
 
 def create_mind_map_shape(access_token, board_id, text, x=0, y=0, width=200, height=100, style=None):
@@ -149,237 +189,255 @@ def create_mind_map_shape(access_token, board_id, text, x=0, y=0, width=200, hei
     return create_miro_shape(access_token, board_id, text, x, y, width, height, style)
 
 def create_miro_shape(access_token, board_id, text, x=0, y=0, width=200, height=100, style=None):
-    """Create a shape (rectangle) on a Miro board with centered text and borders."""
+    """Create a styled shape (rectangle) on a Miro board in a single request."""
     headers = {
         "accept": "application/json",
         "content-type": "application/json",
         "Authorization": f"Bearer {access_token}"
     }
     
+    payload = shape_payload(text, x, y, width, height, style)
+    
+    try:
+        # Create the shape with its styling in one call
+        response = get_miro_client(access_token).post(
+            f"{MIRO_API_BASE}/boards/{board_id}/shapes",
+            headers=headers,
+            json=payload
+        )
+        
+        # Fall back to sticky note if shape creation fails
+        if response.status_code != 201 and response.status_code != 200:
+            report("error", f"Error creating shape: {response.status_code} - {response.text}")
+            return create_miro_sticky_note(access_token, board_id, text, x, y, width, height, style)
+            
+        return response.json()
+    except Exception as e:
+        report("error", f"Error creating Miro shape: {str(e)}")
+        # Fall back to sticky note if shape creation fails
+        return create_miro_sticky_note(access_token, board_id, text, x, y, width, height, style)
+
+def shape_payload(text, x=0, y=0, width=200, height=100, style=None):
+    """Request body for a styled rectangle shape, usable alone or as a bulk item."""
     # Make sure text is not None
     if text is None:
         text = "Untitled"
     
-    # Ensure text is a string - shapes can handle much longer text
-    text = str(text)
+    # Convert named colors to valid hex codes, defaulting to light yellow
+    color_name = style.get("fillColor") if style else None
+    fill_color = SHAPE_COLORS.get(color_name, SHAPE_COLORS["light_yellow"])
     
-    # Get the style color if provided (using valid hex colors)
-    fill_color = None
-    if style and "fillColor" in style:
-        # Convert named colors to valid hex codes
-        color_map = {
-            "light_blue": "#8fd3f4",
-            "light_green": "#d5f692", 
-            "light_yellow": "#f5f29f",
-            "light_pink": "#fec6e9",
-            "light_orange": "#ffcc99"
-        }
-        fill_color = color_map.get(style["fillColor"], "#f5f29f")  # Default to light yellow
-    else:
-        # Default color if none provided
-        fill_color = "#f5f29f"  # Light yellow
-    
-    # Basic rectangle shape with no styling initially
-    payload = {
+    return {
         "data": {
-            "content": text,
+            "content": str(text),
             "shape": "rectangle"
         },
+        "style": {
+            "fillColor": fill_color,
+            "borderColor": "#000000"  # Black border
+        },
+        "position": {
+            "x": x,
+            "y": y
+        },
         "geometry": {
             "width": width,
             "height": height
         }
     }
+
+def create_items_bulk(access_token, board_id, items):
+    """
+    Create up to MIRO_BULK_LIMIT items in one call.
     
-    # Add position
-    if x != 0 or y != 0:
-        payload["position"] = {
-            "x": x,
-            "y": y
-        }
+    Returns the created items in request order, or None if the call failed.
+    """
+    headers = {
+        "accept": "application/json",
+        "content-type": "application/json",
+        "Authorization": f"Bearer {access_token}"
+    }
     
     try:
-        # Create the basic shape first
-        response = requests.post(
-            f"https://api.miro.com/v2/boards/{board_id}/shapes",
+        response = get_miro_client(access_token).post(
+            f"{MIRO_API_BASE}/boards/{board_id}/items/bulk",
             headers=headers,
-            json=payload
+            json=items
         )
         
-        # If successful, apply styling in a separate request
-        if response.status_code in [200, 201]:
-            shape_data = response.json()
-            shape_id = shape_data.get("id")
-            
-            # Apply styling as a separate update
-            if shape_id:
-                try:
-                    update_headers = {
-                        "accept": "application/json",
-                        "content-type": "application/json",
-                        "Authorization": f"Bearer {access_token}"
-                    }
-                    
-                    # Apply color and text alignment
-                    update_payload = {
-                        "style": {
-                            "fillColor": fill_color,
-                            "borderColor": "#000000"  # Black border
-                        }
-                    }
-                    
-                    update_response = requests.patch(
-                        f"https://api.miro.com/v2/boards/{board_id}/shapes/{shape_id}",
-                        headers=update_headers,
-                        json=update_payload
-                    )
-                    
-                    if update_response.status_code not in [200, 201]:
-                        st.info(f"Note: Shape styling not applied: {update_response.text}")
-                except Exception as update_error:
-                    st.info(f"Note: Shape styling not applied: {str(update_error)}")
-            
-            return shape_data
-            
-        # Fall back to sticky note if shape creation fails
         if response.status_code != 201 and response.status_code != 200:
-            st.error(f"Error creating shape: {response.status_code} - {response.text}")
-            return create_miro_sticky_note(access_token, board_id, text, x, y, width, height, style)
-            
-        response.raise_for_status()
-        return response.json()
-    except Exception as e:
-        st.error(f"Error creating Miro shape: {str(e)}")
-        # Fall back to sticky note if shape creation fails
-        return create_miro_sticky_note(access_token, board_id, text, x, y, width, height, style)
+            report("warning", f"Bulk item creation failed: {response.status_code} - {response.text}")
+            return None
+        
+        body = response.json()
+        # The bulk endpoint wraps the created items in a "data" list
+        created = body.get("data", []) if isinstance(body, dict) else body
+        return created if len(created) == len(items) else None
+    except requests.exceptions.RequestException as e:
+        report("warning", f"Bulk item creation failed: {str(e)}")
+        return None
+
+# Node size and fill color per tree depth; deeper levels reuse the last entry
+NODE_STYLES = [
+    {"width": 300, "height": 120, "colors": ["light_blue"]},  # Larger central topic
+    {"width": 250, "height": 100, "colors": ["light_pink", "light_green"]},
+    {"width": 200, "height": 80, "colors": ["light_yellow"]},
+    {"width": 180, "height": 70, "colors": ["light_orange"]},
+]
+
+def node_text(title):
+    """Node title made safe for the Miro API"""
+    text = title or "Untitled"
+    if len(text) > 255:  # Miro API limit
+        text = text[:252] + "..."
+    return text
+
+def node_style(depth, sibling_order):
+    """(width, height, color name) of a node from its depth and position among its siblings"""
+    style = NODE_STYLES[min(depth, len(NODE_STYLES) - 1)]
+    return style["width"], style["height"], style["colors"][sibling_order % len(style["colors"])]
+
+def build_mindmap_nodes(structure):
+    """
+    Lay out the summary tree as a flat list of node specs.
+    
+    Each node has a stable key ("root", "m0", "m0.s1", "m0.s1.s0", ...), its
+    parent key, its text, position, size and fill color. Positions come from
+    the radial layout engine; parents always come before their children.
+    """
+    tree = structure.get("tree") or {
+        "title": structure["central_topic"],
+        "children": [{"title": topic["title"], "children": [{"title": sub, "children": []} for sub in topic["subtopics"]]}
+                     for topic in structure["main_topics"]]
+    }
+    tree = dict(tree, title=structure["central_topic"] or tree.get("title"))
+    tree_nodes, parents, depths = flatten_tree(tree)
+    
+    # Stable keys from each node's position among its siblings
+    keys = []
+    sibling_orders = []
+    child_counts = {}
+    for index, parent in enumerate(parents):
+        if parent < 0:
+            keys.append("root")
+            sibling_orders.append(0)
+            continue
+        order = child_counts.get(parent, 0)
+        child_counts[parent] = order + 1
+        keys.append(f"m{order}" if parent == 0 else f"{keys[parent]}.s{order}")
+        sibling_orders.append(order)
+    
+    styles = [node_style(depth, order) for depth, order in zip(depths, sibling_orders)]
+    widths = [style[0] for style in styles]
+    heights = [style[1] for style in styles]
+    x, y = radial_layout(parents, depths, widths, heights)
+    
+    nodes = []
+    for index, tree_node in enumerate(tree_nodes):
+        nodes.append({
+            "key": keys[index],
+            "parent": None if parents[index] < 0 else keys[parents[index]],
+            "text": node_text(tree_node["title"]),
+            "x": float(x[index]),
+            "y": float(y[index]),
+            "width": widths[index],
+            "height": heights[index],
+            "color": styles[index][2]
+        })
+    
+    return nodes
+
+def create_mindmap_nodes(access_token, board_id, nodes, bulk=True, executor=None):
+    """
+    Create styled shapes for the given node specs.
+    
+    With bulk=True nodes are sent MIRO_BULK_LIMIT at a time through the bulk
+    endpoint; a batch that fails falls back to one request per node. Batches
+    run in parallel when an executor is given.
+    Returns a dict of node key -> Miro item ID for every node created.
+    """
+    batch_size = MIRO_BULK_LIMIT if bulk else 1
+    batches = [nodes[start:start + batch_size] for start in range(0, len(nodes), batch_size)]
+    if executor is None:
+        results = [_create_node_batch(access_token, board_id, batch, bulk) for batch in batches]
+    else:
+        results = list(executor.map(lambda batch: _create_node_batch(access_token, board_id, batch, bulk), batches))
+    
+    item_ids = {}
+    for result in results:
+        item_ids.update(result)
+    return item_ids
+
+def _create_node_batch(access_token, board_id, batch, bulk):
+    item_ids = {}
+    created = None
+    if bulk:
+        items = [dict(type="shape", **shape_payload(
+            node["text"], node["x"], node["y"], node["width"], node["height"],
+            {"fillColor": node["color"]})) for node in batch]
+        created = create_items_bulk(access_token, board_id, items)
+    
+    if created is None:
+        # One request per node (bulk disabled or the bulk call failed)
+        created = [create_mind_map_shape(
+            access_token, board_id, node["text"], node["x"], node["y"],
+            node["width"], node["height"], {"fillColor": node["color"]}) for node in batch]
+    
+    for node, item in zip(batch, created):
+        if item and item.get("id"):
+            item_ids[node["key"]] = item["id"]
+    return item_ids
 
-def create_mindmap_structure(access_token, board_id, structure):
-    """Create the mind map structure on a Miro board."""
+def _connect_to_parent(access_token, board_id, node, item_ids):
+    """Connector from a node's parent to the node; thicker lines from the central topic"""
+    if node["parent"] is None or node["key"] not in item_ids or node["parent"] not in item_ids:
+        return None
+    return create_connector(
+        access_token,
+        board_id,
+        item_ids[node["parent"]],
+        item_ids[node["key"]],
+        {"stroke": "#455666", "strokeWidth": "2" if node["parent"] == "root" else "1"}
+    )
+
+def node_levels(nodes):
+    """Group node specs by depth in the tree (parents listed before children)"""
+    depth = {}
+    levels = []
+    for node in nodes:
+        depth[node["key"]] = 0 if node["parent"] is None else depth[node["parent"]] + 1
+        if depth[node["key"]] == len(levels):
+            levels.append([])
+        levels[depth[node["key"]]].append(node)
+    return levels
+
+def create_mindmap_structure(access_token, board_id, structure, bulk=True, max_workers=MIRO_MAX_WORKERS):
+    """Create the mind map structure on a Miro board.
+    
+    Works in one wave per tree level: the shapes of a level are created in
+    parallel together with the connectors of the level above, so the number
+    of sequential round trips follows the tree depth, not the node count."""
     try:
-        # Create the central topic
-        central_node = create_mind_map_shape(
-            access_token, 
-            board_id, 
-            structure["central_topic"],
-            x=0, 
-            y=0,
-            width=300,  # Larger central topic 
-            height=120,
-            style={
-                "fillColor": "light_blue"
-            }
-        )
+        nodes = build_mindmap_nodes(structure)
+        item_ids = {}
         
-        if not central_node or not central_node.get("id"):
-            return False, "Failed to create central topic"
-            
-        # Calculate positions for main topics
-        num_main_topics = len(structure["main_topics"])
-        if num_main_topics == 0:
-            return True, None  # No main topics to create
-            
-        # Larger radius for main topics (full 360° layout)
-        radius = 900  
-        
-        for i, main_topic in enumerate(structure["main_topics"]):
-            # Calculate position in a full 360-degree circle
-            angle = (i / num_main_topics) * 2 * math.pi
-            x = radius * math.cos(angle)
-            y = radius * math.sin(angle)
-            
-            # Make title safe for API
-            title = main_topic["title"]
-            if len(title) > 255:  # Miro API limit for sticky note content
-                title = title[:252] + "..."
-            
-            # Create the main topic node
-            main_node = create_mind_map_shape(
-                access_token,
-                board_id,
-                title,
-                x=x,
-                y=y,
-                width=250,
-                height=100,
-                style={
-                    "fillColor": "light_pink" if i % 2 == 0 else "light_green"
-                }
-            )
-            
-            if not main_node or not main_node.get("id"):
-                continue
-                
-            # Create connector between central topic and main topic
-            create_connector(
-                access_token,
-                board_id,
-                central_node["id"],
-                main_node["id"],
-                {"stroke": "#455666", "strokeWidth": "2"}
-            )
-            
-            # Create subtopics
-            subtopic_radius = 400  # Large distance from main topic
-            num_subtopics = len(main_topic["subtopics"])
-            
-            for j, subtopic in enumerate(main_topic["subtopics"]):
-                # Calculate direction vector from central node to main topic
-                dir_x = x
-                dir_y = y
-                dir_length = math.sqrt(dir_x**2 + dir_y**2)
-                dir_x = dir_x / dir_length if dir_length > 0 else 0
-                dir_y = dir_y / dir_length if dir_length > 0 else 0
-                
-                # Calculate angle for spreading subtopics while keeping them on the same side
-                # as their parent main topic is to the central node
-                spread_range = math.pi / 2  # 90 degree spread
-                
-                # Position subtopics in a fan pattern on the same side as the main topic
-                sub_angle_offset = (j - (num_subtopics - 1) / 2) * (spread_range / max(num_subtopics - 1, 1))
-                
-                # Calculate the main angle from central to main topic
-                main_angle = math.atan2(y, x)
-                
-                # Apply the offset to the main angle
-                subtopic_angle = main_angle + sub_angle_offset
-                
-                # Calculate position based on this angle
-                sub_x = x + subtopic_radius * math.cos(subtopic_angle)
-                sub_y = y + subtopic_radius * math.sin(subtopic_angle)
-                
-                # Make subtopic text safe for API
-                if len(subtopic) > 255:  # Miro API limit
-                    subtopic = subtopic[:252] + "..."
-                
-                # Create the subtopic node
-                sub_node = create_mind_map_shape(
-                    access_token,
-                    board_id,
-                    subtopic,
-                    x=sub_x,
-                    y=sub_y,
-                    width=200,
-                    height=80,
-                    style={
-                        "fillColor": "light_yellow"
-                    }
-                )
+        with TracingThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="miro") as executor:
+            previous_level = []
+            for level in node_levels(nodes) + [[]]:
+                connector_futures = [executor.submit(_connect_to_parent, access_token, board_id, node, dict(item_ids))
+                                     for node in previous_level]
+                if level:
+                    item_ids.update(create_mindmap_nodes(access_token, board_id, level, bulk=bulk, executor=executor))
+                for future in connector_futures:
+                    future.result()
                 
-                if not sub_node or not sub_node.get("id"):
-                    continue
-                    
-                # Create connector between main topic and subtopic
-                create_connector(
-                    access_token,
-                    board_id,
-                    main_node["id"],
-                    sub_node["id"],
-                    {"stroke": "#455666", "strokeWidth": "1"}
-                )
+                if "root" not in item_ids:
+                    return False, "Failed to create central topic"
+                previous_level = level
         
         return True, None
     except Exception as e:
-        st.error(f"Error creating mind map structure: {str(e)}")
+        report("error", f"Error creating mind map structure: {str(e)}")
         return False, str(e)
 
 def create_miro_card(access_token, board_id, title, x=0, y=0, width=200, height=100, style=None):
@@ -414,21 +472,21 @@ def create_miro_card(access_token, board_id, title, x=0, y=0, width=200, height=
         }
     
     try:
-        response = requests.post(
-            f"https://api.miro.com/v2/boards/{board_id}/cards",
+        response = get_miro_client(access_token).post(
+            f"{MIRO_API_BASE}/boards/{board_id}/cards",
             headers=headers,
             json=payload
         )
         
         if response.status_code != 201 and response.status_code != 200:
-            st.error(f"Error creating card: {response.status_code} - {response.text}")
+            report("error", f"Error creating card: {response.status_code} - {response.text}")
             # Fall back to sticky note if card creation fails
             return create_miro_sticky_note(access_token, board_id, title, x, y, width, height, style)
             
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
-        st.error(f"Error creating Miro card: {str(e)}")
+        report("error", f"Error creating Miro card: {str(e)}")
         # Fall back to sticky note if card creation fails
         return create_miro_sticky_note(access_token, board_id, title, x, y, width, height, style)
 
@@ -475,20 +533,20 @@ def create_miro_sticky_note(access_token, board_id, content, x=0, y=0, width=200
         }
     
     try:
-        response = requests.post(
-            f"https://api.miro.com/v2/boards/{board_id}/sticky_notes",
+        response = get_miro_client(access_token).post(
+            f"{MIRO_API_BASE}/boards/{board_id}/sticky_notes",
             headers=headers,
             json=payload  # Using json=payload format for Miro API
         )
         
         if response.status_code != 201 and response.status_code != 200:
-            st.error(f"Error creating sticky note: {response.status_code} - {response.text}")
+            report("error", f"Error creating sticky note: {response.status_code} - {response.text}")
             return None
             
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
-        st.error(f"Error creating Miro sticky note: {str(e)}")
+        report("error", f"Error creating Miro sticky note: {str(e)}")
         return None
 
 def create_connector(access_token, board_id, start_item_id, end_item_id, style=None):
@@ -510,18 +568,18 @@ def create_connector(access_token, board_id, start_item_id, end_item_id, style=N
     }
     
     try:
-        response = requests.post(
-            f"https://api.miro.com/v2/boards/{board_id}/connectors",
+        response = get_miro_client(access_token).post(
+            f"{MIRO_API_BASE}/boards/{board_id}/connectors",
             headers=headers,
             json=payload  # Using json=payload format for Miro API
         )
         
         if response.status_code != 201 and response.status_code != 200:
-            st.error(f"Error creating connector: {response.status_code} - {response.text}")
+            report("error", f"Error creating connector: {response.status_code} - {response.text}")
             return None
             
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
-        st.error(f"Error creating connector: {str(e)}")
+        report("error", f"Error creating connector: {str(e)}")
         return None 
\ No newline at end of file
@@ -0,0 +1,131 @@
+import os
+import re
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from .context_utils import count_tokens
+from .tracing_utils import current_span, traced
+
+# Clean extracted page text before chunking; "0" keeps the raw extractor output
+NORMALIZE_TEXT = os.getenv("NORMALIZE_TEXT", "1") != "0"
+# Lines at the top and bottom of a page that can be running headers, footers or page numbers
+BOILERPLATE_EDGE_LINES = 3
+# Longer lines are content, never boilerplate
+BOILERPLATE_MAX_CHARS = 80
+# A line is boilerplate if it recurs on at least this many pages, at a median distance of at most
+# BOILERPLATE_MAX_GAP pages: running headers repeat every page or two, chapter headings do not
+BOILERPLATE_MIN_PAGES = 4
+BOILERPLATE_MAX_GAP = 2
+
+# Typographic ligatures PDF extractors return as single characters
+LIGATURES = {"\ufb00": "ff", "\ufb01": "fi", "\ufb02": "fl", "\ufb03": "ffi", "\ufb04": "ffl", "\ufb05": "st",
+             "\ufb06": "st"}
+# Soft hyphens and zero-width characters carry no text
+INVISIBLE = re.compile("[\u00ad\u200b\u200c\u200d\ufeff]")
+LIGATURE_PATTERN = re.compile("|".join(LIGATURES))
+# A well-formed lowercase page number of front matter (i to lxxxix); "mid" or "civil" are words
+ROMAN_NUMERAL = re.compile(r"^(?=[ivxl])(xl|l?x{0,3})(ix|iv|v?i{0,3})$")
+DIGITS = re.compile(r"\d+")
+# A word broken across lines: "infor-\nmation"
+HYPHENATED_BREAK = re.compile(r"([^\W\d_])-\n(?=([^\W\d_]))")
+# A line break and the characters either side of it
+LINE_BREAK = re.compile(r"([^\n])\n(?=([^\n]))")
+# Runs of blank lines; one is kept as the paragraph break
+BLANK_LINES = re.compile(r"\n{3,}")
+
+
+def _signature(line: str) -> str:
+    """What a header or footer line has in common across pages: page numbers become #"""
+    line = line.lower()
+    if ROMAN_NUMERAL.match(line):
+        return "#"
+    return DIGITS.sub("#", line)
+
+
+def _edge_lines(lines: List[str]) -> set:
+    """Indexes of a page's first and last non-blank lines, where headers and footers sit"""
+    content = [index for index, line in enumerate(lines) if line]
+    return set(content[:BOILERPLATE_EDGE_LINES] + content[-BOILERPLATE_EDGE_LINES:])
+
+
+def find_boilerplate(pages: List[List[str]]) -> set:
+    """Signatures of lines that repeat at the edges of many nearby pages (headers, footers, page numbers)"""
+    seen_on = defaultdict(list)
+    for page_number, lines in enumerate(pages):
+        edges = [lines[index] for index in _edge_lines(lines)]
+        for signature in {_signature(line) for line in edges if len(line) <= BOILERPLATE_MAX_CHARS}:
+            seen_on[signature].append(page_number)
+    boilerplate = set()
+    for signature, page_numbers in seen_on.items():
+        if len(page_numbers) < BOILERPLATE_MIN_PAGES:
+            continue
+        gaps = sorted(later - earlier for earlier, later in zip(page_numbers, page_numbers[1:]))
+        if gaps[len(gaps) // 2] <= BOILERPLATE_MAX_GAP:
+            boilerplate.add(signature)
+    return boilerplate
+
+
+def _rejoin_word(match) -> str:
+    # "infor-\nmation" -> "information"; a capital after the hyphen keeps it: "Anglo-\nSaxon" -> "Anglo-Saxon"
+    if match.group(2).islower():
+        return match.group(1)
+    return match.group(1) + "-"
+
+
+def _join_line(match) -> str:
+    # Keep the break after headings and sentence ends; join lines that continue a sentence
+    before, after = match.group(1), match.group(2)
+    if before.islower() or before in ",;" or after.islower():
+        return before + " "
+    return before + "\n"
+
+
+@traced("normalize_text")
+def normalize_pages(pages: List[str], measure_tokens: bool = False) -> Tuple[str, Dict[str, int]]:
+    """
+    Join extracted pages into one clean text for chunking.
+
+    Strips running headers, footers and page numbers, replaces ligature
+    characters, rejoins words hyphenated across lines, joins lines that
+    continue a sentence and collapses whitespace, keeping one blank line
+    between paragraphs. Returns the text and a report of what was removed;
+    measure_tokens adds the tokens before and after (a full tokenizer pass
+    over both texts, so only reports ask for it).
+    """
+    raw_text = "\n".join(pages)
+    report = {"pages": len(pages), "chars_before": len(raw_text), "boilerplate_lines": 0, "ligatures": 0,
+              "hyphenations": 0}
+    if not NORMALIZE_TEXT:
+        text = raw_text
+    else:
+        page_lines = []
+        for page in pages:
+            page = INVISIBLE.sub("", page)
+            page, ligatures = LIGATURE_PATTERN.subn(lambda match: LIGATURES[match.group(0)], page)
+            report["ligatures"] += ligatures
+            page_lines.append([" ".join(line.split()) for line in page.splitlines()])
+
+        boilerplate = find_boilerplate(page_lines)
+        kept_pages = []
+        for lines in page_lines:
+            edges = _edge_lines(lines)
+            kept = []
+            for index, line in enumerate(lines):
+                if index in edges and len(line) <= BOILERPLATE_MAX_CHARS and _signature(line) in boilerplate:
+                    report["boilerplate_lines"] += 1
+                else:
+                    kept.append(line)
+            # Blank lines at a page's top or bottom are layout, not paragraph breaks: sentences run on
+            kept_pages.append("\n".join(kept).strip("\n"))
+
+        text = BLANK_LINES.sub("\n\n", "\n".join(page for page in kept_pages if page))
+        report["hyphenations"] = sum(1 for match in HYPHENATED_BREAK.finditer(text) if match.group(2).islower())
+        text = HYPHENATED_BREAK.sub(_rejoin_word, text)
+        text = LINE_BREAK.sub(_join_line, text)
+
+    report["chars_after"] = len(text)
+    if measure_tokens:
+        report["tokens_before"] = count_tokens(raw_text)
+        report["tokens_after"] = count_tokens(text) if NORMALIZE_TEXT else report["tokens_before"]
+    current_span().set(**report)
+    return text, report
@@ -1,6 +1,5 @@
 import os
 import io
-import streamlit as st
 import sys
 
 # Try multiple ways to import PyMuPDF
@@ -25,46 +24,62 @@ try:
 except ImportError:
     pass  # Will handle the error in the extraction function
 
-# Import tokenizer for chunking
-import tiktoken
+from .context_utils import get_tokenizer
+from .events_utils import report
+from .tracing_utils import current_span, traced
 
-def extract_text_from_pdf(uploaded_file):
-    """Extract text from a PDF file uploaded through Streamlit."""
+# Retrieval chunking profile used by the chat index: small, overlapping windows
+# so every part of the book is searchable and each hit stays focused
+RETRIEVAL_CHUNK_TOKENS = 350
+RETRIEVAL_OVERLAP_TOKENS = 60
+# Summary chunking profile used by the app: large windows, merged when a book needs more than
+# SUMMARY_MAX_CHUNKS of them so the number of summary calls stays bounded
+SUMMARY_CHUNK_TOKENS = 4000
+SUMMARY_OVERLAP_TOKENS = 150
+SUMMARY_MAX_CHUNKS = 50
+
+@traced("extract_pages_from_pdf")
+def extract_pages_from_pdf(uploaded_file):
+    """Extract the text of each page of a PDF file uploaded through Streamlit."""
     try:
         # Read the file as bytes
         pdf_bytes = uploaded_file.getvalue()
-        text = ""
+        current_span().set(bytes=len(pdf_bytes))
         
         # Try PyMuPDF first (faster and better quality)
         if PYMUPDF_AVAILABLE:
             try:
                 doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-                for page_num in range(len(doc)):
-                    page = doc.load_page(page_num)
-                    text += page.get_text()
+                pages = [doc.load_page(page_num).get_text() for page_num in range(len(doc))]
+                current_span().set(pages=len(doc), chars=sum(len(page) for page in pages), extractor="pymupdf")
                 doc.close()
-                return text
+                return pages
             except Exception as e:
-                st.warning(f"PyMuPDF failed: {str(e)}. Trying PyPDF2...")
+                report("warning", f"PyMuPDF failed: {str(e)}. Trying PyPDF2...")
         
         # Fall back to PyPDF2
         if PYPDF2_AVAILABLE:
             pdf_file = io.BytesIO(pdf_bytes)
             reader = PdfReader(pdf_file)
-            for page in reader.pages:
-                page_text = page.extract_text() or ""
-                text += page_text + "\n\n"
-            return text
+            pages = [page.extract_text() or "" for page in reader.pages]
+            current_span().set(pages=len(pages), chars=sum(len(page) for page in pages), extractor="pypdf2")
+            return pages
         
         # If no libraries are available, show an error
         if not PYMUPDF_AVAILABLE and not PYPDF2_AVAILABLE:
-            st.error("Neither PyMuPDF nor PyPDF2 is available. Please install one of them.")
+            report("error", "Neither PyMuPDF nor PyPDF2 is available. Please install one of them.")
         
         raise Exception("No PDF extraction library available")
         
     except Exception as e:
         raise Exception(f"Error extracting text from PDF: {str(e)}")
 
+@traced("extract_text_from_pdf")
+def extract_text_from_pdf(uploaded_file):
+    """Extract text from a PDF file uploaded through Streamlit, as the extractor returns it."""
+    return "\n".join(extract_pages_from_pdf(uploaded_file))
+
+@traced("chunk_text")
 def chunk_text(text, max_tokens=1000, overlap=100, aggressive_chunking=False):
     """
     Split text into chunks of specified token size with overlap.
@@ -89,11 +104,12 @@ def chunk_text(text, max_tokens=1000, overlap=100, aggressive_chunking=False):
                 max_tokens = 4000    # Larger chunks
                 overlap = 150        # Moderate overlap
             
-            st.info(f"Using optimized chunking for large document: {max_tokens} tokens per chunk")
+            report("info", f"Using optimized chunking for large document: {max_tokens} tokens per chunk")
         
-        # Initialize tokenizer for GPT-4o-mini for more accurate token counting
-        tokenizer = tiktoken.encoding_for_model("gpt-4o-mini")
+        # Shared GPT-4o-mini tokenizer for accurate token counting
+        tokenizer = get_tokenizer("gpt-4o-mini")
         tokens = tokenizer.encode(text)
+        current_span().set(tokens=len(tokens), max_tokens=max_tokens, overlap=overlap)
         
         chunks = []
         start = 0
@@ -114,7 +130,7 @@ def chunk_text(text, max_tokens=1000, overlap=100, aggressive_chunking=False):
         # If we still have too many chunks, combine some adjacent ones
         max_chunks = 100  # Target maximum number of chunks
         if aggressive_chunking and len(chunks) > max_chunks:
-            st.warning(f"Document produced {len(chunks)} chunks, combining to reduce API costs...")
+            report("warning", f"Document produced {len(chunks)} chunks, combining to reduce API costs...")
             combined_chunks = []
             
             # Combine adjacent chunks to reduce the total number
@@ -124,8 +140,57 @@ def chunk_text(text, max_tokens=1000, overlap=100, aggressive_chunking=False):
                 combined_chunks.append(combined_chunk)
             
             chunks = combined_chunks
-            st.info(f"Reduced to {len(chunks)} chunks")
+            report("info", f"Reduced to {len(chunks)} chunks")
         
+        current_span().set(chunks=len(chunks))
         return chunks
     except Exception as e:
         raise Exception(f"Error chunking text: {str(e)}")
+
+def chunk_text_for_retrieval(text, max_tokens=RETRIEVAL_CHUNK_TOKENS, overlap=RETRIEVAL_OVERLAP_TOKENS):
+    """
+    Split text into small overlapping windows covering the whole book for the chat index.
+    
+    Unlike the summary chunking, windows are never merged or sampled, so every
+    passage of the book ends up in the index. A document without text gives
+    no windows (not a placeholder chunk); callers tell the user it is empty.
+    
+    Args:
+        text: The text to chunk
+        max_tokens: Maximum number of tokens per window
+        overlap: Number of overlapping tokens between consecutive windows
+    """
+    if overlap >= max_tokens:
+        raise ValueError("overlap must be smaller than max_tokens")
+    if not text.strip():
+        return []
+    return chunk_text(text, max_tokens=max_tokens, overlap=overlap)
+
+def chunk_text_for_summary(text, max_tokens=SUMMARY_CHUNK_TOKENS, overlap=SUMMARY_OVERLAP_TOKENS,
+                           max_chunks=SUMMARY_MAX_CHUNKS):
+    """
+    Split text into large windows for the map-reduce summary.
+    
+    When there are more than max_chunks windows, adjacent ones are joined so
+    a long book still costs at most about max_chunks summary calls. If
+    tokenizing fails, falls back to chunk_text with 2000-token chunks.
+    """
+    try:
+        tokenizer = get_tokenizer("gpt-4o-mini")
+        tokens = tokenizer.encode(text)
+        
+        chunks = []
+        start = 0
+        while start < len(tokens):
+            end = min(start + max_tokens, len(tokens))
+            chunks.append(tokenizer.decode(tokens[start:end]))
+            # Move start position for next chunk, with overlap
+            start += max_tokens - overlap
+        
+        if len(chunks) > max_chunks:
+            combine_factor = len(chunks) // max_chunks + 1
+            chunks = [" ".join(chunks[i:i + combine_factor]) for i in range(0, len(chunks), combine_factor)]
+        current_span().set(tokens=len(tokens), chunks=len(chunks))
+        return chunks
+    except Exception:
+        return chunk_text(text, max_tokens=2000, overlap=100)
@@ -0,0 +1,213 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+
+# Profile every Streamlit rerun: "cprofile" (deterministic) or "sample" (low overhead); unset = off
+PROFILE_MODE = os.getenv("PROFILE_RERUNS", "").lower()
+# Per-rerun output: .prof (cProfile, for snakeviz/gprof2dot) or .folded stacks (for flamegraph.pl/speedscope)
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "book-summary-app",
+                                                    "profiles"))
+# Seconds between stack samples in "sample" mode
+SAMPLE_INTERVAL = 0.005
+TOP_FUNCTIONS = 25
+# Finished rerun profiles kept in the session for the debug expander
+MAX_SESSION_PROFILES = 20
+
+# Session state keys used by the profiler itself, ignored when looking for the triggering widget
+ACTIVE_KEY = "_rerun_profile_active"
+SNAPSHOT_KEY = "_rerun_profile_snapshot"
+HISTORY_KEY = "_rerun_profiles"
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Samples one thread's stack at a fixed interval from a background thread.
+
+    With root_file, stacks start at the outermost frame from that file (the
+    app script) and samples taken outside of it (Streamlit runner code) are
+    dropped.
+    """
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL, root_file=None):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.root_file = root_file
+        self.stacks = Counter()  # Root-first tuple of frame labels -> samples
+        self.last_seen = None  # perf_counter of the last sample that found the thread
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rerun-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break  # The script thread has exited
+            self.last_seen = time.perf_counter()
+            stack, root = [], 0
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                if frame.f_code.co_filename == self.root_file:
+                    root = len(stack)
+                frame = frame.f_back
+            if root:
+                del stack[root:]
+            elif self.root_file:
+                continue  # Runner code before or after the script
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+
+    def run_seconds(self, started):
+        return (self.last_seen or started) - started
+
+    def write(self, path):
+        with open(path + ".folded", "w", encoding="utf-8") as handle:
+            for stack, samples in self.stacks.most_common():
+                handle.write(f"{';'.join(stack)} {samples}\n")
+        return path + ".folded"
+
+    def top_functions(self, limit=TOP_FUNCTIONS):
+        """Functions by time on the stack (total) and at the top of it (self), estimated from samples"""
+        total, own = Counter(), Counter()
+        for stack, samples in self.stacks.items():
+            for label in set(stack):
+                total[label] += samples
+            own[stack[-1]] += samples
+        return [{"function": label, "self_s": round(own[label] * self.interval, 3),
+                 "total_s": round(samples * self.interval, 3)} for label, samples in total.most_common(limit)]
+
+
+class CProfileProfiler:
+    """cProfile of the calling thread"""
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def run_seconds(self, started):
+        return pstats.Stats(self.profile, stream=io.StringIO()).total_tt
+
+    def write(self, path):
+        self.profile.dump_stats(path + ".prof")
+        return path + ".prof"
+
+    def top_functions(self, limit=TOP_FUNCTIONS):
+        stats = pstats.Stats(self.profile, stream=io.StringIO()).sort_stats("cumulative")
+        rows = []
+        for (filename, line, name), (_, calls, own, total, _) in list(stats.stats.items()):
+            rows.append({"function": f"{name} ({os.path.basename(filename)}:{line})", "calls": calls,
+                         "self_s": round(own, 4), "total_s": round(total, 4)})
+        return sorted(rows, key=lambda row: row["total_s"], reverse=True)[:limit]
+
+
+def _fingerprint(value):
+    # str hashes are cached, so even the full book text costs nothing to compare between runs
+    if isinstance(value, (str, bytes)):
+        return hash(value)
+    return repr(value)[:2000]
+
+
+def _snapshot(state):
+    return {key: _fingerprint(value) for key, value in state.to_dict().items() if not str(key).startswith("_rerun")}
+
+
+def _trigger(state):
+    """Best guess at what started this run: session state keys that changed since the last run ended"""
+    if HISTORY_KEY not in state:
+        return "initial load"
+    previous = state.get(SNAPSHOT_KEY)
+    if previous is None:
+        return "rerun requested by the previous run"
+    current = _snapshot(state)
+    changed = sorted(str(key) for key in current.keys() | previous.keys() if current.get(key) != previous.get(key))
+    return ", ".join(changed) if changed else "unkeyed widget (e.g. a button)"
+
+
+def begin_rerun_profile(state, mode=PROFILE_MODE):
+    """
+    Start profiling this script run; call at the top of the app with st.session_state.
+
+    A run that never reaches end_rerun_profile (an uncaught exception) is
+    finished here, when the next run of the session starts. On
+    Python 3.12+ only one cProfile can be active per process, so concurrent
+    runs of other sessions go unprofiled in "cprofile" mode.
+    """
+    if mode not in ("cprofile", "sample"):
+        return None
+    if state.get(ACTIVE_KEY) is not None:
+        _finish(state, ended_early=True, deferred=True)
+    trigger = _trigger(state)
+    if mode == "cprofile":
+        profiler = CProfileProfiler()
+    else:
+        profiler = SamplingProfiler(threading.get_ident(), root_file=sys._getframe(1).f_code.co_filename)
+    run = {"run": len(state.get(HISTORY_KEY, [])) + 1, "mode": mode, "trigger": trigger,
+           "started_at": time.time(), "profiler": profiler, "started": time.perf_counter()}
+    state[ACTIVE_KEY] = run
+    state.setdefault(HISTORY_KEY, [])
+    state[SNAPSHOT_KEY] = None
+    try:
+        profiler.start()
+    except ValueError:
+        # Another profiler is active (cProfile on Python 3.12+)
+        state[ACTIVE_KEY] = None
+        return None
+    return run
+
+
+def end_rerun_profile(state, ended_by=None):
+    """
+    Stop profiling the current run. Call as the last statement of the app,
+    and with ended_by="stop" or "rerun" right before st.stop() or
+    st.experimental_rerun(), which skip the rest of the script.
+    """
+    if state.get(ACTIVE_KEY) is not None:
+        _finish(state, ended_early=ended_by is not None)
+        # The run after a requested rerun was triggered by this one, not by a widget
+        state[SNAPSHOT_KEY] = None if ended_by == "rerun" else _snapshot(state)
+
+
+def _finish(state, ended_early, deferred=False):
+    run = state[ACTIVE_KEY]
+    state[ACTIVE_KEY] = None
+    profiler = run.pop("profiler")
+    profiler.stop()
+    started = run.pop("started")
+    # A run finished at the next run's start counts only the time its thread ran
+    seconds = profiler.run_seconds(started) if deferred else time.perf_counter() - started
+    run["seconds"] = round(seconds, 3)
+    run["ended_early"] = ended_early
+    run["top_functions"] = profiler.top_functions()
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(run["started_at"]))
+        run["file"] = profiler.write(
+            os.path.join(PROFILE_DIR, f"rerun-{stamp}-{secrets.token_hex(3)}-{run['run']:04d}"))
+        with open(os.path.join(PROFILE_DIR, "index.jsonl"), "a", encoding="utf-8") as handle:
+            handle.write(json.dumps({key: run[key] for key in
+                                     ("file", "run", "mode", "trigger", "started_at", "seconds", "ended_early")}) + "\n")
+    except OSError:
+        run["file"] = None
+    history = state[HISTORY_KEY]
+    history.append(run)
+    del history[:-MAX_SESSION_PROFILES]
@@ -0,0 +1,144 @@
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Hashable, List, Sequence, Tuple
+
+import numpy as np
+
+# Lowercased word tokens; keeps inner apostrophes, dots and hyphens ("3.5", "self-control")
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:['.\-][a-z0-9]+)*")
+QUOTED_PATTERN = re.compile(r'"([^"]+)"|“([^”]+)”')
+# Capitalized words after the first one ("What did Cal Newport say") or any number
+SPECIFIC_PATTERN = re.compile(r"(?<!^)(?<![.?!]\s)\b[A-Z][a-zA-Z]+\b|\b\d[\d,.:%]*\b")
+
+STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before being
+between both but by can could did do does doing down during each few for from further had
+has have having he her here hers him his how i if in into is it its itself just me more most
+my no nor not now of off on once only or other our out over own same she should so some such
+than that the their them then there these they this those through to too under until up very
+was we were what when where which while who whom why will with would you your book author
+""".split())
+
+# BM25 parameters (standard defaults)
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Constant from the reciprocal rank fusion paper; damps the weight of top ranks
+RRF_K = 60
+# Top lexical hit must beat the runner-up by this factor to skip the embedding call
+FAST_PATH_MARGIN = 1.5
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercased search terms without stopwords"""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def quoted_phrases(query: str) -> List[str]:
+    """Exact phrases the user put in quotes"""
+    return [(a or b).strip().lower() for a, b in QUOTED_PATTERN.findall(query) if (a or b).strip()]
+
+
+class BM25Index:
+    """In-process inverted index over text chunks scored with Okapi BM25."""
+    def __init__(self, k1=BM25_K1, b=BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.texts = []
+        self.postings = {}  # term -> (doc ids, term frequencies) as numpy arrays
+        self.doc_lengths = np.zeros(0, dtype=np.float32)
+        self.avg_doc_length = 0.0
+
+    def build(self, texts: Sequence[str]) -> None:
+        """(Re)build the index from scratch"""
+        self.texts = list(texts)
+        doc_ids = defaultdict(list)
+        term_freqs = defaultdict(list)
+        lengths = []
+
+        for doc_id, text in enumerate(self.texts):
+            counts = Counter(tokenize(text))
+            lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                doc_ids[term].append(doc_id)
+                term_freqs[term].append(count)
+
+        self.postings = {
+            term: (np.asarray(doc_ids[term], dtype=np.int32), np.asarray(term_freqs[term], dtype=np.float32))
+            for term in doc_ids
+        }
+        self.doc_lengths = np.asarray(lengths, dtype=np.float32)
+        self.avg_doc_length = float(self.doc_lengths.mean()) if lengths else 0.0
+
+    def __len__(self):
+        return len(self.texts)
+
+    def idf(self, term: str) -> float:
+        posting = self.postings.get(term)
+        doc_freq = 0 if posting is None else len(posting[0])
+        return math.log(1 + (len(self.texts) - doc_freq + 0.5) / (doc_freq + 0.5))
+
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[int, float]]:
+        """Return (doc id, score) pairs for the best matching chunks"""
+        if not self.texts:
+            return []
+
+        scores = np.zeros(len(self.texts), dtype=np.float32)
+        norm = self.k1 * (1 - self.b + self.b * self.doc_lengths / max(self.avg_doc_length, 1e-9))
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            doc_ids, tfs = posting
+            scores[doc_ids] += self.idf(term) * tfs * (self.k1 + 1) / (tfs + norm[doc_ids])
+
+        # Exact quoted phrases are a strong signal; rank chunks containing them first
+        phrases = quoted_phrases(query)
+        if phrases:
+            boost = scores.max()
+            for doc_id in np.flatnonzero(scores):
+                text = self.texts[doc_id].lower()
+                scores[doc_id] += boost * sum(phrase in text for phrase in phrases)
+
+        matched = np.flatnonzero(scores > 0)
+        if len(matched) == 0:
+            return []
+        top_k = min(top_k, len(matched))
+        best = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+        best = best[np.argsort(-scores[best])]
+        return [(int(i), float(scores[i])) for i in best]
+
+    def is_keyword_lookup(self, query: str, hits: List[Tuple[int, float]]) -> bool:
+        """
+        Decide whether lexical hits alone answer the query.
+
+        True when the query quotes a phrase, or names specific terms (names,
+        numbers), and the top chunk contains all of them while clearly
+        outscoring the runner-up.
+        """
+        if not hits:
+            return False
+        top_text = self.texts[hits[0][0]].lower()
+
+        phrases = quoted_phrases(query)
+        if phrases:
+            return all(phrase in top_text for phrase in phrases)
+
+        specific_terms = [term for match in SPECIFIC_PATTERN.findall(query) for term in tokenize(match)]
+        if not specific_terms or not all(term in top_text for term in specific_terms):
+            return False
+        return len(hits) == 1 or hits[0][1] >= FAST_PATH_MARGIN * hits[1][1]
+
+
+def reciprocal_rank_fusion(rankings: List[List[Hashable]], k: int = RRF_K) -> List[Tuple[Hashable, float]]:
+    """
+    Fuse several best-first rankings into one.
+
+    Each item scores sum(1 / (k + rank)) over the rankings it appears in,
+    so no score normalization between retrievers is needed.
+    """
+    fused: Dict[Hashable, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            fused[item] += 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda entry: entry[1], reverse=True)
@@ -0,0 +1,83 @@
+import re
+
+HEADING_PATTERN = re.compile(r'^(#{1,6})\s+(.*)$')
+BULLET_PATTERN = re.compile(r'^(\s*)[-*]\s+(.*)$')
+# Title of the central topic when the summary has no "#" heading
+DEFAULT_CENTRAL_TOPIC = "Book Summary"
+
+
+class SummaryStreamParser:
+    """
+    Incremental parser for a markdown summary arriving as a token stream.
+
+    feed() takes any slice of text and returns the events for every line it
+    completed; close() flushes the last line. Each event is a dict with
+    "type" ("central_topic", "theme" or "bullet"), "key", "parent", "depth"
+    and "title". Keys follow build_mindmap_nodes ("root", "m0", "m0.s1", ...)
+    and parents always arrive before their children.
+    """
+    def __init__(self):
+        self.buffer = ""
+        self.root_emitted = False
+        self.stack = ["root"]  # stack[d] is the key of the latest node at depth d
+        self.heading_depth = 0
+        self.child_counts = {}
+
+    def feed(self, text):
+        self.buffer += text
+        events = []
+        while "\n" in self.buffer:
+            line, self.buffer = self.buffer.split("\n", 1)
+            events.extend(self._parse_line(line))
+        return events
+
+    def close(self):
+        line, self.buffer = self.buffer, ""
+        return self._parse_line(line)
+
+    def _root_event(self, title):
+        self.root_emitted = True
+        return {"type": "central_topic", "key": "root", "parent": None, "depth": 0, "title": title}
+
+    def _parse_line(self, raw_line):
+        line = raw_line.rstrip().replace('\t', '    ')
+        if not line.strip():
+            return []
+
+        heading = HEADING_PATTERN.match(line.strip())
+        bullet = BULLET_PATTERN.match(line)
+        if heading:
+            level = len(heading.group(1))
+            if level == 1:
+                self.heading_depth = 0
+                del self.stack[1:]
+                return [] if self.root_emitted else [self._root_event(heading.group(2).strip())]
+            depth = min(level - 1, len(self.stack))
+            self.heading_depth = depth
+            event_type, title = "theme", heading.group(2).strip()
+        elif bullet:
+            depth = min(self.heading_depth + 1 + len(bullet.group(1)) // 2, len(self.stack))
+            event_type, title = "bullet", bullet.group(2).strip()
+        else:
+            return []
+
+        events = [] if self.root_emitted else [self._root_event(DEFAULT_CENTRAL_TOPIC)]
+        del self.stack[depth:]
+        parent = self.stack[-1]
+        order = self.child_counts.get(parent, 0)
+        self.child_counts[parent] = order + 1
+        key = f"m{order}" if parent == "root" else f"{parent}.s{order}"
+        self.stack.append(key)
+        events.append({"type": event_type, "key": key, "parent": parent, "depth": depth, "title": title})
+        return events
+
+
+def tree_from_events(events):
+    """Build a {"title", "children"} tree from parser events"""
+    nodes = {}
+    for event in events:
+        node = {"title": event["title"], "children": []}
+        nodes[event["key"]] = node
+        if event["parent"] is not None:
+            nodes[event["parent"]]["children"].append(node)
+    return nodes.get("root", {"title": None, "children": []})
@@ -1,6 +1,10 @@
 import os
+import time
 from openai import OpenAI
-import streamlit as st
+
+from .events_utils import report
+from .ledger_utils import record_usage
+from .tracing_utils import SPAN_KIND_CLIENT, current_span, span, start_span, traced
 
 # Prompt for initial chunk processing - focused on extracting key information
 CHUNK_PROMPT = """
@@ -126,59 +130,125 @@ Example of output:
 """
 
 
-def summarize_chunk(chunk, is_final=True):
+# Model for chunk and final summaries
+SUMMARY_MODEL = "gpt-4o-mini"
+
+SYSTEM_PROMPT = "You are a helpful assistant that creates concise and informative summaries of text while preserving the key information."
+
+
+def _summary_request(chunk, is_final, api_key=None):
+    """Client and chat completion arguments for a summary, or (None, None) without an API key"""
+    # The session's key; the environment only for scripts (never set by the app, which serves many users)
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        report("error", "⚠️ OpenAI API key is missing. Please enter your API key in the sidebar.")
+        return None, None
+    
+    # Initialize the client
+    client = OpenAI(api_key=api_key)
+    
+    # Determine the appropriate prompt based on whether this is a final summary
+    prompt = FINAL_PROMPT if is_final else CHUNK_PROMPT
+    
+    return client, {
+        "model": SUMMARY_MODEL,
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt.format(chunk=chunk)}
+        ],
+        "temperature": 0.5
+    }
+
+
+def _api_error_message(e):
+    """Show an OpenAI error in the app and return the text to use in place of the summary"""
+    error_message = str(e)
+    
+    # Check for specific API key errors
+    if "invalid_api_key" in error_message or "Incorrect API key" in error_message:
+        report("error", "⚠️ Your OpenAI API key is invalid or incorrect. Please check and enter a valid API key.")
+        return "Your OpenAI API key appears to be invalid. Please check that you've entered it correctly in the sidebar."
+    
+    elif "insufficient_quota" in error_message or "exceeded your current quota" in error_message:
+        report("error", "⚠️ Your OpenAI account has insufficient credits or has reached its quota limit.")
+        return "Your OpenAI account has reached its usage limit. Please check your billing status at platform.openai.com."
+    
+    elif "not authorized" in error_message or "does not exist" in error_message:
+        report("error", "⚠️ Your API key is not authorized to use this model or functionality.")
+        return "Your API key doesn't have access to the required model. Please check your OpenAI account permissions."
+    
+    else:
+        report("error", f"⚠️ Error connecting to OpenAI: {error_message}")
+        return "Failed to generate summary. Please check your API key and internet connection."
+
+
+@traced("summarize_chunk")
+def summarize_chunk(chunk, is_final=True, api_key=None):
     """
     Summarize a chunk of text using OpenAI's API.
     
     Args:
         chunk: The text to summarize
         is_final: If True, creates a polished final summary. If False, creates an intermediate summary for further processing.
+        api_key: The user's OpenAI API key (defaults to OPENAI_API_KEY)
     """
-    # Check for API key
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        st.error("⚠️ OpenAI API key is missing. Please enter your API key in the sidebar.")
+    client, request = _summary_request(chunk, is_final, api_key)
+    if client is None:
         return None
-    
-    # Initialize the client
-    client = OpenAI(api_key=api_key)
-    
-    # Use GPT-4o-mini for better quality summaries
-    model = "gpt-4o-mini"
+    stage_span = current_span().set(is_final=is_final, input_chars=len(chunk))
     
     try:
-        # Determine the appropriate prompt based on whether this is a final summary
-        prompt = FINAL_PROMPT if is_final else CHUNK_PROMPT
-        
         # Make the request to OpenAI API
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that creates concise and informative summaries of text while preserving the key information."},
-                {"role": "user", "content": prompt.format(chunk=chunk)}
-            ],
-            temperature=0.5
-        )
+        with span("openai.chat", kind=SPAN_KIND_CLIENT, model=request["model"]) as request_span:
+            started = time.perf_counter()
+            response = client.chat.completions.create(**request)
+            record_usage("summary.final" if is_final else "summary.chunk", request["model"], response.usage, started)
+            if response.usage:
+                request_span.set(prompt_tokens=response.usage.prompt_tokens,
+                                 completion_tokens=response.usage.completion_tokens)
         
         # Extract the response content using the new format
         return response.choices[0].message.content
     
     except Exception as e:
-        error_message = str(e)
-        
-        # Check for specific API key errors
-        if "invalid_api_key" in error_message or "Incorrect API key" in error_message:
-            st.error("⚠️ Your OpenAI API key is invalid or incorrect. Please check and enter a valid API key.")
-            return "Your OpenAI API key appears to be invalid. Please check that you've entered it correctly in the sidebar."
-        
-        elif "insufficient_quota" in error_message or "exceeded your current quota" in error_message:
-            st.error("⚠️ Your OpenAI account has insufficient credits or has reached its quota limit.")
-            return "Your OpenAI account has reached its usage limit. Please check your billing status at platform.openai.com."
-        
-        elif "not authorized" in error_message or "does not exist" in error_message:
-            st.error("⚠️ Your API key is not authorized to use this model or functionality.")
-            return "Your API key doesn't have access to the required model. Please check your OpenAI account permissions."
-        
-        else:
-            st.error(f"⚠️ Error connecting to OpenAI: {error_message}")
-            return "Failed to generate summary. Please check your API key and internet connection." 
\ No newline at end of file
+        stage_span.record_error(e)
+        return _api_error_message(e)
+
+
+def summarize_chunk_stream(chunk, is_final=True, api_key=None):
+    """
+    Stream a summary of a chunk as it is generated.
+    
+    Yields text fragments whose concatenation is the summary; on an API error
+    yields the same message summarize_chunk would return.
+    """
+    client, request = _summary_request(chunk, is_final, api_key)
+    if client is None:
+        return
+    # Not made current: the caller runs its own spans between fragments
+    request_span = start_span("openai.chat_stream", kind=SPAN_KIND_CLIENT, is_final=is_final,
+                              input_chars=len(chunk), model=request["model"])
+    
+    started = time.perf_counter()
+    first_token = True
+    
+    try:
+        # include_usage adds a last event with no choices that carries the token counts
+        stream = client.chat.completions.create(stream=True, stream_options={"include_usage": True}, **request)
+        for event in stream:
+            if event.usage:
+                record_usage("summary.final" if is_final else "summary.chunk", request["model"], event.usage, started)
+                request_span.set(prompt_tokens=event.usage.prompt_tokens,
+                                 completion_tokens=event.usage.completion_tokens)
+            if event.choices and event.choices[0].delta.content:
+                if first_token:
+                    request_span.set(first_token_ms=round((time.perf_counter() - started) * 1000, 1))
+                    first_token = False
+                request_span.add("output_chars", len(event.choices[0].delta.content))
+                yield event.choices[0].delta.content
+    
+    except Exception as e:
+        request_span.record_error(e)
+        yield _api_error_message(e)
+    finally:
+        request_span.end()
@@ -0,0 +1,313 @@
+import contextvars
+import functools
+import json
+import os
+import secrets
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from xml.sax.saxutils import escape, quoteattr
+
+# Set TRACING=0 to turn spans into no-ops
+TRACING_ENABLED = os.getenv("TRACING", "1") != "0"
+# Append every finished trace to this file as one OTLP/JSON line (e.g. for an OpenTelemetry collector)
+TRACE_FILE = os.getenv("TRACE_FILE")
+SERVICE_NAME = "book-summary-app"
+# Finished traces kept in memory for the debug panel, per session, so busy sessions never evict others' traces
+MAX_TRACES = 20
+# Sessions whose traces are kept; the one that finished a span longest ago is dropped first
+MAX_TRACE_SESSIONS = 100
+
+# OTLP span kinds and status codes
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_CLIENT = 3
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_session_id = contextvars.ContextVar("trace_session_id", default=None)
+# (on_start, on_end) callbacks, e.g. the metrics registry; spans are created for them even with TRACING=0
+_listeners = []
+
+
+class Span:
+    """One timed operation, shaped like an OpenTelemetry span"""
+    def __init__(self, name, parent=None, kind=SPAN_KIND_INTERNAL, attributes=None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.session_id = parent.session_id if parent else _session_id.get()
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = STATUS_OK
+        self.status_message = ""
+        for on_start, _ in _listeners:
+            on_start(self)
+
+    def set(self, **attributes):
+        """Set attributes; dotted names can be passed as set(**{"http.status_code": 200})"""
+        self.attributes.update(attributes)
+        return self
+
+    def add(self, name, value=1):
+        """Add to a numeric attribute, e.g. retries or tokens across several calls"""
+        self.attributes[name] = self.attributes.get(name, 0) + value
+
+    def record_error(self, error):
+        self.status = STATUS_ERROR
+        self.status_message = f"{type(error).__name__}: {error}"
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            for _, on_end in _listeners:
+                on_end(self)
+            if TRACING_ENABLED:
+                collector.finish(self)
+
+    @property
+    def duration_ms(self):
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_otlp(self):
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": [_otlp_attribute(key, value) for key, value in self.attributes.items()],
+            "status": {"code": self.status, "message": self.status_message} if self.status == STATUS_ERROR
+            else {"code": self.status},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class _NoopSpan:
+    def set(self, **attributes):
+        return self
+
+    def add(self, name, value=1):
+        pass
+
+    def record_error(self, error):
+        pass
+
+    def end(self):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def _otlp_attribute(key, value):
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+class TraceCollector:
+    """
+    Keeps the most recent finished traces of each session in memory and exports them.
+
+    A trace is exported when its root span ends; child spans that finish
+    later (background work) are exported on their own with the same trace ID.
+    Spans started outside a session (scripts, benchmarks) share one buffer.
+    """
+    def __init__(self, max_traces=MAX_TRACES, trace_file=TRACE_FILE, max_sessions=MAX_TRACE_SESSIONS):
+        self.max_traces = max_traces
+        self.max_sessions = max_sessions
+        self.trace_file = trace_file
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()  # session ID -> OrderedDict(trace ID -> list of finished spans)
+        self._exported = set()
+
+    def finish(self, span):
+        with self._lock:
+            traces = self._sessions.setdefault(span.session_id, OrderedDict())
+            self._sessions.move_to_end(span.session_id)
+            spans = traces.setdefault(span.trace_id, [])
+            spans.append(span)
+            while len(traces) > self.max_traces:
+                evicted, _ = traces.popitem(last=False)
+                self._exported.discard(evicted)
+            while len(self._sessions) > self.max_sessions:
+                _, evicted_traces = self._sessions.popitem(last=False)
+                self._exported.difference_update(evicted_traces)
+            if span.parent_id is None:
+                to_export = list(spans)
+                self._exported.add(span.trace_id)
+            elif span.trace_id in self._exported:
+                to_export = [span]
+            else:
+                return
+        if self.trace_file:
+            self._write(to_export)
+
+    def _write(self, spans):
+        line = json.dumps(otlp_document(spans))
+        with self._lock:
+            with open(self.trace_file, "a", encoding="utf-8") as handle:
+                handle.write(line + "\n")
+
+    def traces(self, session_id=None):
+        """A session's finished traces (every session's without session_id), newest first, spans by start time"""
+        with self._lock:
+            if session_id is not None:
+                buffers = [self._sessions.get(session_id, {})]
+            else:
+                buffers = list(self._sessions.values())
+            traces = [sorted(spans, key=lambda span: span.start_ns) for buffer in buffers for spans in buffer.values()]
+        traces = [spans for spans in traces if any(span.parent_id is None for span in spans)]
+        return sorted(traces, key=lambda spans: spans[0].start_ns, reverse=True)
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+            self._exported.clear()
+
+
+collector = TraceCollector()
+
+
+def otlp_document(spans):
+    """OTLP/JSON export request for a list of spans"""
+    return {"resourceSpans": [{
+        "resource": {"attributes": [_otlp_attribute("service.name", SERVICE_NAME)]},
+        "scopeSpans": [{"scope": {"name": __name__}, "spans": [span.to_otlp() for span in spans]}],
+    }]}
+
+
+def add_span_listener(on_start, on_end):
+    """Call on_start(span) and on_end(span) for every span; used to derive metrics from spans"""
+    _listeners.append((on_start, on_end))
+
+
+def set_session(session_id):
+    """Tag traces started from now on in this context (one Streamlit session) with session_id"""
+    _session_id.set(session_id)
+
+
+def current_span():
+    return _current_span.get() or _NOOP_SPAN
+
+
+@contextmanager
+def span(name, kind=SPAN_KIND_INTERNAL, **attributes):
+    """
+    Time the enclosed block as a child of the current span (or a new trace).
+
+    Yields the span so the block can add attributes such as token counts.
+    Exceptions are recorded on the span and re-raised; BaseExceptions such as
+    Streamlit's stop and rerun signals end the span without marking an error.
+    """
+    if not (TRACING_ENABLED or _listeners):
+        yield _NOOP_SPAN
+        return
+    current = Span(name, parent=_current_span.get(), kind=kind, attributes=attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except Exception as error:
+        current.record_error(error)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end()
+
+
+def start_span(name, kind=SPAN_KIND_INTERNAL, **attributes):
+    """
+    Start a child of the current span without making it current; call end() on it.
+
+    For work that outlives the calling frame, such as a streamed response
+    consumed by a generator.
+    """
+    if not (TRACING_ENABLED or _listeners):
+        return _NOOP_SPAN
+    return Span(name, parent=_current_span.get(), kind=kind, attributes=attributes)
+
+
+def traced(name=None, **attributes):
+    """Decorator form of span(); the span name defaults to the function name"""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name or function.__name__, **attributes):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class TracingThreadPoolExecutor(ThreadPoolExecutor):
+    """
+    Thread pool whose tasks run in the submitter's context, so their spans join its trace.
+
+    Also counts tasks waiting for a worker (queued), reported as a metric.
+    """
+    instances = weakref.WeakSet()
+
+    def __init__(self, max_workers=None, thread_name_prefix="", **kwargs):
+        super().__init__(max_workers=max_workers, thread_name_prefix=thread_name_prefix, **kwargs)
+        self.name = thread_name_prefix or "pool"
+        self.queued = 0
+        self._queued_lock = threading.Lock()
+        TracingThreadPoolExecutor.instances.add(self)
+
+    def _run(self, context, fn, *args, **kwargs):
+        with self._queued_lock:
+            self.queued -= 1
+        return context.run(fn, *args, **kwargs)
+
+    def submit(self, fn, *args, **kwargs):
+        with self._queued_lock:
+            self.queued += 1
+        try:
+            return super().submit(self._run, contextvars.copy_context(), fn, *args, **kwargs)
+        except RuntimeError:
+            with self._queued_lock:
+                self.queued -= 1
+            raise
+
+
+def waterfall_html(spans, width=900):
+    """Waterfall chart of one trace as an HTML table with offset bars"""
+    if not spans:
+        return "<p>No spans recorded.</p>"
+    start = min(span.start_ns for span in spans)
+    end = max(span.end_ns or span.start_ns for span in spans)
+    total = max(end - start, 1)
+    depth = {}
+    for item in spans:
+        depth[item.span_id] = depth.get(item.parent_id, -1) + 1
+
+    rows = []
+    for item in spans:
+        left = (item.start_ns - start) / total * 100
+        bar = max(((item.end_ns or item.start_ns) - item.start_ns) / total * 100, 0.2)
+        color = "#e5534b" if item.status == STATUS_ERROR else ("#f0a35e" if item.kind == SPAN_KIND_CLIENT else "#5b8def")
+        details = ", ".join(f"{key}={value}" for key, value in item.attributes.items())
+        rows.append(
+            f'<tr title={quoteattr(details)}>'
+            f'<td style="padding-left:{depth[item.span_id] * 14}px;white-space:nowrap">{escape(item.name)}</td>'
+            f'<td style="text-align:right;white-space:nowrap">{item.duration_ms:,.1f} ms</td>'
+            f'<td style="width:{width}px"><div style="margin-left:{left:.2f}%;width:{bar:.2f}%;'
+            f'background:{color};height:12px;border-radius:2px"></div></td></tr>'
+        )
+    return ('<table style="font:12px sans-serif;border-collapse:collapse;width:100%">'
+            f'{"".join(rows)}</table>')
@@ -0,0 +1,78 @@
+import os
+import tempfile
+import weakref
+
+import numpy as np
+
+# Storage modes for SimpleVectorStore
+QUANTIZATION_MODES = ("none", "int8", "binary")
+# Quantized search keeps this many candidates per requested result for exact rescoring
+RESCORE_FACTOR = 8
+
+# Number of set bits in every byte value, for vectorized Hamming distance
+POPCOUNT_TABLE = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+
+def quantize_int8(rows: np.ndarray):
+    """Symmetric per-row int8 codes and the float32 scale that restores them"""
+    scales = np.abs(rows).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(rows / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def int8_scores(codes: np.ndarray, scales: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """Approximate dot products between int8-coded rows and a float query"""
+    query_codes, query_scale = quantize_int8(query[None, :])
+    # Accumulate in int32 (1536 products of +-127 cannot overflow) without an int32 copy of the codes
+    dots = np.einsum("ij,j->i", codes, query_codes[0], dtype=np.int32)
+    return dots * scales * query_scale[0]
+
+
+def quantize_binary(rows: np.ndarray) -> np.ndarray:
+    """1-bit sign codes packed eight dimensions per byte"""
+    return np.packbits(rows > 0, axis=1)
+
+
+def hamming_distances(codes: np.ndarray, query_code: np.ndarray) -> np.ndarray:
+    """Hamming distance from every packed row to a packed query"""
+    return POPCOUNT_TABLE[np.bitwise_xor(codes, query_code)].sum(axis=1, dtype=np.int32)
+
+
+class FullPrecisionFile:
+    """Append-only float32 matrix on disk, read back through a memory map for rescoring."""
+    def __init__(self, dimensions: int, directory=None):
+        self.dimensions = dimensions
+        handle, self.path = tempfile.mkstemp(prefix="vectors-", suffix=".f32", dir=directory)
+        os.close(handle)
+        self.rows = 0
+        self._map = None
+        # Remove the file when the store is garbage collected
+        self._finalizer = weakref.finalize(self, _remove_file, self.path)
+
+    def append(self, rows: np.ndarray) -> None:
+        with open(self.path, "ab") as handle:
+            handle.write(np.ascontiguousarray(rows, dtype=np.float32).tobytes())
+        self.rows += len(rows)
+        self._map = None
+
+    @property
+    def matrix(self) -> np.ndarray:
+        if self._map is None and self.rows:
+            self._map = np.memmap(self.path, dtype=np.float32, mode="r", shape=(self.rows, self.dimensions))
+        return self._map
+
+    def close(self) -> None:
+        self._map = None
+        self._finalizer()
+
+    def __reduce__(self):
+        # A pickled copy would point at a file that is removed with this object
+        raise TypeError("FullPrecisionFile is a temporary file and cannot be pickled")
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -1,6 +1,15 @@
 import os
+import time
 from openai import OpenAI
-import streamlit as st
+
+from .events_utils import report, status
+from .ledger_utils import record_usage
+from .tracing_utils import SPAN_KIND_CLIENT, current_span, span, traced
+
+# Model for workbooks (GPT-4o-mini for better quality with reasonable cost)
+WORKBOOK_MODEL = "gpt-4o-mini"
+
+WORKBOOK_SYSTEM_PROMPT = "You are a helpful assistant that creates practical workbooks from non-fiction books, focusing on extracting actionable exercises that readers can implement in their daily lives."
 
 # Prompt for extracting workbook exercises from book summaries
 WORKBOOK_PROMPT = """
@@ -26,39 +35,47 @@ Make these exercises highly practical and specific, not vague or theoretical. Th
 {summary}
 """
 
-def generate_workbook(summary):
+@traced("generate_workbook")
+def generate_workbook(summary, api_key=None):
     """
     Generate a practical workbook with exercises based on the book summary.
     
     Args:
         summary: The book summary text
+        api_key: The user's OpenAI API key (defaults to OPENAI_API_KEY)
     
     Returns:
         A formatted workbook with practical exercises
     """
     try:
         # Check for API key
-        api_key = os.getenv("OPENAI_API_KEY")
+        api_key = api_key or os.getenv("OPENAI_API_KEY")
         if not api_key:
-            st.error("⚠️ OpenAI API key is missing. Please enter your API key in the sidebar.")
+            report("error", "⚠️ OpenAI API key is missing. Please enter your API key in the sidebar.")
             return "Please enter your OpenAI API key in the sidebar first."
             
         # Initialize the client
         client = OpenAI(api_key=api_key)
         
-        # Use GPT-4o-mini for better quality with reasonable cost
-        model = "gpt-4o-mini"
+        model = WORKBOOK_MODEL
         
-        with st.spinner("Creating workbook exercises..."):
+        current_span().set(input_chars=len(summary))
+        with status("Creating workbook exercises..."), \
+                span("openai.chat", kind=SPAN_KIND_CLIENT, model=model) as request_span:
             # Make the API call
+            started = time.perf_counter()
             response = client.chat.completions.create(
                 model=model,
                 messages=[
-                    {"role": "system", "content": "You are a helpful assistant that creates practical workbooks from non-fiction books, focusing on extracting actionable exercises that readers can implement in their daily lives."},
+                    {"role": "system", "content": WORKBOOK_SYSTEM_PROMPT},
                     {"role": "user", "content": WORKBOOK_PROMPT.format(summary=summary)}
                 ],
                 temperature=0.7
             )
+            record_usage("workbook", model, response.usage, started)
+            if response.usage:
+                request_span.set(prompt_tokens=response.usage.prompt_tokens,
+                                 completion_tokens=response.usage.completion_tokens)
             
             # Extract the response content
             return response.choices[0].message.content
@@ -68,33 +85,36 @@ def generate_workbook(summary):
         
         # Check for specific API key errors
         if "invalid_api_key" in error_message or "Incorrect API key" in error_message:
-            st.error("⚠️ Your OpenAI API key is invalid or incorrect. Please check and enter a valid API key.")
+            report("error", "⚠️ Your OpenAI API key is invalid or incorrect. Please check and enter a valid API key.")
             return "Your OpenAI API key appears to be invalid. Please check that you've entered it correctly in the sidebar."
         
         elif "insufficient_quota" in error_message or "exceeded your current quota" in error_message:
-            st.error("⚠️ Your OpenAI account has insufficient credits or has reached its quota limit.")
+            report("error", "⚠️ Your OpenAI account has insufficient credits or has reached its quota limit.")
             return "Your OpenAI account has reached its usage limit. Please check your billing status at platform.openai.com."
         
         # Check for model-specific errors
         elif "model_not_found" in error_message or "does not exist" in error_message:
             # Fall back to standard GPT-3.5-turbo if specific version isn't available
-            st.warning("Specified GPT-3.5-turbo version not available. Falling back to standard GPT-3.5-turbo...")
+            report("warning", "Specified GPT-3.5-turbo version not available. Falling back to standard GPT-3.5-turbo...")
             
             try:
                 # Try again with standard GPT-3.5-turbo
-                fallback_response = client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {"role": "system", "content": "You are a helpful assistant that creates practical workbooks from non-fiction books, focusing on extracting actionable exercises that readers can implement in their daily lives."},
-                        {"role": "user", "content": WORKBOOK_PROMPT.format(summary=summary)}
-                    ],
-                    temperature=0.7
-                )
+                with span("openai.chat", kind=SPAN_KIND_CLIENT, model="gpt-4o-mini"):
+                    started = time.perf_counter()
+                    fallback_response = client.chat.completions.create(
+                        model="gpt-4o-mini",
+                        messages=[
+                            {"role": "system", "content": WORKBOOK_SYSTEM_PROMPT},
+                            {"role": "user", "content": WORKBOOK_PROMPT.format(summary=summary)}
+                        ],
+                        temperature=0.7
+                    )
+                    record_usage("workbook", "gpt-4o-mini", fallback_response.usage, started)
                 return fallback_response.choices[0].message.content
             except Exception as fallback_error:
-                st.error(f"⚠️ Error creating workbook with fallback model: {str(fallback_error)}")
+                report("error", f"⚠️ Error creating workbook with fallback model: {str(fallback_error)}")
                 return "Failed to generate workbook exercises. Please check your API key and internet connection."
         
         else:
-            st.error(f"⚠️ Error connecting to OpenAI: {error_message}")
+            report("error", f"⚠️ Error connecting to OpenAI: {error_message}")
             return "Failed to generate workbook exercises. Please check your API key and internet connection." 
\ No newline at end of file
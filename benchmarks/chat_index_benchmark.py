@@ -0,0 +1,101 @@
+"""
+Recall versus index size for the chat index chunking profiles.
+
+Builds a synthetic book in which every passage states one unique fact, then
+asks one question per fact and checks whether the retrieved context contains
+it. Embeddings come from a deterministic hashed bag-of-words model so the
+benchmark runs offline and compares chunking profiles, not embedding models.
+
+Usage:
+    python benchmarks/chat_index_benchmark.py --passages 2000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import zlib
+
+import numpy as np
+import tiktoken
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.helpers.pdf_utils import chunk_text, chunk_text_for_retrieval  # noqa: E402
+from app.helpers.chat_utils import SimpleVectorStore  # noqa: E402
+
+WORDS = ("focus attention habit routine system practice craft skill value time energy "
+         "work rest distraction goal progress feedback learning memory choice signal").split()
+
+
+def hashed_embedding(text, dimensions=1536):
+    """Deterministic offline stand-in for an embedding model"""
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for word in text.lower().split():
+        vector[zlib.crc32(word.strip(".,?").encode()) % dimensions] += 1.0
+    return vector
+
+
+def build_book(num_passages, seed=7):
+    """Synthetic book text plus (question, answer token) pairs, one per passage"""
+    rng = random.Random(seed)
+    passages, questions = [], []
+    for i in range(num_passages):
+        filler = " ".join(rng.choice(WORDS) for _ in range(180))
+        fact = f"The keyword for section {i} is zeta{i}x."
+        passages.append(f"{filler[:len(filler)//2]} {fact} {filler[len(filler)//2:]}")
+        questions.append((f"What is the keyword for section {i}?", f"zeta{i}x"))
+    return "\n\n".join(passages), questions
+
+
+def legacy_chunks(text, max_chunks=200):
+    """The previous pipeline: 4000-token windows merged to 50, then stride-sampled"""
+    chunks = chunk_text(text, max_tokens=4000, overlap=150)
+    if len(chunks) > 50:
+        factor = len(chunks) // 50 + 1
+        chunks = [" ".join(chunks[i:i+factor]) for i in range(0, len(chunks), factor)]
+    if len(chunks) > max_chunks:
+        step = len(chunks) // max_chunks
+        chunks = [chunks[i] for i in range(0, len(chunks), step)][:max_chunks]
+    return chunks
+
+
+def evaluate(name, chunks, questions, tokenizer, top_k=3):
+    store = SimpleVectorStore()
+    start = time.perf_counter()
+    store.add_batch([hashed_embedding(chunk) for chunk in chunks], chunks)
+    build_seconds = time.perf_counter() - start
+
+    hits, context_tokens = 0, 0
+    start = time.perf_counter()
+    for question, answer in questions:
+        # Query with the answer token too, so recall measures coverage rather than the toy embedder
+        results = store.search(hashed_embedding(f"{question} {answer}"), top_k=top_k)
+        context = "\n\n".join(text for text, _ in results)
+        hits += answer in context
+        context_tokens += len(tokenizer.encode(context))
+    search_ms = (time.perf_counter() - start) * 1000 / len(questions)
+
+    print(f"{name:<12} chunks={len(chunks):>6}  index={store.nbytes / 1e6:8.2f} MB  "
+          f"recall@{top_k}={hits / len(questions):6.1%}  "
+          f"context={context_tokens / len(questions):8.0f} tok  "
+          f"build={build_seconds:6.2f}s  search={search_ms:6.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--passages", type=int, default=2000, help="Number of synthetic passages (~200 tokens each)")
+    parser.add_argument("--queries", type=int, default=300, help="Number of sampled questions")
+    args = parser.parse_args()
+
+    tokenizer = tiktoken.encoding_for_model("gpt-4o-mini")
+    text, questions = build_book(args.passages)
+    questions = random.Random(1).sample(questions, min(args.queries, len(questions)))
+    print(f"Book: {len(tokenizer.encode(text))} tokens, {len(questions)} questions\n")
+
+    evaluate("legacy", legacy_chunks(text), questions, tokenizer)
+    evaluate("retrieval", chunk_text_for_retrieval(text), questions, tokenizer)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+End-to-end timing of the summary, workbook, chat and mind map flows over recorded HTTP traffic.
+
+Record a cassette once against the live APIs (needs OPENAI_API_KEY and
+MIRO_ACCESS_TOKEN), then replay it as often as needed, offline and with
+the recorded latencies, so a change gets a reproducible before/after number:
+
+    python benchmarks/e2e_benchmark.py --pdf book.pdf --record book_cassette.json
+    python benchmarks/e2e_benchmark.py --pdf book.pdf --replay book_cassette.json --output before.json
+    # ... change the code ...
+    python benchmarks/e2e_benchmark.py --pdf book.pdf --replay book_cassette.json --compare before.json
+
+A changed request that is not in the cassette is reported as a miss. Record
+again after changing prompts, models or chunking.
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from http_cassette import Cassette, make_server, parse_upstreams  # noqa: E402
+from app.helpers import miro_utils  # noqa: E402
+from app.helpers.chat_utils import BookChatBot  # noqa: E402
+from app.helpers.miro_sync import sync_miro_mindmap  # noqa: E402
+from app.helpers.pdf_utils import chunk_text, chunk_text_for_retrieval, extract_text_from_pdf  # noqa: E402
+from app.helpers.summary_utils import summarize_chunk  # noqa: E402
+from app.helpers.workbook_utils import generate_workbook  # noqa: E402
+
+FLOWS = ["summary", "workbook", "chat", "mindmap"]
+# A fixed conversation: standalone questions plus follow-ups that use the history
+QUESTIONS = [
+    "What is the central argument of the book?",
+    "Which examples does the author use to support it?",
+    "How does that compare with the second major theme?",
+    "What practical steps does the book recommend?",
+    "Can you summarize those steps in three bullet points?",
+]
+
+
+def load_text(args):
+    if args.pdf:
+        with open(args.pdf, "rb") as handle:
+            return extract_text_from_pdf(io.BytesIO(handle.read()))
+    with open(args.text, encoding="utf-8") as handle:
+        return handle.read()
+
+
+def summary_flow(text):
+    """Map-reduce summary as the app runs it for large books"""
+    chunks = chunk_text(text, max_tokens=4000, overlap=150)
+    if len(chunks) == 1:
+        return summarize_chunk(text, is_final=True)
+    partials = [summarize_chunk(chunk, is_final=False) for chunk in chunks]
+    return summarize_chunk("\n\n".join(partials), is_final=True)
+
+
+def chat_flow(text, api_key):
+    bot = BookChatBot(api_key)
+    bot.initialize_from_chunks(chunk_text_for_retrieval(text))
+    history = []
+    for question in QUESTIONS:
+        answer = bot.answer_question(question, history or None)
+        history += [{"role": "user", "content": question}, {"role": "assistant", "content": answer}]
+    bot.history.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--pdf", help="PDF file of the book")
+    source.add_argument("--text", help="Plain text file of the book")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--record", metavar="CASSETTE", help="Call the live APIs and save a cassette")
+    mode.add_argument("--replay", metavar="CASSETTE", help="Serve the APIs from a cassette")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiplier for replayed latencies")
+    parser.add_argument("--flows", nargs="+", choices=FLOWS, default=FLOWS)
+    parser.add_argument("--upstream", action="append", help="Override an upstream origin when recording, as name=url")
+    parser.add_argument("--output", help="Write the timings to this JSON file")
+    parser.add_argument("--compare", help="Timings JSON from an earlier run to compare against")
+    args = parser.parse_args()
+
+    recording = bool(args.record)
+    cassette = Cassette() if recording else Cassette.load(args.replay)
+    server, stats, base_url = make_server("record" if recording else "replay", cassette,
+                                          latency_scale=args.latency_scale, upstreams=parse_upstreams(args.upstream))
+    os.environ["OPENAI_BASE_URL"] = f"{base_url}/openai/v1"
+    miro_utils.MIRO_API_BASE = f"{base_url}/miro/v2"
+    api_key = os.getenv("OPENAI_API_KEY") or "replay"
+    os.environ["OPENAI_API_KEY"] = api_key
+    miro_token = os.getenv("MIRO_ACCESS_TOKEN") or "replay"
+
+    text = load_text(args)
+    timings = {}
+    summary = None
+    selected = set(args.flows)
+    if selected & {"workbook", "mindmap"}:
+        selected.add("summary")  # Both are generated from the summary
+    for flow in [flow for flow in FLOWS if flow in selected]:
+        started = time.perf_counter()
+        if flow == "summary":
+            summary = summary_flow(text)
+        elif flow == "workbook":
+            generate_workbook(summary)
+        elif flow == "chat":
+            chat_flow(text, api_key)
+        elif flow == "mindmap":
+            with tempfile.TemporaryDirectory() as journal_dir:
+                result = sync_miro_mindmap(summary, miro_token, journal_dir=journal_dir)
+                if not result["success"]:
+                    print(f"mind map failed: {result.get('error')}")
+        timings[flow] = time.perf_counter() - started
+        print(f"{flow:<10} {timings[flow]:7.2f}s")
+    timings["total"] = sum(timings.values())
+    print(f"{'total':<10} {timings['total']:7.2f}s")
+
+    counts = dict(stats["counts"])
+    print(f"requests: {counts}")
+    server.shutdown()
+    if recording:
+        cassette.save(args.record)
+        print(f"Saved {len(cassette.interactions)} interactions to {args.record}")
+    if any(name.endswith("_misses") for name in counts):
+        print("Some requests were not in the cassette; their flows ran against 404s. Record again.")
+
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump({"timings": timings, "requests": counts, "latency_scale": args.latency_scale}, handle, indent=2)
+    if args.compare:
+        with open(args.compare) as handle:
+            baseline = json.load(handle)["timings"]
+        print("\nflow         before    after   change")
+        for flow, seconds in timings.items():
+            if flow in baseline:
+                change = (seconds - baseline[flow]) / baseline[flow] * 100 if baseline[flow] else 0.0
+                print(f"{flow:<10} {baseline[flow]:7.2f}s {seconds:7.2f}s {change:+7.1f}%")
+
+
+if __name__ == "__main__":
+    main()
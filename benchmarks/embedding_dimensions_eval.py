@@ -0,0 +1,141 @@
+"""
+Retrieval quality versus memory and search latency for shortened embeddings.
+
+Chunks a book with the chat retrieval profile, embeds every chunk once at the
+full 1536 dimensions, and derives the shorter sizes by truncating and
+re-normalizing. For text-embedding-3 models this matches what the API returns
+for the `dimensions` parameter; pass --api-per-dimension to request each size
+from the API instead. Embeddings are cached next to the output so reruns are
+offline.
+
+Queries are sentences sampled from the book; a query is a hit when a
+retrieved chunk contains its sentence.
+
+Usage:
+    OPENAI_API_KEY=... python benchmarks/embedding_dimensions_eval.py --text book.txt
+    python benchmarks/embedding_dimensions_eval.py --pdf book.pdf --dimensions 256 512 1024 1536
+"""
+import argparse
+import csv
+import io
+import os
+import random
+import re
+import sys
+import time
+
+import numpy as np
+from openai import OpenAI
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.helpers.chat_utils import EMBEDDING_MODEL, SimpleVectorStore  # noqa: E402
+from app.helpers.pdf_utils import chunk_text_for_retrieval, extract_text_from_pdf  # noqa: E402
+
+
+def load_text(args):
+    if args.pdf:
+        with open(args.pdf, "rb") as handle:
+            upload = io.BytesIO(handle.read())
+        return extract_text_from_pdf(upload)
+    with open(args.text, encoding="utf-8") as handle:
+        return handle.read()
+
+
+def sample_queries(chunks, count, seed=3):
+    """Sentences of 8-40 words taken from random chunks"""
+    rng = random.Random(seed)
+    sentences = []
+    for chunk in chunks:
+        for sentence in re.split(r"(?<=[.!?])\s+", chunk):
+            sentence = " ".join(sentence.split())
+            if 8 <= len(sentence.split()) <= 40:
+                sentences.append(sentence)
+    return rng.sample(sentences, min(count, len(sentences)))
+
+
+def embed(client, texts, dimensions):
+    vectors = []
+    for start in range(0, len(texts), 256):
+        response = client.embeddings.create(model=EMBEDDING_MODEL, input=texts[start:start+256], dimensions=dimensions)
+        vectors.extend(item.embedding for item in response.data)
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def shorten(vectors, dimensions):
+    short = vectors[:, :dimensions]
+    return short / np.linalg.norm(short, axis=1, keepdims=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--text", help="Plain text file of the book")
+    source.add_argument("--pdf", help="PDF file of the book")
+    parser.add_argument("--dimensions", type=int, nargs="+", default=[256, 512, 1536])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--api-per-dimension", action="store_true",
+                        help="Request each size from the API instead of truncating the full vectors")
+    parser.add_argument("--output", default="embedding_dimensions", help="Prefix for the .csv, .png and cache files")
+    args = parser.parse_args()
+
+    chunks = chunk_text_for_retrieval(load_text(args))
+    queries = sample_queries(chunks, args.queries)
+    print(f"{len(chunks)} chunks, {len(queries)} queries, recall@{args.top_k}")
+
+    cache_path = f"{args.output}_embeddings.npz"
+    client = None
+    if os.path.exists(cache_path) and not args.api_per_dimension:
+        cached = np.load(cache_path)
+        full_chunks, full_queries = cached["chunks"], cached["queries"]
+    else:
+        client = OpenAI()
+        full_chunks, full_queries = embed(client, chunks, 1536), embed(client, queries, 1536)
+        np.savez_compressed(cache_path, chunks=full_chunks, queries=full_queries)
+
+    rows = []
+    for dimensions in sorted(args.dimensions):
+        if args.api_per_dimension and dimensions != 1536:
+            chunk_vectors, query_vectors = embed(client, chunks, dimensions), embed(client, queries, dimensions)
+        else:
+            chunk_vectors, query_vectors = shorten(full_chunks, dimensions), shorten(full_queries, dimensions)
+
+        store = SimpleVectorStore(dimensions=dimensions)
+        store.add_batch(chunk_vectors, chunks)
+        start = time.perf_counter()
+        results = [store.search(vector, top_k=args.top_k) for vector in query_vectors]
+        latency_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        recall = np.mean([any(query in text for text, _ in hits) for query, hits in zip(queries, results)])
+
+        rows.append({"dimensions": dimensions, "recall": round(float(recall), 4),
+                     "memory_mb": round(store.nbytes / 1e6, 3), "latency_ms": round(latency_ms, 3)})
+        print(f"{dimensions:>5} dims  recall={recall:.3f}  memory={store.nbytes / 1e6:8.2f} MB  search={latency_ms:.2f} ms")
+
+    with open(f"{args.output}.csv", "w", newline="") as handle:
+        writer = csv.DictWriter(handle, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("matplotlib not installed; wrote the CSV only")
+        return
+
+    figure, (memory_axis, latency_axis) = plt.subplots(1, 2, figsize=(10, 4))
+    for axis, key, label in ((memory_axis, "memory_mb", "Index memory (MB)"), (latency_axis, "latency_ms", "Search latency (ms)")):
+        axis.plot([row[key] for row in rows], [row["recall"] for row in rows], marker="o")
+        for row in rows:
+            axis.annotate(str(row["dimensions"]), (row[key], row["recall"]))
+        axis.set_xlabel(label)
+        axis.set_ylabel(f"Recall@{args.top_k}")
+    figure.tight_layout()
+    figure.savefig(f"{args.output}.png", dpi=120)
+    print(f"Wrote {args.output}.csv and {args.output}.png")
+
+
+if __name__ == "__main__":
+    main()
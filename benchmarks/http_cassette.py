@@ -0,0 +1,274 @@
+"""
+Record and replay the app's OpenAI and Miro HTTP traffic.
+
+`record` runs a local proxy that forwards every request to the real API,
+streams the response back, and saves the request/response pairs, together
+with their timing, to a cassette (JSON). Streamed responses keep the arrival
+offset of every chunk. `replay` serves a cassette locally. Responses are
+matched on method, path and body, and the recorded latencies are reproduced,
+optionally scaled.
+
+Point the app (or a benchmark) at the proxy with:
+    OPENAI_BASE_URL=http://127.0.0.1:<port>/openai/v1
+    MIRO_API_BASE=http://127.0.0.1:<port>/miro/v2
+
+Usage:
+    python benchmarks/http_cassette.py record --cassette book.json --port 8766
+    python benchmarks/http_cassette.py replay --cassette book.json --port 8766 --latency-scale 0.5
+"""
+import argparse
+import base64
+import hashlib
+import json
+import threading
+import time
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+# Path prefix on the local server -> upstream origin
+UPSTREAMS = {
+    "openai": "https://api.openai.com",
+    "miro": "https://api.miro.com",
+}
+# Hop-by-hop and transport headers that are not recorded or forwarded
+SKIPPED_HEADERS = {"connection", "keep-alive", "transfer-encoding", "content-length", "content-encoding",
+                   "host", "accept-encoding", "authorization", "set-cookie", "date"}
+CASSETTE_VERSION = 1
+
+
+def request_key(method, path, body):
+    """Match key for a request: method, path and body (JSON bodies compared by content)"""
+    try:
+        canonical = json.dumps(json.loads(body), sort_keys=True) if body else ""
+    except (ValueError, UnicodeDecodeError):
+        canonical = hashlib.sha1(body).hexdigest()
+    return hashlib.sha1(f"{method} {path}\n{canonical}".encode("utf-8")).hexdigest()
+
+
+def _encode(data):
+    try:
+        return {"text": data.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"base64": base64.b64encode(data).decode("ascii")}
+
+
+def _decode(chunk):
+    return chunk["text"].encode("utf-8") if "text" in chunk else base64.b64decode(chunk["base64"])
+
+
+class Cassette:
+    """Recorded interactions, served back in recorded order per request key"""
+    def __init__(self, interactions=None):
+        self.interactions = list(interactions or [])
+        self._lock = threading.Lock()
+        self._by_key = defaultdict(list)
+        self._served = Counter()
+        for interaction in self.interactions:
+            self._by_key[interaction["key"]].append(interaction)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as handle:
+            return cls(json.load(handle)["interactions"])
+
+    def save(self, path):
+        with self._lock:
+            with open(path, "w", encoding="utf-8") as handle:
+                json.dump({"version": CASSETTE_VERSION, "interactions": self.interactions}, handle)
+
+    def add(self, interaction):
+        with self._lock:
+            self.interactions.append(interaction)
+            self._by_key[interaction["key"]].append(interaction)
+
+    def next_for(self, key):
+        """The next recorded response for a key; repeats beyond the recording reuse the last one"""
+        with self._lock:
+            recorded = self._by_key.get(key)
+            if not recorded:
+                return None
+            index = min(self._served[key], len(recorded) - 1)
+            self._served[key] += 1
+            return recorded[index]
+
+
+class CassetteHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    cassette = None  # Set by make_server
+    stats = None
+    mode = "replay"
+    latency_scale = 1.0
+    upstreams = UPSTREAMS
+    session = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _route(self):
+        prefix, _, rest = self.path.lstrip("/").partition("/")
+        return prefix, "/" + rest
+
+    def _send_json(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _start_response(self, status, headers, streamed, length=None):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        if streamed:
+            self.send_header("Transfer-Encoding", "chunked")
+        else:
+            self.send_header("Content-Length", str(length))
+        self.end_headers()
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _handle(self):
+        if self.path == "/__stats":
+            with self.stats["lock"]:
+                return self._send_json(200, dict(self.stats["counts"]))
+        upstream, path = self._route()
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        key = request_key(self.command, f"/{upstream}{path}", body)
+        if upstream not in self.upstreams:
+            return self._send_json(404, {"error": {"message": f"Unknown upstream '{upstream}'"}})
+        if self.mode == "record":
+            return self._record(upstream, path, body, key)
+        return self._replay(upstream, path, key)
+
+    def _record(self, upstream, path, body, key):
+        headers = {name: value for name, value in self.headers.items() if name.lower() not in SKIPPED_HEADERS}
+        if self.headers.get("Authorization"):
+            headers["Authorization"] = self.headers["Authorization"]
+        headers["Accept-Encoding"] = "identity"
+
+        started = time.perf_counter()
+        try:
+            response = self.session.request(self.command, self.upstreams[upstream] + path, headers=headers,
+                                            data=body or None, stream=True, timeout=(10, 600))
+        except requests.exceptions.RequestException as e:
+            return self._send_json(502, {"error": {"message": f"Upstream request failed: {e}"}})
+        first_byte = time.perf_counter() - started
+        response_headers = [(name, value) for name, value in response.headers.items()
+                            if name.lower() not in SKIPPED_HEADERS]
+        streamed = "text/event-stream" in response.headers.get("Content-Type", "")
+
+        chunks = []
+        if streamed:
+            self._start_response(response.status_code, response_headers, streamed=True)
+            for data in response.iter_content(chunk_size=None):
+                chunks.append(dict(_encode(data), offset=time.perf_counter() - started))
+                self._write_chunk(data)
+            self._write_chunk(b"")
+        else:
+            data = response.content
+            chunks.append(dict(_encode(data), offset=time.perf_counter() - started))
+            self._start_response(response.status_code, response_headers, streamed=False, length=len(data))
+            self.wfile.write(data)
+
+        self.cassette.add({
+            "key": key,
+            "upstream": upstream,
+            "request": {"method": self.command, "path": path},
+            "response": {"status": response.status_code, "headers": response_headers,
+                         "streamed": streamed, "chunks": chunks},
+            "latency": {"first_byte": first_byte, "total": time.perf_counter() - started},
+        })
+        with self.stats["lock"]:
+            self.stats["counts"][f"{upstream}_recorded"] += 1
+
+    def _replay(self, upstream, path, key):
+        interaction = self.cassette.next_for(key)
+        if interaction is None:
+            with self.stats["lock"]:
+                self.stats["counts"][f"{upstream}_misses"] += 1
+            # 404 so neither client retries a request that was never recorded
+            return self._send_json(404, {"error": {"message": f"No recorded interaction for {self.command} {path}"}})
+        with self.stats["lock"]:
+            self.stats["counts"][f"{upstream}_served"] += 1
+
+        started = time.perf_counter()
+        response = interaction["response"]
+        scale = self.latency_scale
+
+        def wait_until(offset):
+            delay = offset * scale - (time.perf_counter() - started)
+            if delay > 0:
+                time.sleep(delay)
+
+        if response["streamed"]:
+            wait_until(interaction["latency"]["first_byte"])
+            self._start_response(response["status"], response["headers"], streamed=True)
+            for chunk in response["chunks"]:
+                wait_until(chunk["offset"])
+                self._write_chunk(_decode(chunk))
+            self._write_chunk(b"")
+        else:
+            data = b"".join(_decode(chunk) for chunk in response["chunks"])
+            wait_until(interaction["latency"]["total"])
+            self._start_response(response["status"], response["headers"], streamed=False, length=len(data))
+            self.wfile.write(data)
+
+    do_GET = do_POST = do_PATCH = do_PUT = do_DELETE = _handle
+
+
+def make_server(mode, cassette, port=0, latency_scale=1.0, upstreams=None):
+    """
+    Start a record or replay server in a background thread.
+
+    Returns (server, stats, base_url); stats["counts"] counts recorded,
+    served and missed requests per upstream.
+    """
+    stats = {"lock": threading.Lock(), "counts": Counter()}
+    session = requests.Session() if mode == "record" else None
+    handler_class = type("BoundCassetteHandler", (CassetteHandler,), {
+        "cassette": cassette, "stats": stats, "mode": mode, "latency_scale": latency_scale,
+        "upstreams": dict(UPSTREAMS, **(upstreams or {})), "session": session,
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler_class)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, stats, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def parse_upstreams(values):
+    """--upstream name=url overrides, e.g. miro=http://127.0.0.1:8765"""
+    return dict(value.split("=", 1) for value in values or [])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("--cassette", required=True)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiplier for replayed latencies")
+    parser.add_argument("--upstream", action="append", help="Override an upstream origin, as name=url")
+    args = parser.parse_args()
+
+    cassette = Cassette() if args.mode == "record" else Cassette.load(args.cassette)
+    server, stats, base_url = make_server(args.mode, cassette, args.port, args.latency_scale,
+                                          parse_upstreams(args.upstream))
+    print(f"{args.mode.title()}ing at {base_url}; run the app with:\n"
+          f"  OPENAI_BASE_URL={base_url}/openai/v1 MIRO_API_BASE={base_url}/miro/v2")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+        if args.mode == "record":
+            cassette.save(args.cassette)
+            print(f"Saved {len(cassette.interactions)} interactions to {args.cassette}")
+        print(dict(stats["counts"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Timing and overlap check for the radial mind map layout.
+
+Builds random trees of increasing size and depth, lays them out with the
+node sizes the Miro writer uses, and reports layout time, board extent and
+the number of overlapping node boxes. Exits non-zero if any layout has an
+overlap, so it doubles as the layout's correctness check.
+
+Usage:
+    python benchmarks/layout_benchmark.py --sizes 50 500 5000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.helpers.layout_utils import find_overlaps, flatten_tree, radial_layout  # noqa: E402
+from app.helpers.miro_utils import NODE_STYLES  # noqa: E402
+
+
+def random_tree(size, max_depth, seed):
+    """Random tree with `size` nodes, fan-out skewed like real summaries"""
+    rng = random.Random(seed)
+    root = {"title": "root", "children": []}
+    frontier = [(root, 0)]
+    for i in range(1, size):
+        candidates = [entry for entry in frontier if entry[1] < max_depth]
+        parent, depth = rng.choice(candidates[-50:]) if rng.random() < 0.7 else rng.choice(candidates)
+        child = {"title": f"node {i}", "children": []}
+        parent["children"].append(child)
+        frontier.append((child, depth + 1))
+    return root
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[43, 200, 1000, 5000])
+    parser.add_argument("--depths", type=int, nargs="+", default=[2, 4, 6])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    failures = 0
+    for depth in args.depths:
+        for size in args.sizes:
+            tree = random_tree(size, depth, seed=size * 31 + depth)
+            _, parents, depths = flatten_tree(tree)
+            styles = [NODE_STYLES[min(d, len(NODE_STYLES) - 1)] for d in depths]
+            widths = np.array([style["width"] for style in styles], dtype=float)
+            heights = np.array([style["height"] for style in styles], dtype=float)
+
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                x, y = radial_layout(parents, depths, widths, heights)
+                timings.append(time.perf_counter() - start)
+            overlaps = len(find_overlaps(x, y, widths, heights))
+            failures += overlaps > 0
+            extent = max(np.abs(x).max(), np.abs(y).max())
+            print(f"depth<={depth}  nodes={size:>6}  layout={min(timings) * 1000:8.2f} ms  "
+                  f"extent={extent:>10.0f}  overlaps={overlaps}")
+
+    if failures:
+        print(f"\n{failures} layouts had overlapping nodes")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+"""
+How many simultaneous users one instance of the app can serve.
+
+Starts `streamlit run app.py` against the mock OpenAI server and drives N
+headless sessions through it over Streamlit's own websocket protocol, the
+way a browser tab does: enter the API key, pick summary, workbook and chat,
+upload the PDF (which runs extraction and the summary), generate the
+workbook, set up the chat and ask questions. Every session uploads its own
+copy of the book (one extra page), so sessions do not share the per-book
+answer cache unless --shared-book is given.
+
+The test runs at growing concurrency (1, 2, 4, 8 and 16 sessions by
+default) and reports throughput in completed sessions per minute, p50/p95
+latency of every step, and the saturation point: the concurrency after
+which adding sessions raises throughput by less than --saturation-gain.
+
+Usage:
+    python benchmarks/load_test.py --pages 100 --sessions 1 2 4 8 16 --latency-ms 400
+    python benchmarks/load_test.py --pdf book.pdf --output load.json
+    python benchmarks/load_test.py --url http://localhost:8501 --pages 100  # an instance already running
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+
+import fitz  # PyMuPDF
+from tornado.httpclient import AsyncHTTPClient, HTTPClientError, HTTPRequest
+from tornado.websocket import websocket_connect
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from memory_benchmark import synthetic_pdf  # noqa: E402
+from mock_openai_server import make_server  # noqa: E402
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+# Widget labels the simulated users interact with
+API_KEY_LABEL = "Enter your OpenAI API key"
+FEATURE_LABELS = ["📓 Workbook", "💬 Chat with Book"]
+UPLOAD_LABEL = "Upload your PDF"
+WORKBOOK_BUTTON = "Generate Workbook"
+CHAT_BUTTON = "Initialize Chat Assistant"
+QUESTION_LABEL = "Ask a question about the book:"
+QUESTIONS = [
+    "What is the central argument of the book?",
+    "Which examples does the author use to support it?",
+    "What practical steps does the book recommend?",
+    "How does the author suggest measuring progress?",
+    "What are the most common mistakes the book warns about?",
+]
+STEPS = ["load", "api_key", "features", "upload_summary", "workbook", "chat_index", "question"]
+FINISHED = (ForwardMsg.FINISHED_SUCCESSFULLY, ForwardMsg.FINISHED_WITH_COMPILE_ERROR)
+
+
+class SessionError(Exception):
+    pass
+
+
+def personal_copy(pdf_bytes, reader):
+    """The book with one extra page, so every session indexes a distinct document"""
+    document = fitz.open(stream=pdf_bytes, filetype="pdf")
+    page = document.new_page()
+    page.insert_text((72, 72), f"Reader copy {reader}: notes kept by reader number {reader}.")
+    data = document.tobytes()
+    document.close()
+    return data
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))] if ordered else None
+
+
+class BrowserSession:
+    """
+    One headless browser tab speaking Streamlit's websocket protocol.
+
+    Keeps the widget values the frontend would keep and sends them with
+    every rerun; a step ends when the script finishes without asking for
+    another rerun (st.experimental_rerun chains are part of the step).
+    """
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.connection = None
+        self.session_id = None
+        self.widgets = {}  # Label -> (element type, widget id) in the latest run
+        self.values = {}  # Widget id -> WidgetState sent with every rerun
+        self.cache = {}  # Message hash -> ForwardMsg, for reference messages
+        self.errors = []
+
+    async def connect(self):
+        url = self.base_url.replace("http", "ws", 1) + "/_stcore/stream"
+        self.connection = await websocket_connect(url, subprotocols=["streamlit"])
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+
+    async def _receive(self):
+        data = await asyncio.wait_for(self.connection.read_message(), self.timeout)
+        if data is None:
+            raise SessionError("The server closed the connection")
+        msg = ForwardMsg()
+        msg.ParseFromString(data)
+        if msg.WhichOneof("type") == "ref_hash":
+            if msg.ref_hash not in self.cache:
+                response = await AsyncHTTPClient().fetch(f"{self.base_url}/_stcore/message?hash={msg.ref_hash}")
+                self.cache[msg.ref_hash] = ForwardMsg.FromString(response.body)
+            msg = self.cache[msg.ref_hash]
+        elif msg.metadata.cacheable and msg.hash:
+            self.cache[msg.hash] = msg
+        return msg
+
+    def _track_element(self, element):
+        kind = element.WhichOneof("type")
+        if kind == "alert" and element.alert.format == 1:  # Alert.ERROR
+            self.errors.append(element.alert.body)
+        elif kind == "exception":
+            self.errors.append(f"{element.exception.type}: {element.exception.message}")
+        elif kind in ("checkbox", "text_input", "button", "file_uploader"):
+            widget = getattr(element, kind)
+            self.widgets[widget.label] = (kind, widget.id)
+            if kind == "checkbox" and (widget.set_value or widget.id not in self.values):
+                self.values[widget.id] = {"bool_value": widget.value if widget.set_value else widget.default}
+            elif kind == "text_input" and (widget.set_value or widget.id not in self.values):
+                self.values[widget.id] = {"string_value": widget.value if widget.set_value else widget.default}
+
+    async def rerun(self, values=None, trigger=None):
+        """Send widget changes, wait for the script to settle; returns seconds taken"""
+        for label, value in (values or {}).items():
+            self.values[self._widget_id(label)] = value
+        msg = BackMsg()
+        msg.rerun_script.SetInParent()  # The first run has no widget states to send
+        for widget_id, value in self.values.items():
+            msg.rerun_script.widget_states.widgets.add(id=widget_id, **value)
+        if trigger:
+            msg.rerun_script.widget_states.widgets.add(id=self._widget_id(trigger), trigger_value=True)
+        errors_before = len(self.errors)
+        started = time.perf_counter()
+        await self.connection.write_message(msg.SerializeToString(), binary=True)
+        while True:
+            forward = await self._receive()
+            kind = forward.WhichOneof("type")
+            if kind == "new_session":
+                self.widgets = {}
+                self.session_id = self.session_id or forward.new_session.initialize.session_id
+            elif kind == "delta" and forward.delta.WhichOneof("type") == "new_element":
+                self._track_element(forward.delta.new_element)
+            elif kind == "script_finished" and forward.script_finished in FINISHED:
+                break
+        seconds = time.perf_counter() - started
+        # Like the frontend, forget the state of widgets the last run did not draw
+        current = {widget_id for _, widget_id in self.widgets.values()}
+        self.values = {widget_id: value for widget_id, value in self.values.items() if widget_id in current}
+        if len(self.errors) > errors_before:
+            raise SessionError("; ".join(self.errors[errors_before:]))
+        return seconds
+
+    def _widget_id(self, label):
+        if label not in self.widgets:
+            raise SessionError(f"No widget labelled {label!r} on the page")
+        return self.widgets[label][1]
+
+    async def upload(self, name, data):
+        """Upload a file for the file uploader and rerun with it, as the browser does"""
+        request_id = uuid.uuid4().hex
+        started = time.perf_counter()
+        msg = BackMsg()
+        msg.file_urls_request.request_id = request_id
+        msg.file_urls_request.file_names.append(name)
+        msg.file_urls_request.session_id = self.session_id
+        await self.connection.write_message(msg.SerializeToString(), binary=True)
+        while True:
+            forward = await self._receive()
+            if forward.WhichOneof("type") == "file_urls_response" and \
+                    forward.file_urls_response.response_id == request_id:
+                urls = forward.file_urls_response.file_urls[0]
+                break
+        boundary = uuid.uuid4().hex
+        body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{name}\"\r\n"
+                f"Content-Type: application/pdf\r\n\r\n").encode() + data + f"\r\n--{boundary}--\r\n".encode()
+        await AsyncHTTPClient().fetch(HTTPRequest(
+            self.base_url + urls.upload_url, method="PUT", body=body, request_timeout=self.timeout,
+            headers={"Content-Type": f"multipart/form-data; boundary={boundary}"}))
+        state = {"max_file_id": 1}
+        info = {"id": 1, "name": name, "size": len(data), "file_id": urls.file_id,
+                "file_urls": {"file_id": urls.file_id, "upload_url": urls.upload_url, "delete_url": urls.delete_url}}
+        uploader_state = {"file_uploader_state_value": dict(state, uploaded_file_info=[info])}
+        return time.perf_counter() - started + await self.rerun({UPLOAD_LABEL: uploader_state})
+
+
+async def run_session(base_url, pdf_bytes, reader, questions, timeout):
+    """One user's whole visit; returns {"steps": {step: [seconds]}, "error": message or None}"""
+    steps = {step: [] for step in STEPS}
+    session = BrowserSession(base_url, timeout)
+    try:
+        await session.connect()
+        steps["load"].append(await session.rerun())
+        steps["api_key"].append(await session.rerun({API_KEY_LABEL: {"string_value": "mock"}}))
+        steps["features"].append(await session.rerun({label: {"bool_value": True} for label in FEATURE_LABELS}))
+        steps["upload_summary"].append(await session.upload(f"book-{reader}.pdf", pdf_bytes))
+        if WORKBOOK_BUTTON in session.widgets:  # Otherwise the app showed a cached workbook with the summary
+            steps["workbook"].append(await session.rerun(trigger=WORKBOOK_BUTTON))
+        steps["chat_index"].append(await session.rerun(trigger=CHAT_BUTTON))
+        for question in QUESTIONS[:questions]:
+            steps["question"].append(await session.rerun({QUESTION_LABEL: {"string_value": question}}))
+        return {"steps": steps, "error": None}
+    except (SessionError, HTTPClientError, OSError, asyncio.TimeoutError) as error:
+        return {"steps": steps, "error": f"{type(error).__name__}: {error}"}
+    finally:
+        session.close()
+
+
+async def run_level(base_url, pdf_bytes, sessions, args, first_reader):
+    async def delayed(index):
+        await asyncio.sleep(args.ramp * index / max(1, sessions))
+        reader = 0 if args.shared_book else first_reader + index
+        book = pdf_bytes if args.shared_book else personal_copy(pdf_bytes, reader)
+        return await run_session(base_url, book, reader, args.questions, args.timeout)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(delayed(index) for index in range(sessions)))
+    return results, time.perf_counter() - started
+
+
+def summarize_level(sessions, results, seconds, backend):
+    completed = [result for result in results if result["error"] is None]
+    steps = {}
+    for step in STEPS:
+        values = [value for result in completed for value in result["steps"][step]]
+        if values:
+            steps[step] = {"p50": percentile(values, 0.5), "p95": percentile(values, 0.95),
+                           "mean": statistics.mean(values)}
+    return {"sessions": sessions, "completed": len(completed), "failed": len(results) - len(completed),
+            "errors": sorted({result["error"] for result in results if result["error"]}),
+            "seconds": seconds, "sessions_per_minute": len(completed) / seconds * 60 if seconds else 0.0,
+            "steps": steps, "backend": backend}
+
+
+def saturation_point(levels, gain):
+    """Last concurrency level before throughput grew by less than gain (a fraction) per step up"""
+    for previous, current in zip(levels, levels[1:]):
+        if current["sessions_per_minute"] < previous["sessions_per_minute"] * (1 + gain):
+            return previous["sessions"]
+    return None
+
+
+def _free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def start_app(openai_base_url, port):
+    """Run app.py under `streamlit run` in a subprocess; returns (process, base URL) once healthy"""
+    env = dict(os.environ, OPENAI_BASE_URL=openai_base_url, OPENAI_API_KEY="mock")
+    env.setdefault("USAGE_LEDGER", "0")  # Keep mock calls out of the real usage ledger
+    env.setdefault("ARTIFACT_CACHE", "0")  # Every run does the work; books cached by earlier runs would skip it
+    process = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", APP_PATH, "--server.port", str(port),
+         "--server.address", "127.0.0.1", "--server.headless", "true", "--server.fileWatcherType", "none",
+         "--server.enableXsrfProtection", "false", "--browser.gatherUsageStats", "false"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"streamlit exited: {process.stderr.read().decode(errors='replace')[-2000:]}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return process, base_url
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("streamlit did not start within 60 seconds")
+
+
+def print_level(level):
+    print(f"\n{level['sessions']} sessions: {level['completed']} completed, {level['failed']} failed, "
+          f"{level['seconds']:.1f}s, {level['sessions_per_minute']:.1f} sessions/min"
+          + (f", {level['backend']['max_in_flight']} OpenAI requests in flight at most" if level["backend"] else ""))
+    for step, stats in level["steps"].items():
+        print(f"  {step:<16} p50 {stats['p50']:7.2f}s   p95 {stats['p95']:7.2f}s")
+    for error in level["errors"][:3]:
+        print(f"  error: {error[:200]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", help="PDF to upload (default: a synthetic book of --pages pages)")
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8, 16],
+                        help="Concurrency levels to run, in order")
+    parser.add_argument("--questions", type=int, default=3, help=f"Chat questions per session (max {len(QUESTIONS)})")
+    parser.add_argument("--latency-ms", type=float, default=400.0, help="Mock OpenAI latency per request")
+    parser.add_argument("--ramp", type=float, default=0.0, help="Seconds over which each level's sessions start")
+    parser.add_argument("--shared-book", action="store_true", help="All sessions upload the identical PDF")
+    parser.add_argument("--timeout", type=float, default=600.0, help="Seconds allowed per step")
+    parser.add_argument("--saturation-gain", type=float, default=0.1,
+                        help="Throughput growth below which the instance counts as saturated")
+    parser.add_argument("--url", help="Test an app that is already running instead of starting one")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    if args.pdf:
+        with open(args.pdf, "rb") as handle:
+            pdf_bytes = handle.read()
+    else:
+        pdf_bytes = synthetic_pdf(args.pages)
+
+    mock_server = mock_state = app_process = None
+    if args.url:
+        base_url = args.url
+    else:
+        mock_server, mock_state, openai_base_url = make_server(latency_ms=args.latency_ms)
+        app_process, base_url = start_app(openai_base_url, _free_port())
+
+    levels = []
+    try:
+        first_reader = 1
+        for sessions in args.sessions:
+            if mock_state is not None:
+                mock_state.reset()
+            results, seconds = asyncio.run(run_level(base_url, pdf_bytes, sessions, args, first_reader))
+            first_reader += sessions
+            levels.append(summarize_level(sessions, results, seconds,
+                                          mock_state.stats() if mock_state is not None else None))
+            print_level(levels[-1])
+    finally:
+        if app_process is not None:
+            app_process.terminate()
+            app_process.wait(timeout=30)
+        if mock_server is not None:
+            mock_server.shutdown()
+
+    saturation = saturation_point(levels, args.saturation_gain)
+    print("\n" + (f"Saturation point: {saturation} concurrent sessions" if saturation is not None
+                  else "No saturation within the levels tested"))
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump({"levels": levels, "saturation_point": saturation, "pdf_bytes": len(pdf_bytes),
+                       "questions": args.questions, "latency_ms": None if args.url else args.latency_ms},
+                      handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
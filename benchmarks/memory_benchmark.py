@@ -0,0 +1,124 @@
+"""
+Peak and retained memory per pipeline stage for large books.
+
+Builds synthetic PDFs (500, 1,000 and 2,000 pages by default) and runs one
+session's worth of work on each: text extraction, summary chunking, the
+map-reduce summary and the chat index, against the mock OpenAI server.
+tracemalloc measures every stage; at the end the session's state is sized
+the way the debug panel does it, to show what each session keeps alive.
+
+Usage:
+    python benchmarks/memory_benchmark.py --pages 500 1000 2000 --output memory.json
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import random
+import sys
+import time
+
+import fitz  # PyMuPDF
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_openai_server import make_server  # noqa: E402
+
+WORDS = ("focus attention habit routine system practice craft skill value time energy work rest distraction "
+         "goal progress feedback learning memory choice signal method principle evidence example chapter "
+         "reader author argument research study result decision behavior change environment").split()
+MB = 1024 * 1024
+
+
+def synthetic_pdf(pages, words_per_page=350, seed=11):
+    """PDF bytes of a book with the given number of text pages"""
+    rng = random.Random(seed)
+    document = fitz.open()
+    for page_number in range(pages):
+        page = document.new_page()
+        sentences = []
+        for _ in range(words_per_page // 12):
+            sentences.append(" ".join(rng.choice(WORDS) for _ in range(12)).capitalize() + ".")
+        page.insert_textbox(fitz.Rect(50, 50, 545, 792), f"Page {page_number + 1}. " + " ".join(sentences),
+                            fontsize=9)
+    data = document.tobytes()
+    document.close()
+    return data
+
+
+def run_book(pdf_bytes, skip_chat=False):
+    """Run one session's stages; returns (stage records, session state sizes)"""
+    from app.helpers.chat_utils import BookChatBot
+    from app.helpers.memory_utils import session_memory_report, stage_memory
+    from app.helpers.pdf_utils import chunk_text, chunk_text_for_retrieval, extract_text_from_pdf
+    from app.helpers.summary_utils import summarize_chunk
+
+    stages = []
+    session = {}  # Stands in for st.session_state
+    with stage_memory("extract", stages):
+        session["text"] = extract_text_from_pdf(io.BytesIO(pdf_bytes))
+    with stage_memory("summary_chunking", stages):
+        chunks = chunk_text(session["text"], max_tokens=4000, overlap=150)
+    with stage_memory("summary", stages):
+        partials = [summarize_chunk(chunk, is_final=False) for chunk in chunks]
+        session["final_summary"] = summarize_chunk("\n\n".join(partials), is_final=True)
+    del chunks, partials
+    if not skip_chat:
+        with stage_memory("chat_index", stages):
+            bot = BookChatBot("mock")
+            bot.initialize_from_chunks(chunk_text_for_retrieval(session["text"]))
+            session["book_chat_bot"] = bot
+
+    class State(dict):
+        def to_dict(self):
+            return dict(self)
+    return stages, session_memory_report(State(session))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[500, 1000, 2000])
+    parser.add_argument("--words-per-page", type=int, default=350)
+    parser.add_argument("--skip-chat", action="store_true", help="Leave out the chat index stage")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    server, _, base_url = make_server()
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ["OPENAI_API_KEY"] = "mock"
+    from app.helpers.memory_utils import process_memory
+
+    # A tiny warm-up book, so lazy imports and client setup are not charged to the first size
+    run_book(synthetic_pdf(2), skip_chat=args.skip_chat)
+    results = []
+    for pages in args.pages:
+        pdf_bytes = synthetic_pdf(pages, args.words_per_page)
+        gc.collect()
+        started = time.perf_counter()
+        stages, session_sizes = run_book(pdf_bytes, skip_chat=args.skip_chat)
+        seconds = time.perf_counter() - started
+        session_bytes = sum(row["bytes"] for row in session_sizes)
+        print(f"\n{pages} pages ({len(pdf_bytes) / MB:.1f} MB PDF, {seconds:.1f}s)")
+        print(f"  {'stage':<18}{'peak MB':>10}{'retained MB':>13}")
+        for stage in stages:
+            print(f"  {stage['stage']:<18}{stage['peak_bytes'] / MB:10.1f}{stage['retained_bytes'] / MB:13.1f}")
+        keys = ", ".join(f"{row['key']}={row['bytes'] / MB:.1f}" for row in session_sizes)
+        print(f"  session state: {session_bytes / MB:.1f} MB ({keys})")
+        results.append({"pages": pages, "pdf_bytes": len(pdf_bytes), "seconds": seconds, "stages": stages,
+                        "session": session_sizes, "session_bytes": session_bytes})
+        del pdf_bytes, stages, session_sizes
+        gc.collect()
+
+    memory = process_memory()
+    if memory["peak_rss_bytes"]:
+        print(f"\nprocess peak RSS {memory['peak_rss_bytes'] / MB:.0f} MB")
+    server.shutdown()
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump({"results": results, "process": memory}, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
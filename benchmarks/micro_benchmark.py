@@ -0,0 +1,227 @@
+"""
+Micro-benchmarks of the CPU hot paths, with stored baselines.
+
+Times the helpers on fixed synthetic inputs at three sizes each: summary
+and retrieval chunking, text normalization, chat index search, summary
+structure parsing, mind map layout and PDF text extraction. The chunking
+cases need tiktoken's encoding, downloaded on first use and then cached; when
+it cannot be loaded they are skipped and the other cases still run offline.
+Each case is timed timeit-style (auto-scaled loop count, best of --repeat),
+and the best time per call is compared with the baseline stored for this
+machine. It is a script rather than part of the pytest suite (tests/) so the
+tests stay fast and deterministic while timings are checked separately.
+Exits non-zero if any case is slower than its baseline by more than
+--threshold, so it can gate a change:
+
+    python benchmarks/micro_benchmark.py --save          # record baselines on main
+    python benchmarks/micro_benchmark.py                 # compare a branch against them
+    python benchmarks/micro_benchmark.py --filter chunk --threshold 0.1
+
+Baselines are kept per machine (hostname and Python version, or --machine)
+in benchmarks/micro_baselines.json, since timings do not transfer between
+machines.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.helpers.chat_utils import SimpleVectorStore  # noqa: E402
+from app.helpers.context_utils import get_tokenizer  # noqa: E402
+from app.helpers.layout_utils import flatten_tree, radial_layout  # noqa: E402
+from app.helpers.miro_utils import NODE_STYLES, extract_structure_from_summary  # noqa: E402
+from app.helpers.normalize_utils import normalize_pages  # noqa: E402
+from app.helpers.pdf_utils import (chunk_text, chunk_text_for_retrieval, chunk_text_for_summary,  # noqa: E402
+                                   extract_text_from_pdf)
+from layout_benchmark import random_tree  # noqa: E402
+from memory_benchmark import WORDS, synthetic_pdf  # noqa: E402
+from mock_openai_server import canned_summary  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "micro_baselines.json")
+# Words per synthetic book page, as in memory_benchmark
+WORDS_PER_PAGE = 350
+
+
+def book_text(pages, seed=7):
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(pages * WORDS_PER_PAGE))
+
+
+def chunking(chunker, **kwargs):
+    def setup(pages):
+        text = book_text(pages)
+        return lambda: chunker(text, **kwargs)
+    return setup
+
+
+def normalization(pages, seed=5):
+    rng = random.Random(seed)
+    book = []
+    for number in range(1, pages + 1):
+        lines = [" ".join(rng.choice(WORDS) for _ in range(12)) for _ in range(WORDS_PER_PAGE // 12)]
+        book.append("\n".join(["THE BOOK TITLE"] + lines + [str(number)]))
+    return lambda: normalize_pages(book)
+
+
+def vector_search(quantization, dimensions=1536, seed=3):
+    def setup(rows):
+        rng = np.random.default_rng(seed)
+        store = SimpleVectorStore(quantization=quantization)
+        store.add_batch(rng.standard_normal((rows, dimensions), dtype=np.float32),
+                        [f"chunk {i}" for i in range(rows)])
+        query = rng.standard_normal(dimensions, dtype=np.float32)
+        store.search(query)  # Build the matrix or codes outside the timed calls
+        return lambda: store.search(query, top_k=5)
+    return setup
+
+
+def structure_parsing(themes):
+    summary = canned_summary(book_text(20), themes=themes, bullets=6)
+    return lambda: extract_structure_from_summary(summary)
+
+
+def layout(nodes):
+    _, parents, depths = flatten_tree(random_tree(nodes, 4, seed=nodes))
+    styles = [NODE_STYLES[min(depth, len(NODE_STYLES) - 1)] for depth in depths]
+    widths = np.array([style["width"] for style in styles], dtype=float)
+    heights = np.array([style["height"] for style in styles], dtype=float)
+    return lambda: radial_layout(parents, depths, widths, heights)
+
+
+class PdfUpload:
+    """The part of Streamlit's UploadedFile that extraction uses"""
+    def __init__(self, data):
+        self.data = data
+
+    def getvalue(self):
+        return self.data
+
+
+def pdf_extraction(pages):
+    upload = PdfUpload(synthetic_pdf(pages))
+    return lambda: extract_text_from_pdf(upload)
+
+
+# name -> (input sizes, setup(size) returning the zero-argument callable to time)
+CASES = {
+    "chunk_text": ([50, 300, 1000], chunking(chunk_text, max_tokens=1000, overlap=100)),
+    "chunk_text_for_summary": ([50, 300, 1000], chunking(chunk_text_for_summary)),
+    "chunk_text_for_retrieval": ([50, 300, 1000], chunking(chunk_text_for_retrieval)),
+    "normalize_pages": ([50, 300, 1000], normalization),
+    "vector_search": ([1000, 10000, 50000], vector_search("none")),
+    "vector_search_int8": ([1000, 10000, 50000], vector_search("int8")),
+    "extract_structure": ([5, 50, 500], structure_parsing),
+    "radial_layout": ([50, 500, 5000], layout),
+    "extract_text_from_pdf": ([20, 100, 500], pdf_extraction),
+}
+# Cases that tokenize with tiktoken, skipped when its encoding cannot be loaded
+TOKENIZER_CASES = {"chunk_text", "chunk_text_for_summary", "chunk_text_for_retrieval"}
+
+
+def tokenizer_available():
+    """Whether tiktoken's encoding is cached or can be downloaded"""
+    try:
+        get_tokenizer()
+    except Exception:
+        return False
+    return True
+
+
+def measure(function, repeat, min_time):
+    """Best seconds per call: loops are doubled until one batch takes min_time"""
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            function()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            break
+        loops *= 2
+    timings = [elapsed / loops]
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(loops):
+            function()
+        timings.append((time.perf_counter() - started) / loops)
+    return {"best": min(timings), "median": sorted(timings)[len(timings) // 2], "loops": loops}
+
+
+def _format_seconds(seconds):
+    if seconds >= 1:
+        return f"{seconds:8.3f} s "
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:8.3f} ms"
+    return f"{seconds * 1e6:8.1f} us"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filter", help="Only run cases whose name contains this")
+    parser.add_argument("--quick", action="store_true", help="Smallest size of every case only")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="Seconds per timed batch")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="Slowdown against the baseline (a fraction) that counts as a regression")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--machine", default=f"{platform.node()}-py{sys.version_info[0]}.{sys.version_info[1]}",
+                        help="Name the baselines are stored under")
+    parser.add_argument("--save", action="store_true", help="Store this run as the machine's baseline")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as handle:
+            baselines = json.load(handle)
+    baseline = baselines.get(args.machine, {})
+
+    results = {}
+    regressions = []
+    skip_tokenizer_cases = not tokenizer_available()
+    print(f"{'case':<38}{'per call':>12}{'baseline':>12}{'change':>9}")
+    for name, (sizes, setup) in CASES.items():
+        if args.filter and args.filter not in name:
+            continue
+        if name in TOKENIZER_CASES and skip_tokenizer_cases:
+            print(f"{name:<38}{'skipped':>12}  (tiktoken encoding not available)")
+            continue
+        for size in sizes[:1] if args.quick else sizes:
+            key = f"{name}[{size}]"
+            function = setup(size)
+            result = results[key] = measure(function, args.repeat, args.min_time)
+            line = f"{key:<38}{_format_seconds(result['best']):>12}"
+            if key in baseline:
+                change = result["best"] / baseline[key]["best"] - 1
+                flag = ""
+                if change > args.threshold:
+                    regressions.append(key)
+                    flag = "  REGRESSION"
+                line += f"{_format_seconds(baseline[key]['best']):>12}{change * 100:+8.1f}%{flag}"
+            print(line)
+
+    if args.save:
+        baselines[args.machine] = dict(baseline, **results)
+        with open(args.baseline, "w") as handle:
+            json.dump(baselines, handle, indent=2, sort_keys=True)
+        print(f"\nSaved {len(results)} baselines for {args.machine} to {args.baseline}")
+    elif not baseline:
+        print(f"\nNo baselines for {args.machine} in {args.baseline}; run with --save to record them")
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump({"machine": args.machine, "results": results, "regressions": regressions}, handle, indent=2)
+    if regressions and not args.save:
+        print(f"\n{len(regressions)} cases regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Request count and wall time for drawing a mind map against the mock Miro API.
+
+The last two runs regenerate the map after a one-bullet edit, once by
+rebuilding a new board and once by diff-syncing the existing one.
+
+Usage:
+    python benchmarks/miro_benchmark.py --themes 7 --bullets 5 --latency-ms 80
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_miro_server import make_server  # noqa: E402
+from app.helpers import miro_sync, miro_utils  # noqa: E402
+
+
+def synthetic_summary(themes, bullets, edited=None):
+    lines = ["# Synthetic Book"]
+    for i in range(themes):
+        lines.append(f"## Theme {i}")
+        lines.extend(f"- Point {i}.{j} about the theme" + (" (revised)" if (i, j) == edited else "")
+                     for j in range(bullets))
+    return "\n".join(lines)
+
+
+def run(label, state, summary, sync=False, **options):
+    state.counts.clear()
+    start = time.perf_counter()
+    if sync:
+        result = miro_sync.sync_miro_mindmap(summary, "mock-token", **options)
+    else:
+        result = miro_utils.create_miro_mindmap(summary, "mock-token", **options)
+    elapsed = time.perf_counter() - start
+    stats = state.stats()
+    print(f"{label:<10} success={result['success']!s:<5} requests={stats['total']:>4}  "
+          f"time={elapsed:6.2f}s  routes={stats['by_route']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--themes", type=int, default=7)
+    parser.add_argument("--bullets", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=80.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of requests the mock answers with 429")
+    args = parser.parse_args()
+
+    server, state, base_url = make_server(latency_ms=args.latency_ms, throttle_rate=args.throttle_rate)
+    miro_utils.MIRO_API_BASE = base_url
+    summary = synthetic_summary(args.themes, args.bullets)
+    nodes = 1 + args.themes * (1 + args.bullets)
+    print(f"{nodes} nodes, {nodes - 1} connectors, {args.latency_ms:.0f} ms per request\n")
+
+    run("per-item", state, summary, bulk=False, max_workers=1)
+    run("bulk", state, summary, bulk=True, max_workers=1)
+    run("parallel", state, summary, bulk=True)
+
+    # Regenerating after a one-bullet edit: rebuild a new board versus diff-sync the old one
+    edited = synthetic_summary(args.themes, args.bullets, edited=(0, 0))
+    with tempfile.TemporaryDirectory() as journal_dir:
+        board_id = miro_sync.sync_miro_mindmap(summary, "mock-token", journal_dir=journal_dir)["board_id"]
+        run("rebuild", state, edited)
+        run("sync", state, edited, board_id=board_id, journal_dir=journal_dir, sync=True)
+
+    client = miro_utils.get_miro_client("mock-token")
+    print(f"\nclient: {client.stats}, credits remaining {client.rate_remaining}/{client.rate_limit}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
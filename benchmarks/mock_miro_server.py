@@ -0,0 +1,218 @@
+"""
+Local stand-in for the Miro REST API used by the mind map benchmarks.
+
+Implements the endpoints miro_utils calls, assigns item IDs, adds a fixed
+latency to every request and counts requests per route. It also sends
+Miro-style X-RateLimit-* headers and can reject a share of requests with
+429 to exercise the client's retry path. Point the app at it with
+MIRO_API_BASE=http://127.0.0.1:<port>/v2.
+
+Usage:
+    python benchmarks/mock_miro_server.py --port 8765 --latency-ms 80
+"""
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BULK_LIMIT = 20
+ROUTES = [
+    ("POST", re.compile(r"^/v2/boards$"), "create_board"),
+    ("GET", re.compile(r"^/v2/boards/[^/]+$"), "get_board"),
+    ("POST", re.compile(r"^/v2/boards/[^/]+/items/bulk$"), "bulk_items"),
+    ("GET", re.compile(r"^/v2/boards/[^/]+/items$"), "list_items"),
+    ("GET", re.compile(r"^/v2/boards/[^/]+/connectors$"), "list_connectors"),
+    ("POST", re.compile(r"^/v2/boards/[^/]+/(shapes|sticky_notes|cards|connectors)$"), "create_item"),
+    ("PATCH", re.compile(r"^/v2/boards/[^/]+/(shapes|sticky_notes|cards|connectors)/[^/]+$"), "update_item"),
+    ("DELETE", re.compile(r"^/v2/boards/[^/]+/(items|shapes|sticky_notes|cards|connectors)/[^/]+$"), "delete_item"),
+]
+
+
+# Credits per one-minute window, as in Miro's level-based limits
+RATE_LIMIT_CREDITS = 100000
+
+
+class MockMiroState:
+    def __init__(self, latency_ms=0.0, throttle_rate=0.0):
+        self.latency_ms = latency_ms
+        self.throttle_rate = throttle_rate  # Share of requests answered with 429
+        self.credits_used = 0
+        self.counts = Counter()
+        self.items = {}  # item id -> stored item
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def next_id(self, prefix="item"):
+        return f"{prefix}-{next(self._ids)}"
+
+    def reset(self):
+        with self.lock:
+            self.counts.clear()
+            self.items.clear()
+            self.credits_used = 0
+            self.max_in_flight = 0
+
+    def stats(self):
+        with self.lock:
+            return {"total": sum(count for route, count in self.counts.items() if route != "throttled"),
+                    "by_route": dict(self.counts),
+                    "items": len(self.items), "max_in_flight": self.max_in_flight}
+
+
+class MockMiroHandler(BaseHTTPRequestHandler):
+    state = None  # Set by make_server
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=None, headers=None):
+        payload = b"" if body is None else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        with self.state.lock:
+            remaining = max(RATE_LIMIT_CREDITS - self.state.credits_used, 0)
+        headers = dict({
+            "X-RateLimit-Limit": str(RATE_LIMIT_CREDITS),
+            "X-RateLimit-Remaining": str(remaining),
+            "X-RateLimit-Reset": str(int(time.time()) + 60),
+        }, **(headers or {}))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length)) if length else None
+
+    def _dispatch(self, method):
+        path = self.path.split("?")[0]
+        if path == "/__stats":
+            return self._send(200, self.state.stats())
+        if path == "/__reset":
+            self.state.reset()
+            return self._send(200, {})
+
+        for route_method, pattern, name in ROUTES:
+            if route_method == method and pattern.match(path):
+                break
+        else:
+            return self._send(404, {"message": f"No route for {method} {path}"})
+
+        state = self.state
+        body = self._body()
+        with state.lock:
+            state.counts[name] += 1
+            throttled = random.random() < state.throttle_rate
+            if throttled:
+                state.counts["throttled"] += 1
+            else:
+                # Miro charges more credits for writes than for reads
+                state.credits_used += 50 if method in ("POST", "PATCH", "DELETE") else 10
+        if throttled:
+            return self._send(429, {"message": "Too many requests"}, {"Retry-After": "0.05"})
+        with state.lock:
+            state.in_flight += 1
+            state.max_in_flight = max(state.max_in_flight, state.in_flight)
+        try:
+            time.sleep(state.latency_ms / 1000.0)
+            return getattr(self, f"_{name}")(path, body)
+        finally:
+            with state.lock:
+                state.in_flight -= 1
+
+    def _store(self, item_type, item):
+        item = dict(item or {}, type=item_type, id=self.state.next_id(item_type))
+        with self.state.lock:
+            self.state.items[item["id"]] = item
+        return item
+
+    def _create_board(self, path, body):
+        return self._send(201, {"id": self.state.next_id("board"), "name": (body or {}).get("name")})
+
+    def _get_board(self, path, body):
+        return self._send(200, {"id": path.rsplit("/", 1)[1]})
+
+    def _bulk_items(self, path, body):
+        if not isinstance(body, list) or not 0 < len(body) <= BULK_LIMIT:
+            return self._send(400, {"message": f"Expected 1-{BULK_LIMIT} items"})
+        created = [self._store(item.get("type", "shape"), item) for item in body]
+        return self._send(201, {"data": created, "type": "bulk-list"})
+
+    def _list_items(self, path, body):
+        with self.state.lock:
+            items = [item for item in self.state.items.values() if item["type"] != "connector"]
+        return self._send(200, {"data": items, "total": len(items)})
+
+    def _list_connectors(self, path, body):
+        with self.state.lock:
+            connectors = [item for item in self.state.items.values() if item["type"] == "connector"]
+        return self._send(200, {"data": connectors, "total": len(connectors)})
+
+    def _create_item(self, path, body):
+        item_type = path.rsplit("/", 1)[1].rstrip("s")
+        return self._send(201, self._store(item_type, body))
+
+    def _update_item(self, path, body):
+        item_id = path.rsplit("/", 1)[1]
+        with self.state.lock:
+            item = self.state.items.get(item_id)
+            if item is not None:
+                item.update(body or {})
+                item = dict(item)
+        if item is None:
+            return self._send(404, {"message": "Item not found"})
+        return self._send(200, item)
+
+    def _delete_item(self, path, body):
+        with self.state.lock:
+            self.state.items.pop(path.rsplit("/", 1)[1], None)
+        return self._send(204)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PATCH(self):
+        self._dispatch("PATCH")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+
+def make_server(port=0, latency_ms=0.0, throttle_rate=0.0, handler=MockMiroHandler):
+    """Start the mock in a background thread; returns (server, state, API base URL)"""
+    state = MockMiroState(latency_ms, throttle_rate)
+    handler_class = type("BoundMockMiroHandler", (handler,), {"state": state})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler_class)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state, f"http://127.0.0.1:{server.server_address[1]}/v2"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=80.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of requests answered with 429")
+    args = parser.parse_args()
+    server, state, base_url = make_server(args.port, args.latency_ms, args.throttle_rate)
+    print(f"Mock Miro API at {base_url} (stats at /__stats)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Local stand-in for the OpenAI chat completions and embeddings APIs.
+
+Chat completions return a markdown summary with themes and bullets (the
+shape the summary, workbook and mind map code expects), plain or streamed
+at a fixed token rate, with usage counts. Embeddings are deterministic
+hashed bag-of-words vectors of the requested dimensions, in float lists or
+base64 as the SDK requests. Every request waits a fixed latency; a share of
+requests can be rejected with 429. Point the app at it with
+OPENAI_BASE_URL=http://127.0.0.1:<port>/v1.
+
+Usage:
+    python benchmarks/mock_openai_server.py --port 8767 --latency-ms 400 --tokens-per-second 80
+"""
+import argparse
+import base64
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+WORD_PATTERN = re.compile(r"\w+")
+# Rough tokens per word of English text, for the usage counts
+TOKENS_PER_WORD = 1.3
+
+
+def _token_count(text):
+    return max(1, int(len(WORD_PATTERN.findall(text)) * TOKENS_PER_WORD))
+
+
+def canned_summary(prompt, themes=5, bullets=4):
+    """A markdown summary whose words come from the prompt, so different inputs get different maps"""
+    words = [word for word in WORD_PATTERN.findall(prompt) if len(word) > 3][:400] or ["idea"]
+    rng = random.Random(zlib.crc32(prompt.encode("utf-8")))
+    lines = ["# Book Summary", ""]
+    for theme in range(themes):
+        lines.append(f"## Theme {theme + 1}: {' '.join(rng.choice(words) for _ in range(3)).title()}")
+        for _ in range(bullets):
+            lines.append(f"- {' '.join(rng.choice(words) for _ in range(rng.randint(6, 14)))}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def hashed_embedding(text, dimensions):
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for word in WORD_PATTERN.findall(text.lower()):
+        vector[zlib.crc32(word.encode("utf-8")) % dimensions] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class MockOpenAIState:
+    def __init__(self, latency_ms=0.0, tokens_per_second=0.0, throttle_rate=0.0):
+        self.latency_ms = latency_ms
+        self.tokens_per_second = tokens_per_second  # Streaming rate; 0 streams without delay
+        self.throttle_rate = throttle_rate  # Share of requests answered with 429
+        self.counts = Counter()
+        self.tokens = Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def reset(self):
+        with self.lock:
+            self.counts.clear()
+            self.tokens.clear()
+            self.max_in_flight = 0
+
+    def stats(self):
+        with self.lock:
+            return {"total": sum(count for route, count in self.counts.items() if route != "throttled"),
+                    "by_route": dict(self.counts), "tokens": dict(self.tokens),
+                    "max_in_flight": self.max_in_flight}
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state = None  # Set by make_server
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, headers=None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path == "/__stats":
+            return self._send(200, self.state.stats())
+        return self._send(404, {"error": {"message": f"No route for GET {self.path}"}})
+
+    def do_POST(self):
+        path = self.path.split("?")[0]
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else {}
+        if path == "/__reset":
+            self.state.reset()
+            return self._send(200, {})
+        if path.endswith("/chat/completions"):
+            name = "chat_stream" if body.get("stream") else "chat"
+        elif path.endswith("/embeddings"):
+            name = "embeddings"
+        else:
+            return self._send(404, {"error": {"message": f"No route for POST {path}"}})
+
+        state = self.state
+        with state.lock:
+            state.counts[name] += 1
+            throttled = random.random() < state.throttle_rate
+            if throttled:
+                state.counts["throttled"] += 1
+        if throttled:
+            return self._send(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                              {"Retry-After": "0.05"})
+        with state.lock:
+            state.in_flight += 1
+            state.max_in_flight = max(state.max_in_flight, state.in_flight)
+        try:
+            time.sleep(state.latency_ms / 1000.0)
+            if name == "embeddings":
+                return self._embeddings(body)
+            return self._chat(body, stream=name == "chat_stream")
+        finally:
+            with state.lock:
+                state.in_flight -= 1
+
+    def _embeddings(self, body):
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        dimensions = body.get("dimensions") or 1536
+        data = []
+        for index, text in enumerate(inputs):
+            vector = hashed_embedding(str(text), dimensions)
+            if body.get("encoding_format") == "base64":
+                embedding = base64.b64encode(vector.astype("<f4").tobytes()).decode("ascii")
+            else:
+                embedding = vector.tolist()
+            data.append({"object": "embedding", "index": index, "embedding": embedding})
+        prompt_tokens = sum(_token_count(str(text)) for text in inputs)
+        with self.state.lock:
+            self.state.tokens["prompt"] += prompt_tokens
+        return self._send(200, {"object": "list", "data": data, "model": body.get("model"),
+                                "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens}})
+
+    def _chat(self, body, stream):
+        prompt = "\n".join(str(message.get("content", "")) for message in body.get("messages", []))
+        text = canned_summary(prompt)
+        usage = {"prompt_tokens": _token_count(prompt), "completion_tokens": _token_count(text)}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        with self.state.lock:
+            self.state.tokens["prompt"] += usage["prompt_tokens"]
+            self.state.tokens["completion"] += usage["completion_tokens"]
+        model = body.get("model")
+        if not stream:
+            return self._send(200, {
+                "id": "chatcmpl-mock", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        delay = 1.0 / self.state.tokens_per_second if self.state.tokens_per_second else 0.0
+        for fragment in re.findall(r"\S+\s*|\s+", text):
+            time.sleep(delay)
+            event = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": model, "choices": [{"index": 0, "delta": {"content": fragment}, "finish_reason": None}]}
+            self._write_chunk(f"data: {json.dumps(event)}\n\n".encode())
+        if (body.get("stream_options") or {}).get("include_usage"):
+            event = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": model, "choices": [], "usage": usage}
+            self._write_chunk(f"data: {json.dumps(event)}\n\n".encode())
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+
+def make_server(port=0, latency_ms=0.0, tokens_per_second=0.0, throttle_rate=0.0, handler=MockOpenAIHandler):
+    """Start the mock in a background thread; returns (server, state, API base URL)"""
+    state = MockOpenAIState(latency_ms, tokens_per_second, throttle_rate)
+    handler_class = type("BoundMockOpenAIHandler", (handler,), {"state": state})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler_class)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--latency-ms", type=float, default=400.0)
+    parser.add_argument("--tokens-per-second", type=float, default=80.0, help="Streaming rate; 0 for no delay")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of requests answered with 429")
+    args = parser.parse_args()
+    server, state, base_url = make_server(args.port, args.latency_ms, args.tokens_per_second, args.throttle_rate)
+    print(f"Mock OpenAI API at {base_url} (stats at /__stats)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Tokens the normalization stage saves per book.
+
+Extracts each PDF page by page, runs the normalization the app applies
+before chunking (running headers, footers and page numbers, ligatures,
+hyphenated line breaks, whitespace) and reports the tokens before and
+after, with what was removed. Runs offline once tiktoken's encoding files
+are cached.
+
+Usage:
+    python benchmarks/normalization_report.py book1.pdf book2.pdf --output normalization.json
+    python benchmarks/normalization_report.py --show 2000 book.pdf   # print the start of the cleaned text
+"""
+import argparse
+import io
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.helpers.normalize_utils import normalize_pages  # noqa: E402
+from app.helpers.pdf_utils import extract_pages_from_pdf  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="+", help="PDF files to report on")
+    parser.add_argument("--show", type=int, default=0, help="Print this many characters of each cleaned text")
+    parser.add_argument("--output", help="Write the reports to this JSON file")
+    args = parser.parse_args()
+
+    reports = []
+    print(f"{'book':<32}{'pages':>7}{'tokens before':>15}{'after':>11}{'saved':>8}"
+          f"{'boilerplate':>13}{'hyphens':>9}{'ligatures':>11}")
+    for path in args.pdfs:
+        with open(path, "rb") as handle:
+            pages = extract_pages_from_pdf(io.BytesIO(handle.read()))
+        text, report = normalize_pages(pages, measure_tokens=True)
+        saved = 1 - report["tokens_after"] / report["tokens_before"] if report["tokens_before"] else 0.0
+        print(f"{os.path.basename(path)[:31]:<32}{report['pages']:>7}{report['tokens_before']:>15,}"
+              f"{report['tokens_after']:>11,}{saved:>8.1%}{report['boilerplate_lines']:>13,}"
+              f"{report['hyphenations']:>9,}{report['ligatures']:>11,}")
+        if args.show:
+            print(text[:args.show] + "\n")
+        reports.append(dict(report, book=path, saved=saved))
+
+    if len(reports) > 1:
+        before = sum(report["tokens_before"] for report in reports)
+        after = sum(report["tokens_after"] for report in reports)
+        print(f"\n{len(reports)} books: {before - after:,} of {before:,} tokens saved ({1 - after / before:.1%})")
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(reports, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Memory versus recall for the SimpleVectorStore quantization modes.
+
+Generates clustered unit vectors shaped like text embeddings, uses exact
+float32 search as ground truth and reports recall@k, query latency and memory
+for float32, int8 and binary storage, with and without full-precision
+rescoring. Memory is the vector store's arrays and the whole BookChatBot
+holding that index (chunk texts, lexical index and caches included).
+
+Usage:
+    python benchmarks/quantization_benchmark.py --vectors 50000 --dimensions 1536
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.helpers.chat_utils import BookChatBot  # noqa: E402
+from app.helpers.memory_utils import deep_sizeof  # noqa: E402
+
+
+def synthetic_embeddings(count, dimensions, clusters=200, seed=0):
+    """Vectors around random topic centroids, like chunks of a book library"""
+    rng = np.random.default_rng(seed)
+    centroids = rng.normal(size=(clusters, dimensions)).astype(np.float32)
+    assignment = rng.integers(0, clusters, size=count)
+    vectors = centroids[assignment] + 0.8 * rng.normal(size=(count, dimensions)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    vectors = synthetic_embeddings(args.vectors, args.dimensions)
+    rng = np.random.default_rng(1)
+    picks = rng.choice(args.vectors, size=args.queries, replace=False)
+    queries = vectors[picks] + 0.05 * rng.normal(size=(args.queries, args.dimensions)).astype(np.float32)
+    truth = [set(np.argsort(-(vectors @ query))[:args.top_k]) for query in queries]
+    texts = [str(i) for i in range(args.vectors)]
+
+    print(f"{args.vectors} vectors x {args.dimensions} dims, {args.queries} queries, recall@{args.top_k}\n")
+    print(f"{'mode':<18}{'vectors MB':>11}{'bot MB':>9}{'ratio':>8}{'recall':>9}{'ms/query':>10}")
+    baseline_bytes = None
+    for mode, rescore in (("none", True), ("int8", False), ("int8", True), ("binary", False), ("binary", True)):
+        # The client is never called: the index is built from the precomputed vectors
+        bot = BookChatBot(api_key="sk-benchmark", embedding_dimensions=args.dimensions, quantization=mode)
+        bot.initialize_from_chunks(texts, vectors)
+        bot.export_index()  # Builds the matrix or codes, as the app does before sharing the index
+        store = bot.vector_store
+        nbytes = deep_sizeof(bot)
+        baseline_bytes = baseline_bytes or nbytes
+
+        start = time.perf_counter()
+        found = [store.search_indices(query, args.top_k, rescore=rescore) for query in queries]
+        elapsed_ms = (time.perf_counter() - start) * 1000 / args.queries
+
+        recall = np.mean([len(truth[i] & {index for index, _ in hits}) / args.top_k for i, hits in enumerate(found)])
+        label = mode if mode == "none" else f"{mode}{' + rescore' if rescore else ''}"
+        print(f"{label:<18}{store.nbytes / 1e6:>11.1f}{nbytes / 1e6:>9.1f}{baseline_bytes / nbytes:>7.1f}x"
+              f"{recall:>9.3f}{elapsed_ms:>10.2f}")
+        store.clear()
+
+
+if __name__ == "__main__":
+    main()
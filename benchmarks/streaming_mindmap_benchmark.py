@@ -0,0 +1,74 @@
+"""
+Time to first node and end-to-end time for drawing a mind map while its summary streams in.
+
+Replays a synthetic summary as a token stream at a fixed rate and draws it
+on the mock Miro API twice: once after the whole summary has arrived (sync
+of the finished text) and once from the stream as each line completes.
+
+Usage:
+    python benchmarks/streaming_mindmap_benchmark.py --tokens-per-second 60 --latency-ms 80
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from miro_benchmark import synthetic_summary  # noqa: E402
+from mock_miro_server import make_server  # noqa: E402
+from app.helpers import miro_sync, miro_utils  # noqa: E402
+
+
+def token_stream(text, tokens_per_second):
+    """Yield text in word-sized fragments at roughly the given generation rate"""
+    for fragment in re.findall(r"\S+\s*|\s+", text):
+        time.sleep(1.0 / tokens_per_second)
+        yield fragment
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--themes", type=int, default=7)
+    parser.add_argument("--bullets", type=int, default=5)
+    parser.add_argument("--tokens-per-second", type=float, default=60.0)
+    parser.add_argument("--latency-ms", type=float, default=80.0)
+    parser.add_argument("--no-relayout", action="store_true", help="Keep the provisional streamed positions")
+    args = parser.parse_args()
+
+    server, state, base_url = make_server(latency_ms=args.latency_ms)
+    miro_utils.MIRO_API_BASE = base_url
+    summary = synthetic_summary(args.themes, args.bullets)
+    fragments = len(re.findall(r"\S+\s*|\s+", summary))
+    print(f"{1 + args.themes * (1 + args.bullets)} nodes, {fragments} tokens at {args.tokens_per_second:.0f}/s "
+          f"({fragments / args.tokens_per_second:.1f}s of generation), {args.latency_ms:.0f} ms per request\n")
+
+    with tempfile.TemporaryDirectory() as journal_dir:
+        state.reset()
+        started = time.perf_counter()
+        text = "".join(token_stream(summary, args.tokens_per_second))
+        generated = time.perf_counter() - started
+        result = miro_sync.sync_miro_mindmap(text, "mock-token", journal_dir=journal_dir)
+        total = time.perf_counter() - started
+        requests = state.stats()["total"]
+        # The first shapes land with the first bulk call after board creation and generation
+        print(f"after summary  success={result['success']!s:<5} first node after >{generated:5.2f}s  "
+              f"total={total:5.2f}s  requests={requests}")
+
+        state.reset()
+        started = time.perf_counter()
+        text, result = miro_sync.publish_summary_stream(
+            token_stream(summary, args.tokens_per_second), "mock-token",
+            relayout=not args.no_relayout, journal_dir=journal_dir)
+        total = time.perf_counter() - started
+        stats = state.stats()
+        print(f"streamed       success={result['success']!s:<5} first node after  {result['first_node_seconds']:5.2f}s  "
+              f"total={total:5.2f}s  requests={stats['total']}  relayout changes={result['changes']}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+
+# Import the helpers as app.helpers, the way the benchmarks do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.helpers import context_utils, pdf_utils  # noqa: E402
+
+
+class StubTokenizer:
+    """One token per whitespace-separated word, so tests never download tiktoken's encodings"""
+    def __init__(self):
+        self.ids = {}
+        self.words = {}
+
+    def encode(self, text):
+        tokens = []
+        for word in text.split():
+            if word not in self.ids:
+                self.ids[word] = len(self.ids)
+                self.words[self.ids[word]] = word
+            tokens.append(self.ids[word])
+        return tokens
+
+    def decode(self, tokens):
+        return " ".join(self.words[token] for token in tokens)
+
+
+@pytest.fixture(autouse=True)
+def stub_tokenizer(monkeypatch):
+    tokenizer = StubTokenizer()
+    for module in (context_utils, pdf_utils):
+        monkeypatch.setattr(module, "get_tokenizer", lambda model="gpt-4o-mini": tokenizer)
+    return tokenizer
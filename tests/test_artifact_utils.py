@@ -0,0 +1,89 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from app.helpers import artifact_utils
+from app.helpers.artifact_utils import STALE_TEMP_SECONDS, ArtifactCache, cache_key, stage_fingerprint
+from app.helpers.chat_utils import SimpleVectorStore
+
+
+def test_fingerprint_is_stable_and_depends_on_inputs():
+    assert stage_fingerprint("workbook", "summary") == stage_fingerprint("workbook", "summary")
+    assert stage_fingerprint("workbook", "summary") != stage_fingerprint("workbook", "other summary")
+    assert len({stage_fingerprint(stage) for stage in artifact_utils.STAGES}) == len(artifact_utils.STAGES)
+
+
+def test_settings_change_invalidates_the_stage_and_the_stages_built_on_it(monkeypatch):
+    before = {stage: stage_fingerprint(stage) for stage in artifact_utils.STAGES}
+    inputs, settings = artifact_utils.STAGES["text"]
+    monkeypatch.setitem(artifact_utils.STAGES, "text", (inputs, settings + ("changed",)))
+    after = {stage: stage_fingerprint(stage) for stage in artifact_utils.STAGES}
+    assert {stage for stage in before if before[stage] != after[stage]} == {"text", "summary", "workbook",
+                                                                            "chat_index"}
+
+
+def test_pipeline_version_invalidates_everything(monkeypatch):
+    before = stage_fingerprint("chat_index")
+    monkeypatch.setattr(artifact_utils, "PIPELINE_VERSION", artifact_utils.PIPELINE_VERSION + 1)
+    assert stage_fingerprint("chat_index") != before
+
+
+def test_tenants_are_kept_apart():
+    assert cache_key("sk-a", "book") != cache_key("sk-b", "book")
+    assert cache_key("sk-a", "book") == cache_key("sk-a", "book")
+    assert "sk-a" not in cache_key("sk-a", "book")
+
+
+def test_save_load_and_invalidate(tmp_path):
+    cache = ArtifactCache(str(tmp_path))
+    key = cache_key("sk-a", "book")
+    assert cache.load(key, "summary") is None
+    cache.save(key, "summary", "A summary")
+    cache.save(key, "workbook", "Exercises", inputs="A summary")
+    assert cache.load(key, "summary") == "A summary"
+    assert cache.load(key, "workbook", inputs="A summary") == "Exercises"
+    assert cache.load(key, "workbook", inputs="Another summary") is None
+    cache.invalidate(key, "summary")
+    assert cache.load(key, "summary") is None
+    assert cache.load(key, "workbook", inputs="A summary") == "Exercises"
+
+
+def test_saving_replaces_outdated_files_but_not_temp_files_being_written(tmp_path):
+    cache = ArtifactCache(str(tmp_path))
+    key = cache_key("sk-a", "book")
+    cache.save(key, "workbook", "Old exercises", inputs="Old summary")
+    directory = tmp_path / key
+    fresh_temp = directory / "workbook-0123.json.abc.tmp"
+    old_temp = directory / "workbook-4567.json.def.tmp"
+    fresh_temp.write_text("{")
+    old_temp.write_text("{")
+    long_ago = time.time() - STALE_TEMP_SECONDS - 1
+    os.utime(old_temp, (long_ago, long_ago))
+    cache.save(key, "workbook", "New exercises", inputs="New summary")
+    assert sorted(path.name for path in directory.iterdir()) == sorted([
+        f"workbook-{stage_fingerprint('workbook', 'New summary')}.json", fresh_temp.name])
+
+
+@pytest.mark.parametrize("quantization", ["none", "int8"])
+def test_chat_index_round_trip(tmp_path, quantization):
+    cache = ArtifactCache(str(tmp_path))
+    key = cache_key("sk-a", "book")
+    chunks = ["first chunk", "second chunk", "first chunk"]
+    store = SimpleVectorStore(quantization=quantization, storage_dir=str(tmp_path))
+    store.add_batch(np.eye(3, 4, dtype=np.float32), chunks[:2] + ["other chunk"])
+    cache.save_chat_index(key, chunks, store)  # A store missing chunks is not cached
+    assert cache.load_chat_index(key) is None
+    store = SimpleVectorStore(quantization=quantization, storage_dir=str(tmp_path))
+    store.add_batch(np.eye(3, 4, dtype=np.float32), chunks)
+    cache.save_chat_index(key, chunks, store)
+    loaded_chunks, loaded_embeddings = cache.load_chat_index(key)
+    assert loaded_chunks == chunks
+    assert np.array_equal(loaded_embeddings, np.eye(3, 4, dtype=np.float32))
+
+
+def test_disabled_cache_stores_nothing(tmp_path):
+    cache = ArtifactCache("0")
+    cache.save("tenant/book", "summary", "A summary")
+    assert cache.load("tenant/book", "summary") is None
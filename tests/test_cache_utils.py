@@ -0,0 +1,68 @@
+import numpy as np
+
+from app.helpers import cache_utils
+from app.helpers.cache_utils import SemanticAnswerCache, get_answer_cache, is_standalone_question, normalize_question
+
+
+def unit(*values):
+    return np.array(values, dtype=np.float32)
+
+
+def test_exact_repeat_needs_no_embedding():
+    cache = SemanticAnswerCache()
+    cache.store("Who is Ahab?", unit(1, 0), "The captain.")
+    assert cache.lookup_exact("who is  ahab") == "The captain."
+    assert cache.lookup_exact("Who is Ishmael?") is None
+    assert cache.stats()["misses"] == 0
+
+
+def test_similar_question_hits_above_threshold():
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.store("Who is Ahab?", unit(1, 0), "The captain.")
+    assert cache.lookup("Tell me about Ahab", unit(0.99, 0.05)) == "The captain."
+    assert cache.lookup("Where is Nantucket?", unit(0, 1)) is None
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 1, "hit_ratio": 0.5}
+
+
+def test_answers_without_embedding_only_match_verbatim():
+    cache = SemanticAnswerCache()
+    cache.store("Pequod", None, "The ship.")
+    cache.store("Whale", np.zeros(2, dtype=np.float32), "Moby Dick.")
+    assert cache.lookup("Pequod", unit(1, 0)) is None
+    assert cache.lookup("Whale", None) is None
+    assert cache.lookup_exact("pequod") == "The ship."
+    assert cache.lookup_exact("whale") == "Moby Dick."
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticAnswerCache(max_entries=2)
+    cache.store("one", unit(1, 0), "1")
+    cache.store("two", unit(0, 1), "2")
+    cache.lookup_exact("one")
+    cache.store("three", unit(1, 1), "3")
+    assert cache.lookup_exact("two") is None
+    assert cache.lookup_exact("one") == "1"
+
+
+def test_expired_entries_are_dropped():
+    cache = SemanticAnswerCache(ttl_seconds=-1)
+    cache.store("one", unit(1, 0), "1")
+    assert cache.lookup_exact("one") is None
+    assert len(cache) == 0
+
+
+def test_follow_up_questions_are_not_standalone():
+    assert is_standalone_question("Who wrote Moby Dick?")
+    assert not is_standalone_question("Can you explain that again?")
+    assert normalize_question("  What's  THIS?! ") == "what s this"
+
+
+def test_least_recently_used_document_cache_is_dropped(monkeypatch):
+    monkeypatch.setattr(cache_utils, "_answer_caches", cache_utils.OrderedDict())
+    monkeypatch.setattr(cache_utils, "ANSWER_CACHE_MAX_DOCUMENTS", 2)
+    first = get_answer_cache("tenant/book-1")
+    second = get_answer_cache("tenant/book-2")
+    assert get_answer_cache("tenant/book-1") is first
+    get_answer_cache("tenant/book-3")
+    assert get_answer_cache("tenant/book-1") is first
+    assert get_answer_cache("tenant/book-2") is not second
@@ -0,0 +1,84 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.helpers import chat_utils
+from app.helpers.cache_utils import SemanticAnswerCache
+from app.helpers.chat_utils import BookChatBot
+
+CHUNKS = ["Ahab hunts the white whale.", "Ishmael signs on to the Pequod.", "Ahab hunts the white whale."]
+
+
+class FakeCompletions:
+    def __init__(self):
+        self.requests = []
+
+    def create(self, model, messages, temperature):
+        self.requests.append(messages)
+        return SimpleNamespace(usage=None, choices=[
+            SimpleNamespace(message=SimpleNamespace(content=f"Answer {len(self.requests)}"))])
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.inputs = []
+
+    def create(self, model, input, dimensions):
+        texts = input if isinstance(input, list) else [input]
+        self.inputs.extend(texts)
+        return SimpleNamespace(usage=None, data=[
+            SimpleNamespace(embedding=np.random.default_rng(len(text)).normal(size=dimensions).tolist())
+            for text in texts])
+
+
+@pytest.fixture
+def bot():
+    bot = BookChatBot(api_key="sk-test", embedding_dimensions=8)
+    bot.client = SimpleNamespace(embeddings=FakeEmbeddings(),
+                                 chat=SimpleNamespace(completions=FakeCompletions()))
+    return bot
+
+
+def test_chunk_vectors_live_only_in_the_vector_store(bot):
+    bot.initialize_from_chunks(CHUNKS)
+    assert bot.client.embeddings.inputs == CHUNKS[:2]  # Each distinct chunk is embedded once
+    assert list(bot.vector_store.texts) == CHUNKS
+    assert len(bot.embedding_cache) == 0
+
+
+def test_empty_document_is_not_indexed(bot):
+    bot.initialize_from_chunks([])
+    assert not bot.is_initialized
+    assert bot.client.embeddings.inputs == []
+
+
+def test_saved_embeddings_skip_the_api(bot):
+    bot.initialize_from_chunks(CHUNKS, np.eye(3, 8, dtype=np.float32))
+    assert bot.client.embeddings.inputs == []
+    assert bot.vector_store.search_indices(np.eye(8)[1], 1)[0][0] == 1
+    with pytest.raises(ValueError):
+        bot.initialize_from_chunks(CHUNKS, np.eye(2, 8, dtype=np.float32))
+
+
+def test_query_embedding_cache_is_bounded(bot, monkeypatch):
+    monkeypatch.setattr(chat_utils, "QUERY_EMBEDDING_CACHE_SIZE", 2)
+    for query in ["first", "second", "first", "third"]:
+        bot.create_embedding(query)
+    assert bot.client.embeddings.inputs == ["first", "second", "third"]
+    assert len(bot.embedding_cache) == 2
+    bot.create_embedding("first")  # Recently used, so still cached
+    bot.create_embedding("second")
+    assert bot.client.embeddings.inputs == ["first", "second", "third", "second"]
+
+
+def test_answers_given_with_history_are_not_shared(bot):
+    bot.initialize_from_chunks(CHUNKS)
+    bot.answer_cache = SemanticAnswerCache()
+    history = [{"role": "user", "content": "Who is Ishmael?"}, {"role": "assistant", "content": "The narrator."}]
+    assert bot.answer_question("Who hunts the white whale?", history) == "Answer 1"
+    assert len(bot.answer_cache) == 0
+    # Without history the answer is stored, and a later reader with history may reuse it
+    assert bot.answer_question("Who hunts the white whale?") == "Answer 2"
+    assert bot.answer_question("Who hunts the white whale?", history) == "Answer 2"
+    assert len(bot.client.chat.completions.requests) == 2
@@ -0,0 +1,56 @@
+from app.helpers.context_utils import CONTEXT_SEPARATOR, count_tokens, pack_context
+
+SPANS = [
+    ("The whale surfaced beside the ship at dawn and the crew lowered the boats.", 0.9),
+    ("Ahab nailed a gold coin to the mast for the first man to sight the white whale.", 0.8),
+    ("Ishmael signs on with the Pequod after meeting Queequeg at the Spouter Inn.", 0.5),
+    ("Starbuck argues that vengeance on a dumb brute is blasphemous and madness.", 0.3),
+]
+
+
+def packed_tokens(selected):
+    return count_tokens(CONTEXT_SEPARATOR.join(text for text, _ in selected))
+
+
+def test_large_budget_takes_every_relevant_span_best_first():
+    selected = pack_context(SPANS, token_budget=10000)
+    assert selected == SPANS
+
+
+def test_every_candidate_fits_when_the_budget_allows():
+    # Regression: the lowest-scored candidate, rescaled to zero relevance, was always dropped
+    for candidates in (SPANS[:2], SPANS[2:], SPANS[::-1]):
+        selected = pack_context(candidates, token_budget=packed_tokens(candidates))
+        assert sorted(selected) == sorted(candidates)
+
+
+def test_budget_is_never_exceeded_and_spans_are_whole():
+    for budget in (0, 10, 25, 40, 60, 80):
+        selected = pack_context(SPANS, token_budget=budget)
+        assert packed_tokens(selected) <= budget
+        assert all((text, score) in SPANS for text, score in selected)
+
+
+def test_small_spans_fill_the_budget_left_by_a_long_one():
+    long_span = (" ".join(text for text, _ in SPANS), 1.0)
+    budget = count_tokens(long_span[0]) - 1
+    selected = pack_context([long_span] + SPANS, token_budget=budget)
+    assert long_span not in selected
+    assert selected
+
+
+def test_near_duplicate_windows_are_skipped():
+    text = SPANS[0][0]
+    overlapping = (text[:-1] + " quickly.", 0.85)
+    selected = pack_context([SPANS[0], overlapping, SPANS[2], SPANS[3]], token_budget=10000)
+    assert [text for text, _ in selected] == [SPANS[0][0], SPANS[2][0], SPANS[3][0]]
+
+
+def test_exact_duplicates_keep_their_best_score():
+    selected = pack_context([("Same text.", 0.2), ("Same text.", 0.7)], token_budget=100)
+    assert selected == [("Same text.", 0.7)]
+
+
+def test_no_candidates():
+    assert pack_context([], token_budget=100) == []
+    assert pack_context([("", 1.0)], token_budget=100) == []
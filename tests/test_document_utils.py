@@ -0,0 +1,82 @@
+import gc
+import threading
+import time
+
+import pytest
+
+from app.helpers.document_utils import DocumentStore
+from app.helpers.vector_utils import FullPrecisionFile
+
+
+@pytest.fixture
+def store(tmp_path):
+    return DocumentStore(memory_limit_bytes=50_000, directory=str(tmp_path), idle_seconds=3600)
+
+
+def test_sessions_share_one_value(store):
+    text = "x" * 1000
+    store.put("book", "text", text)
+    assert store.get("book", "text") is text
+    assert store.get("book", "summary") is None
+    assert store.get("other book", "text") is None
+
+
+def test_get_or_create_builds_once_under_concurrency(store):
+    builds = []
+
+    def build():
+        builds.append(1)
+        time.sleep(0.05)
+        return "summary"
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(store.get_or_create("book", "summary", build)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["summary"] * 8 and len(builds) == 1
+
+
+def test_failed_build_stores_nothing(store):
+    assert store.get_or_create("book", "summary", lambda: None) is None
+    assert store.get_or_create("book", "summary", lambda: "retried") == "retried"
+
+
+def test_unleased_books_spill_to_disk_and_load_back(store, tmp_path):
+    lease = store.acquire("open book")
+    store.put("open book", "text", "a" * 40_000)
+    store.put("closed book", "text", "b" * 40_000)
+    stats = store.stats()
+    assert stats["spilled_bytes"] > 0 and stats["memory_bytes"] <= 50_000
+    assert any(tmp_path.iterdir())
+    assert store.get("closed book", "text") == "b" * 40_000  # Loaded back from disk
+    lease.release()
+    assert lease.released and store.stats()["leases"] == 0
+
+
+def test_unpicklable_values_stay_in_memory(store, tmp_path):
+    vectors = FullPrecisionFile(4, str(tmp_path))
+    store.put("book", "chat_index", {"vectors": vectors, "padding": "c" * 60_000})
+    assert store.get("book", "chat_index")["vectors"] is vectors
+    assert store.stats()["spilled_bytes"] == 0
+
+
+def test_idle_books_are_dropped_unless_open(tmp_path):
+    store = DocumentStore(directory=str(tmp_path), idle_seconds=0)
+    lease = store.acquire("open book")
+    store.put("open book", "text", "kept")
+    store.put("idle book", "text", "dropped")
+    time.sleep(0.01)
+    store.acquire("another book").release()  # Any call tidies up
+    assert store.get("open book", "text") == "kept"
+    assert store.get("idle book", "text") is None
+    del lease
+    gc.collect()
+    assert store.stats()["leases"] == 0
+
+
+def test_discard_lets_a_summary_be_regenerated(store):
+    store.put("book", "summary", "old")
+    store.discard("book", "summary")
+    assert store.get_or_create("book", "summary", lambda: "new") == "new"
@@ -0,0 +1,78 @@
+import random
+
+import numpy as np
+import pytest
+
+from app.helpers.layout_utils import LAYOUT_MARGIN, find_overlaps, flatten_tree, radial_layout, resolve_overlaps
+
+
+def random_tree(size, max_depth, seed):
+    rng = random.Random(seed)
+    root = {"title": "root", "children": []}
+    frontier = [(root, 0)]
+    for i in range(1, size):
+        parent, depth = rng.choice([entry for entry in frontier if entry[1] < max_depth])
+        child = {"title": f"node {i}", "children": []}
+        parent["children"].append(child)
+        frontier.append((child, depth + 1))
+    return root
+
+
+def wide_tree(children):
+    return {"title": "root", "children": [{"title": f"theme {i}", "children": []} for i in range(children)]}
+
+
+def deep_tree(depth, fan_out=2):
+    def build(level):
+        if level == depth:
+            return {"title": "leaf", "children": []}
+        return {"title": f"level {level}", "children": [build(level + 1) for _ in range(fan_out)]}
+    return build(0)
+
+
+def layout(tree, seed=0):
+    _, parents, depths = flatten_tree(tree)
+    rng = np.random.default_rng(seed)
+    widths = rng.uniform(80, 320, len(parents))
+    heights = rng.uniform(40, 120, len(parents))
+    x, y = radial_layout(parents, depths, widths, heights)
+    return x, y, widths, heights
+
+
+@pytest.mark.parametrize("tree", [
+    random_tree(50, 3, seed=1),
+    random_tree(400, 5, seed=2),
+    random_tree(1500, 6, seed=3),
+    wide_tree(200),
+    deep_tree(9),
+    deep_tree(4, fan_out=6),
+], ids=["random-50", "random-400", "random-1500", "wide", "deep", "bushy"])
+def test_radial_layout_has_no_overlaps(tree):
+    x, y, widths, heights = layout(tree)
+    assert len(find_overlaps(x, y, widths, heights, LAYOUT_MARGIN)) == 0
+
+
+def test_single_node_sits_at_origin():
+    x, y, _, _ = layout({"title": "root", "children": []})
+    assert x.tolist() == [0.0] and y.tolist() == [0.0]
+
+
+def test_root_stays_at_origin():
+    x, y, _, _ = layout(random_tree(200, 4, seed=4))
+    assert (x[0], y[0]) == (0.0, 0.0)
+
+
+def test_find_overlaps_reports_each_pair_once():
+    x = np.array([0.0, 50.0, 500.0])
+    y = np.zeros(3)
+    size = np.full(3, 100.0)
+    assert find_overlaps(x, y, size, size).tolist() == [[0, 1]]
+
+
+def test_resolve_overlaps_moves_the_deeper_node_outward():
+    x, y = np.array([0.0, 10.0]), np.array([0.0, 0.0])
+    size = np.full(2, 100.0)
+    new_x, new_y = resolve_overlaps(x, y, size, size, np.array([0, 1]), margin=0.0)
+    assert (new_x[0], new_y[0]) == (0.0, 0.0)
+    assert new_x[1] > 10.0 and new_y[1] == 0.0
+    assert len(find_overlaps(new_x, new_y, size, size)) == 0
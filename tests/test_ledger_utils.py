@@ -0,0 +1,56 @@
+import pytest
+
+from app.helpers.ledger_utils import UsageLedger, _percentile, estimate_cost
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = UsageLedger(str(tmp_path / "usage.sqlite3"), cache_seconds=0)
+    for latency in range(1, 21):
+        ledger.record("summary.chunk", "gpt-4o-mini", 1000, 100, latency / 1000, document="book-a")
+    ledger.record("chat.query", "text-embedding-3-small", 10, 0, 0.5, document="book-b")
+    return ledger
+
+
+def test_percentile_is_nearest_rank():
+    assert _percentile([], 0.5) == 0.0
+    assert _percentile([1, 2, 3, 4], 0.5) == 2
+    assert _percentile(list(range(1, 21)), 0.95) == 19
+
+
+def test_cost_uses_model_prices():
+    assert estimate_cost("gpt-4o-mini", 1_000_000, 1_000_000) == pytest.approx(0.75)
+    assert estimate_cost("unknown-model", 1000, 1000) == 0.0
+
+
+def test_totals_group_and_sort_by_spend(ledger):
+    rows = ledger.totals("stage")
+    assert [row["stage"] for row in rows] == ["summary.chunk", "chat.query"]
+    assert rows[0]["calls"] == 20 and rows[0]["total_tokens"] == 22000
+    assert (rows[0]["p50_ms"], rows[0]["p95_ms"]) == (10, 19)
+    assert [row["document"] for row in ledger.totals("document", document="book-b")] == ["book-b"]
+    with pytest.raises(ValueError):
+        ledger.totals("prompt")
+
+
+def test_summary_filters_by_time(ledger):
+    assert ledger.summary()["calls"] == 21
+    assert ledger.summary(since=2**40)["calls"] == 0
+
+
+def test_aggregates_are_reused_until_they_expire(tmp_path):
+    ledger = UsageLedger(str(tmp_path / "usage.sqlite3"), cache_seconds=3600)
+    ledger.record("workbook", "gpt-4o-mini", 10, 10, 0.1)
+    assert ledger.summary()["calls"] == 1
+    ledger.record("workbook", "gpt-4o-mini", 10, 10, 0.1)
+    assert ledger.summary()["calls"] == 1
+    ledger.cache_seconds = 0
+    assert ledger.summary()["calls"] == 2
+    ledger.clear()
+    assert ledger.summary()["calls"] == 0
+
+
+def test_in_memory_ledger_reads_its_own_rows():
+    ledger = UsageLedger(":memory:", cache_seconds=0)
+    ledger.record("workbook", "gpt-4o-mini", 10, 10, 0.1)
+    assert ledger.totals("model")[0]["model"] == "gpt-4o-mini"
@@ -0,0 +1,111 @@
+import pytest
+
+from app.helpers import miro_sync
+from app.helpers.miro_sync import MiroBoardSync, match_nodes, node_hash
+from app.helpers.miro_utils import build_mindmap_nodes
+
+
+def mindmap(*themes):
+    return build_mindmap_nodes({"central_topic": "Deep Work", "main_topics": [
+        {"title": title, "subtopics": [f"{title} point {i}" for i in range(2)]} for title in themes]})
+
+
+def synced(nodes):
+    """Journal items as a finished sync records them"""
+    return {node["key"]: {"id": f"id-{node['key']}", "hash": node_hash(node), "parent": node["parent"],
+                          "text": node["text"], "connector_id": f"c-{node['key']}" if node["parent"] else None,
+                          "connector_parent_id": f"id-{node['parent']}" if node["parent"] else None}
+            for node in nodes}
+
+
+@pytest.fixture
+def board(tmp_path):
+    return MiroBoardSync("token", "board-1", journal_dir=str(tmp_path))
+
+
+def test_node_hash_follows_what_the_shape_shows():
+    node = mindmap("Focus")[1]
+    assert node_hash(node) == node_hash(dict(node))
+    assert node_hash(node) != node_hash(dict(node, text="Other"))
+    assert node_hash(node) == node_hash(dict(node, x=node["x"] + 0.01))  # Sub-unit jitter is not a change
+    assert node_hash(node) != node_hash(dict(node, color="red"))
+
+
+def test_inserting_a_theme_creates_one_subtree():
+    old, new = mindmap("Focus", "Boredom"), mindmap("Rituals", "Focus", "Boredom")
+    matches = match_nodes(synced(old), new)
+    assert matches["m1"] == "m0" and matches["m2"] == "m1"  # Matched by text despite the shifted keys
+    assert matches["m1.s0"] == "m0.s0" and matches["m2.s1"] == "m1.s1"
+    assert {node["key"] for node in new if node["key"] not in matches} == {"m0", "m0.s0", "m0.s1"}
+
+
+def test_renamed_node_matches_by_sibling_position():
+    old, new = mindmap("Focus", "Boredom"), mindmap("Focus", "Embrace boredom")
+    assert match_nodes(synced(old), new)["m1"] == "m1"
+
+
+def test_plan(board):
+    nodes = mindmap("Focus", "Boredom", "Shallow work")
+    board.items = synced(nodes)
+    assert board.plan(nodes)["create"] == board.plan(nodes)["delete"] == []
+
+    edited = mindmap("Focus", "Boredom")
+    plan = board.plan(edited)
+    assert sorted(plan["delete"]) == ["m2", "m2.s0", "m2.s1"]
+    assert plan["create"] == []
+    # Fewer themes respread the ring: the remaining nodes move, the root stays at the center
+    assert sorted(plan["update"]) == ["m0", "m0.s0", "m0.s1", "m1", "m1.s0", "m1.s1"]
+    text_only = [dict(node, text="Deep Work, 2nd edition") if node["key"] == "root" else node for node in nodes]
+    assert board.plan(text_only)["update"] == ["root"]
+
+
+def test_journal_survives_a_restart(board, tmp_path):
+    board.items = synced(mindmap("Focus"))
+    board._save()
+    assert MiroBoardSync("token", "board-1", journal_dir=str(tmp_path)).items == board.items
+    assert MiroBoardSync("token", "board-2", journal_dir=str(tmp_path)).items == {}
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, body):
+        self.body = body
+
+    def json(self):
+        return self.body
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeClient:
+    def __init__(self, pages):
+        self.pages = pages
+        self.requests = []
+
+    def get(self, url, params):
+        self.requests.append((url, dict(params)))
+        return FakeResponse(self.pages[params.get("cursor")])
+
+
+def test_recover_adopts_shapes_an_interrupted_run_created(board, monkeypatch):
+    node = mindmap("Focus")[1]
+    board.pending["shapes"] = [{"key": node["key"], "text": node["text"], "x": node["x"], "y": node["y"],
+                                "parent": node["parent"], "hash": node_hash(node)}]
+    client = FakeClient({
+        None: {"data": [{"id": "unrelated", "data": {"content": "Note"}, "position": {"x": 0, "y": 0}}],
+               "cursor": "page-2"},
+        "page-2": {"data": [{"id": "made-before-crash", "data": {"content": node["text"]},
+                             "position": {"x": node["x"] + 0.5, "y": node["y"]}}]},
+    })
+    monkeypatch.setattr(miro_sync, "get_miro_client", lambda token: client)
+    assert board.recover() == 1
+    assert board.items[node["key"]]["id"] == "made-before-crash"
+    assert board.pending == {"shapes": [], "connectors": []}
+    assert len(client.requests) == 2  # Followed the cursor
+
+
+def test_recover_without_pending_items_makes_no_requests(board, monkeypatch):
+    monkeypatch.setattr(miro_sync, "get_miro_client", lambda token: pytest.fail("listed the board"))
+    assert board.recover() == 0
@@ -0,0 +1,92 @@
+import random
+
+from app.helpers.normalize_utils import _signature, find_boilerplate, normalize_pages
+
+WORDS = "whale sea captain ship harbour storm sailor deck rope oil voyage chase crew island wind".split()
+
+
+def prose(rng, words=12):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def book(pages=12, header="THE WHALE", number=str, seed=0):
+    rng = random.Random(seed)
+    return [f"{header}\n\n{prose(rng)}\n{prose(rng)}\n{prose(rng)} contin-\nues here.\n\n"
+            f"A new paragraph starts.\n{prose(rng)}\n{prose(rng)}\n{prose(rng)}\n{number(page)}"
+            for page in range(1, pages + 1)]
+
+
+def roman(number):
+    numerals = [(10, "x"), (9, "ix"), (5, "v"), (4, "iv"), (1, "i")]
+    text = ""
+    for value, numeral in numerals:
+        while number >= value:
+            text, number = text + numeral, number - value
+    return text
+
+
+def test_running_headers_and_page_numbers_are_removed():
+    text, report = normalize_pages(book())
+    assert "THE WHALE" not in text
+    assert report["boilerplate_lines"] == 24
+    assert not any(line.strip().isdigit() for line in text.splitlines())
+
+
+def test_roman_page_numbers_are_removed():
+    text, report = normalize_pages(book(number=roman))
+    assert report["boilerplate_lines"] == 24
+    assert "\nxii" not in text
+
+
+def test_words_that_look_like_roman_numerals_are_kept():
+    for word in ["mid", "did", "civil", "mix", "dim", "mill"]:
+        assert _signature(word) == word
+    for numeral in ["i", "iv", "ix", "xiv", "xxxix", "lxxx"]:
+        assert _signature(numeral) == "#"
+    rng = random.Random(1)
+    pages = [f"{prose(rng)}\n\n{prose(rng)}\n{prose(rng)}\n{prose(rng)}\nmid\n{page + 1}" for page in range(8)]
+    text, report = normalize_pages(pages)
+    assert report["boilerplate_lines"] == 16
+    assert find_boilerplate([page.splitlines() for page in pages]) == {"mid", "#"}
+
+
+def test_chapter_headings_are_not_boilerplate():
+    rng = random.Random(2)
+    pages = [("Chapter {}\n".format(page // 10 + 1) if page % 10 == 0 else "") + f"{prose(rng)}.\n" * 8
+             for page in range(40)]
+    text, report = normalize_pages(pages)
+    assert report["boilerplate_lines"] == 0
+    assert "Chapter 4" in text
+
+
+def test_paragraph_breaks_are_kept_and_lines_joined():
+    pages = book(pages=4)
+    text, report = normalize_pages(pages)
+    assert "\n\n\n" not in text
+    assert text.count(" continues here.\n\nA new paragraph starts.\n") == 4
+    assert report["hyphenations"] == 4
+
+
+def test_page_edges_do_not_break_sentences():
+    text, _ = normalize_pages(["The sentence runs\n\n", "\nonto the next page."])
+    assert text == "The sentence runs onto the next page."
+
+
+def test_ligatures_and_invisible_characters():
+    text, report = normalize_pages(["The ﬁrst ﬂag was­ o​ﬀ."])
+    assert text == "The first flag was off."
+    assert report["ligatures"] == 3
+
+
+def test_capitalized_compounds_keep_their_hyphen():
+    text, report = normalize_pages(["An Anglo-\nSaxon infor-\nmation"])
+    assert text == "An Anglo-Saxon information"
+    assert report["hyphenations"] == 1
+
+
+def test_tokens_are_only_counted_on_request(stub_tokenizer):
+    _, report = normalize_pages(book(pages=4))
+    assert "tokens_before" not in report
+    assert not stub_tokenizer.ids  # Nothing was tokenized
+    _, report = normalize_pages(book(pages=4), measure_tokens=True)
+    assert report["tokens_after"] < report["tokens_before"]
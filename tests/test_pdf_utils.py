@@ -0,0 +1,23 @@
+import pytest
+
+from app.helpers.pdf_utils import chunk_text_for_retrieval
+
+TEXT = " ".join(f"word{i}" for i in range(100))
+
+
+def test_windows_overlap_and_cover_the_text():
+    chunks = chunk_text_for_retrieval(TEXT, max_tokens=30, overlap=10)
+    assert [chunk.split()[0] for chunk in chunks] == ["word0", "word20", "word40", "word60", "word80"]
+    assert chunks[-1].split()[-1] == "word99"
+    assert all(len(chunk.split()) <= 30 for chunk in chunks)
+
+
+@pytest.mark.parametrize("text", ["", "  \n\n "])
+def test_empty_text_gives_no_windows(text):
+    # A placeholder chunk would be embedded, indexed and retrieved like book text
+    assert chunk_text_for_retrieval(text) == []
+
+
+def test_overlap_must_be_smaller_than_the_window():
+    with pytest.raises(ValueError):
+        chunk_text_for_retrieval(TEXT, max_tokens=10, overlap=10)
@@ -0,0 +1,68 @@
+import pytest
+
+from app.helpers.search_utils import BM25Index, quoted_phrases, reciprocal_rank_fusion, tokenize
+
+CHUNKS = [
+    "Deep work is the ability to focus without distraction on a cognitively demanding task.",
+    "Cal Newport argues that shallow work is easy to replicate and creates little value.",
+    "The Eisenhower matrix sorts tasks by urgency and importance.",
+    "Embrace boredom: downtime trains the brain to resist novelty. Deep work needs practice.",
+    "In 2016 the book sold over 500,000 copies and the self-control chapter was quoted widely.",
+]
+
+
+@pytest.fixture
+def index():
+    index = BM25Index()
+    index.build(CHUNKS)
+    return index
+
+
+def test_tokenize_drops_stopwords_and_keeps_compounds():
+    assert tokenize("What is the self-control of GPT-3.5 in the book?") == ["self-control", "gpt-3.5"]
+
+
+def test_quoted_phrases():
+    assert quoted_phrases('Where does he say "deep work" or “shallow work”?') == ["deep work", "shallow work"]
+    assert quoted_phrases('An empty "" quote') == []
+
+
+def test_search_ranks_by_bm25(index):
+    hits = index.search("deep work focus")
+    assert [doc_id for doc_id, _ in hits] == [0, 3, 1]  # Chunk 1 only shares "work"
+    assert hits[0][1] > hits[1][1] > hits[2][1] > 0
+    assert index.search("unrelated quantum chromodynamics") == []
+    assert len(index.search("work", top_k=1)) == 1
+
+
+def test_rare_terms_weigh_more(index):
+    assert index.idf("eisenhower") > index.idf("work")
+
+
+def test_quoted_phrase_ranks_first(index):
+    hits = index.search('work "deep work needs"')
+    assert hits[0][0] == 3
+
+
+def test_empty_index_finds_nothing():
+    index = BM25Index()
+    index.build([])
+    assert index.search("deep work") == []
+    assert not index.is_keyword_lookup("deep work", [])
+
+
+def test_keyword_lookups(index):
+    def lookup(query):
+        return index.is_keyword_lookup(query, index.search(query))
+    assert lookup("What did Cal Newport say about shallow work?")
+    assert lookup("How many copies sold in 2016")
+    assert lookup('"Eisenhower matrix"')
+    assert not lookup("why does focus matter")  # No names, numbers or quotes: needs the embedding
+    assert not lookup("What did Seneca say about focus?")  # The named term is in no chunk
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "c", "d"]], k=60)
+    assert [item for item, _ in fused] == ["b", "c", "a", "d"]
+    assert fused[0][1] == pytest.approx(1 / 62 + 1 / 61)
+    assert reciprocal_rank_fusion([]) == []
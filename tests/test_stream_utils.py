@@ -0,0 +1,87 @@
+import math
+import random
+
+import pytest
+
+from app.helpers.miro_sync import GOLDEN_ANGLE, STREAM_RING_GAP, provisional_position
+from app.helpers.miro_utils import build_mindmap_nodes, extract_structure_from_summary
+from app.helpers.stream_utils import DEFAULT_CENTRAL_TOPIC, SummaryStreamParser, tree_from_events
+
+SUMMARY = """# Deep Work
+
+## Focus
+- Schedule deep blocks
+  - Four hours a day at most
+- Quit social media
+
+## Embrace Boredom
+### Productive meditation
+- Think through one problem on a walk
+* Resist novelty
+"""
+
+
+def parse(fragments):
+    parser = SummaryStreamParser()
+    events = []
+    for fragment in fragments:
+        events.extend(parser.feed(fragment))
+    return events + parser.close()
+
+
+def test_events_have_stable_keys_and_parents_first():
+    events = parse([SUMMARY])
+    assert [(event["key"], event["parent"], event["title"]) for event in events] == [
+        ("root", None, "Deep Work"),
+        ("m0", "root", "Focus"),
+        ("m0.s0", "m0", "Schedule deep blocks"),
+        ("m0.s0.s0", "m0.s0", "Four hours a day at most"),
+        ("m0.s1", "m0", "Quit social media"),
+        ("m1", "root", "Embrace Boredom"),
+        ("m1.s0", "m1", "Productive meditation"),
+        ("m1.s0.s0", "m1.s0", "Think through one problem on a walk"),
+        ("m1.s0.s1", "m1.s0", "Resist novelty"),
+    ]
+    assert [event["type"] for event in events[:3]] == ["central_topic", "theme", "bullet"]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_any_token_split_gives_the_same_events(seed):
+    rng = random.Random(seed)
+    cuts = sorted(rng.sample(range(1, len(SUMMARY)), 40))
+    fragments = [SUMMARY[start:end] for start, end in zip([0] + cuts, cuts + [len(SUMMARY)])]
+    assert parse(fragments) == parse([SUMMARY])
+
+
+def test_last_line_without_newline_is_flushed_on_close():
+    parser = SummaryStreamParser()
+    assert parser.feed("## Focus\n- Quit social") == [
+        {"type": "central_topic", "key": "root", "parent": None, "depth": 0, "title": DEFAULT_CENTRAL_TOPIC},
+        {"type": "theme", "key": "m0", "parent": "root", "depth": 1, "title": "Focus"},
+    ]
+    assert parser.close()[0]["title"] == "Quit social"
+
+
+def test_streamed_keys_match_the_finished_mind_map():
+    streamed = {event["key"] for event in parse([SUMMARY])}
+    finished = {node["key"] for node in build_mindmap_nodes(extract_structure_from_summary(SUMMARY))}
+    assert streamed == finished
+
+
+def test_tree_from_events():
+    tree = tree_from_events(parse([SUMMARY]))
+    assert tree["title"] == "Deep Work"
+    assert [child["title"] for child in tree["children"]] == ["Focus", "Embrace Boredom"]
+    assert tree_from_events([]) == {"title": None, "children": []}
+
+
+def test_provisional_positions_fan_out_from_the_parent():
+    polar = {"root": provisional_position({}, {"parent": None}, 0)}
+    assert polar["root"] == (0.0, 0.0)
+    polar["m1"] = provisional_position(polar, {"parent": "root"}, 1)
+    assert polar["m1"] == (GOLDEN_ANGLE, 2 * STREAM_RING_GAP)
+    children = [provisional_position(polar, {"parent": "m1"}, order) for order in range(3)]
+    assert [radius for _, radius in children] == [3 * STREAM_RING_GAP] * 3
+    assert children[0][0] == GOLDEN_ANGLE
+    assert children[1][0] > GOLDEN_ANGLE > children[2][0]  # Alternating sides of the parent
+    assert math.isclose(children[1][0] - GOLDEN_ANGLE, GOLDEN_ANGLE - children[2][0])
@@ -0,0 +1,55 @@
+import contextvars
+
+import pytest
+
+from app.helpers import tracing_utils
+from app.helpers.tracing_utils import TraceCollector, otlp_document, set_session, span
+
+
+@pytest.fixture
+def collector(monkeypatch):
+    collector = TraceCollector(max_traces=3, trace_file=None, max_sessions=2)
+    monkeypatch.setattr(tracing_utils, "collector", collector)
+    monkeypatch.setattr(tracing_utils, "TRACING_ENABLED", True)
+    return collector
+
+
+def run_in_session(session_id, name):
+    def run():
+        set_session(session_id)
+        with span(name):
+            with span(f"{name}.child"):
+                pass
+    contextvars.copy_context().run(run)
+
+
+def test_spans_of_a_trace_are_grouped_in_start_order(collector):
+    run_in_session("a", "summary")
+    [trace] = collector.traces("a")
+    assert [item.name for item in trace] == ["summary", "summary.child"]
+    assert trace[1].parent_id == trace[0].span_id
+
+
+def test_busy_session_does_not_evict_other_sessions_traces(collector):
+    run_in_session("quiet", "quiet run")
+    for index in range(10):
+        run_in_session("busy", f"busy run {index}")
+    assert [trace[0].name for trace in collector.traces("quiet")] == ["quiet run"]
+    assert [trace[0].name for trace in collector.traces("busy")] == ["busy run 9", "busy run 8", "busy run 7"]
+    assert len(collector.traces()) == 4
+
+
+def test_least_recently_active_session_is_dropped(collector):
+    run_in_session("a", "first")
+    run_in_session("b", "second")
+    run_in_session("a", "third")
+    run_in_session("c", "fourth")
+    assert collector.traces("b") == []
+    assert [trace[0].name for trace in collector.traces()] == ["fourth", "third", "first"]
+
+
+def test_otlp_export_keeps_parent_links(collector):
+    run_in_session("a", "workbook")
+    document = otlp_document(collector.traces("a")[0])
+    spans = document["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert spans[1]["parentSpanId"] == spans[0]["spanId"]
@@ -0,0 +1,96 @@
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from app.helpers.chat_utils import SimpleVectorStore
+from app.helpers.vector_utils import (FullPrecisionFile, hamming_distances, int8_scores, quantize_binary,
+                                      quantize_int8)
+
+
+@pytest.fixture
+def embeddings():
+    rows = np.random.default_rng(0).normal(size=(500, 64)).astype(np.float32)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+
+def test_int8_codes_restore_the_rows(embeddings):
+    codes, scales = quantize_int8(embeddings)
+    assert codes.dtype == np.int8 and np.abs(codes).max() == 127
+    assert np.abs(codes * scales[:, None] - embeddings).max() <= scales.max() / 2 + 1e-6
+    query = embeddings[7]
+    assert np.allclose(int8_scores(codes, scales, query), embeddings @ query, atol=0.02)
+
+
+def test_int8_zero_row_does_not_divide_by_zero():
+    codes, scales = quantize_int8(np.zeros((1, 8), dtype=np.float32))
+    assert not codes.any() and scales[0] == 1.0
+
+
+def test_binary_codes_and_hamming_distance():
+    rows = np.array([[1, -1, 1, -1, 1, -1, 1, -1, 1], [-1] * 9], dtype=np.float32)
+    codes = quantize_binary(rows)
+    assert codes.shape == (2, 2)
+    assert hamming_distances(codes, codes[0]).tolist() == [0, 5]
+
+
+@pytest.mark.parametrize("quantization", ["none", "int8", "binary"])
+def test_search_finds_the_stored_vector(embeddings, quantization, tmp_path):
+    store = SimpleVectorStore(quantization=quantization, storage_dir=str(tmp_path))
+    store.add_batch(embeddings * 3, [f"chunk {i}" for i in range(len(embeddings))])  # Normalized on insert
+    for i in (0, 123, 499):
+        hits = store.search(embeddings[i], top_k=3)
+        assert hits[0][0] == f"chunk {i}"
+        assert hits[0][1] == pytest.approx(1.0, abs=1e-5)
+        assert [score for _, score in hits] == sorted((score for _, score in hits), reverse=True)
+
+
+@pytest.mark.parametrize("quantization", ["int8", "binary"])
+def test_quantized_store_keeps_codes_in_memory(embeddings, quantization, tmp_path):
+    store = SimpleVectorStore(quantization=quantization, storage_dir=str(tmp_path))
+    store.add_batch(embeddings, [str(i) for i in range(len(embeddings))])
+    assert store.nbytes < embeddings.nbytes / 3
+    assert np.allclose(store.embeddings, embeddings)
+
+
+def test_rescoring_recovers_the_exact_ranking(embeddings, tmp_path):
+    exact = SimpleVectorStore()
+    binary = SimpleVectorStore(quantization="binary", storage_dir=str(tmp_path))
+    for store in (exact, binary):
+        store.add_batch(embeddings, [str(i) for i in range(len(embeddings))])
+    query = embeddings[42] + 0.5 * embeddings[17]
+    hits, expected = binary.search_indices(query, top_k=2), exact.search_indices(query, top_k=2)
+    assert [i for i, _ in hits] == [i for i, _ in expected] == [42, 17]
+    assert [score for _, score in hits] == pytest.approx([score for _, score in expected], abs=1e-5)
+    assert binary.search_indices(query, top_k=2, rescore=False)[0][1] < 0  # Unrescored: negated Hamming distance
+
+
+def test_dimension_mismatch_and_zero_query(embeddings):
+    store = SimpleVectorStore(dimensions=64)
+    with pytest.raises(ValueError):
+        store.add_batch(np.ones((1, 32)), ["short"])
+    store.add_batch(embeddings[:3], ["a", "b", "c"])
+    assert store.search(np.zeros(64)) == []
+    with pytest.raises(ValueError):
+        SimpleVectorStore(quantization="pq")
+
+
+def test_frozen_store_is_read_only(embeddings):
+    store = SimpleVectorStore()
+    store.add_batch(embeddings[:3], ["a", "b", "c"])
+    store.freeze()
+    with pytest.raises(ValueError):
+        store.embeddings[0, 0] = 1.0
+    assert store.search(embeddings[1], top_k=1)[0][0] == "b"
+
+
+def test_full_precision_file_is_removed_and_not_picklable(tmp_path):
+    vectors = FullPrecisionFile(4, str(tmp_path))
+    vectors.append(np.eye(4, dtype=np.float32))
+    assert vectors.matrix.shape == (4, 4)
+    with pytest.raises(TypeError):
+        pickle.dumps(vectors)
+    path = vectors.path
+    vectors.close()
+    assert not os.path.exists(path)